@@ -0,0 +1,270 @@
+"""
+Asyncio API for the DataEncap and NFT protocols.
+
+The protocol work runs on an executor: the loop's default thread pool, or any
+concurrent.futures executor passed in (a ProcessPoolExecutor keeps it off the GIL;
+the metrics its workers record are merged back into DataEncap.metrics.REGISTRY).
+File I/O done here (reading ciphertext, writing uploaded chunks) goes through
+asyncio.to_thread, so the loop never blocks. A semaphore caps how many operations
+occupy the executor at once; the rest wait on the loop, not in the executor queue.
+
+Usage:
+    protocols = AsyncProtocols(max_concurrency=4)
+    file_info = await protocols.enroll("report.pdf", "report.pdf", "Q3", ".pdf")
+    async for chunk in protocols.iter_plaintext(file_info):
+        ...
+
+    # or, with a shared default instance:
+    from DataEncap import aio
+    plaintext, description = await aio.verify(file_info)
+"""
+import asyncio
+import contextlib
+import functools
+import os
+import tempfile
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+from DataEncap import metrics
+from DataEncap.progress import CancelToken, drain
+
+# Chunk size of the plaintext / ciphertext iterators and of enroll_stream's writes
+CHUNK_SIZE = 1024 * 1024
+
+# Plaintext chunks a decrypting worker may run ahead of the consumer of iter_plaintext
+STREAM_BUFFER = 4
+
+_DONE = object()
+
+
+# --- Executor tasks (top-level so a process pool can pickle them) ---
+
+def _enroll(file_path, filename, description, file_extension, kwargs):
+    from DataEncap.enrollment.enrollment import enrollment_stages
+    return drain(enrollment_stages(file_path, filename, description, file_extension, **kwargs))
+
+
+def _verify(file_info, kwargs):
+    from DataEncap.verification.verification import verification_stages
+    # stats is returned too: in a process pool the caller's dict is only a copy here
+    return drain(verification_stages(file_info, **kwargs)), kwargs.get("stats")
+
+
+def _nft(decrypted_path, password):
+    from NFT.protocol import nft_protocol
+    return nft_protocol(decrypted_path, password)
+
+
+class AsyncProtocols:
+    """
+    Async front end for enrollment, verification and NFT derivation.
+
+    Args:
+        executor (concurrent.futures.Executor, optional): Where protocol work runs.
+            Defaults to the running loop's default executor (threads).
+        max_concurrency (int, optional): Operations allowed in the executor at once.
+            Defaults to the number of CPUs.
+        chunk_size (int, optional): Chunk size of the async iterators.
+
+    Unlike enrollment_protocol / verification_protocol, errors are raised, not returned.
+    Cancelling an await (e.g. a timeout) stops work running in threads at its next chunk
+    boundary and leaves no partial output file; work already sent to a process pool
+    runs to completion.
+    """
+
+    def __init__(self, executor=None, max_concurrency=None, chunk_size=CHUNK_SIZE):
+        self.executor = executor
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def semaphore(self):
+        """The concurrency limit for the running loop (one per loop: asyncio primitives are loop-bound)."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    @property
+    def in_process(self):
+        """True if protocol work shares this process (and so its caches, metrics and cancel tokens)."""
+        return not isinstance(self.executor, ProcessPoolExecutor)
+
+    async def _call(self, fn, *args, cancel=None):
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            if not self.in_process:
+                task = functools.partial(metrics.metered, fn, *args)
+                result, snapshot = await loop.run_in_executor(self.executor, task)
+                metrics.REGISTRY.merge(snapshot)
+                return result
+            future = loop.run_in_executor(self.executor, functools.partial(fn, *args))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Stop the worker and keep the slot until it has cleaned up
+                if cancel is not None:
+                    cancel.cancel()
+                with contextlib.suppress(Exception, asyncio.CancelledError):
+                    await future
+                raise
+
+    def _with_cancel(self, kwargs):
+        kwargs = dict(kwargs)
+        cancel = None
+        if self.in_process:
+            cancel = kwargs["cancel"] = CancelToken()
+        return kwargs, cancel
+
+    async def enroll(self, file_path, filename, description, file_extension, **kwargs):
+        """
+        Enroll a file. Keyword arguments are those of enrollment_stages (output_path,
+        external_path, external_pw, params, ...).
+
+        Returns:
+            SimpleNamespace: The file info record.
+        """
+        kwargs, cancel = self._with_cancel(kwargs)
+        if self.in_process:
+            # A later verify() of the new file runs in this process too and hits the CRP cache
+            kwargs.setdefault("crp_cache", True)
+        return await self._call(_enroll, file_path, filename, description, file_extension, kwargs, cancel=cancel)
+
+    async def enroll_stream(self, chunks, filename, description, output_path, **kwargs):
+        """
+        Enroll data arriving as an async iterable of bytes (e.g. an upload). The chunks are
+        written to a temporary file next to output_path without blocking the loop, the file
+        is enrolled into output_path and the temporary file removed.
+
+        Returns:
+            SimpleNamespace: The file info record.
+        """
+        directory = os.path.dirname(os.path.abspath(output_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".upload.", suffix=os.path.splitext(filename)[1], dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    await asyncio.to_thread(f.write, chunk)
+            return await self.enroll(tmp_path, filename, description, os.path.splitext(filename)[1],
+                                     output_path=output_path, **kwargs)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                await asyncio.to_thread(os.remove, tmp_path)
+
+    async def verify(self, file_info, **kwargs):
+        """
+        Recover the key and decrypt. Keyword arguments are those of verification_stages
+        (output_path, external_path, external_pw, stats, params, ...).
+
+        Returns:
+            (bytes or str, str): The plaintext (or output_path) and the description.
+        """
+        kwargs, cancel = self._with_cancel(kwargs)
+        if not self.in_process:
+            # Pool workers each hold their own CRP cache, which a repeat rarely reaches
+            kwargs.setdefault("crp_cache", False)
+        result, stats = await self._call(_verify, file_info, kwargs, cancel=cancel)
+        if stats is not None and stats is not kwargs["stats"]:
+            kwargs["stats"].update(stats)
+        return result
+
+    async def nft(self, decrypted_path, password):
+        """
+        Derive the NFT key from a decrypted file.
+
+        Returns:
+            (bytes, bytes, bytes): The ephemeral key and the two seeds.
+        """
+        return await self._call(_nft, decrypted_path, password)
+
+    async def iter_plaintext(self, file_info, **kwargs):
+        """
+        Async iterator over the plaintext of a record, decrypted chunk by chunk in a worker
+        thread (always in this process, whatever the executor) with at most STREAM_BUFFER
+        chunks buffered. Keyword arguments are those of verification_stages; pass stats={}
+        to get the description back in stats["description"] once the iterator is exhausted.
+        Closing the iterator early (e.g. `async with contextlib.aclosing(...)` around a loop
+        that may break) cancels the decryption.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(STREAM_BUFFER)
+        cancel = CancelToken()
+        stats = kwargs.pop("stats", None)
+        stats = stats if stats is not None else {}
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def run():
+            try:
+                _, description = drain(_verification_stream(file_info, put, cancel, stats, kwargs))
+                stats["description"] = description
+            finally:
+                put(_DONE)
+
+        async with self.semaphore:
+            executor = self.executor if self.in_process else None
+            future = loop.run_in_executor(executor, run)
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is _DONE:
+                        break
+                    yield item
+                await future
+            finally:
+                if not future.done():
+                    # Stopped early: cancel, and keep taking chunks so the worker can finish
+                    cancel.cancel()
+                    while await queue.get() is not _DONE:
+                        pass
+                    with contextlib.suppress(Exception):
+                        await future
+
+    async def iter_ciphertext(self, file_info):
+        """Async iterator over the bytes of an encrypted file (a record or a path), read off the loop."""
+        path = file_info if isinstance(file_info, (str, os.PathLike)) else file_info.file_path
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+def _verification_stream(file_info, put, cancel, stats, kwargs):
+    from DataEncap.verification.verification import verification_stages
+    return verification_stages(file_info, sink=lambda chunk: put(bytes(chunk)), cancel=cancel, stats=stats,
+                               **kwargs)
+
+
+_default = None
+
+
+def default_protocols():
+    """Shared AsyncProtocols on the loop's default executor, used by the module-level functions."""
+    global _default
+    if _default is None:
+        _default = AsyncProtocols()
+    return _default
+
+
+async def enroll(file_path, filename, description, file_extension, **kwargs):
+    """Async enrollment_protocol; see AsyncProtocols.enroll."""
+    return await default_protocols().enroll(file_path, filename, description, file_extension, **kwargs)
+
+
+async def verify(file_info, **kwargs):
+    """Async verification_protocol; see AsyncProtocols.verify."""
+    return await default_protocols().verify(file_info, **kwargs)
+
+
+async def nft(decrypted_path, password):
+    """Async nft_protocol; see AsyncProtocols.nft."""
+    return await default_protocols().nft(decrypted_path, password)
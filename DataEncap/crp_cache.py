@@ -0,0 +1,123 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from bitarray import frozenbitarray
+
+# Default memory budget of CRP_CACHE, in bytes (f°° is 8 KiB at D=16, 32 MiB at D=28)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def file_stamp(path):
+    """
+    Identity and version of a file: (device, inode, size, mtime_ns). Any rewrite of an
+    encrypted file, including the temp-file-and-rename of enrollment, changes it.
+    """
+    st = os.stat(path)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class CRPCache:
+    """
+    Size-bounded, least-recently-used, thread-safe cache of the CRP data regenerated
+    during verification: f°° and the responses of an encrypted file under one Kc.
+
+    Entries are keyed by (real path of the encrypted file, SHA-256 of the encoded Kc,
+    parameter set) and carry the file_stamp() they were computed for. A lookup whose
+    stamp no longer matches the file on disk drops the entry, so a changed file is
+    always hashed again.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(file_path, kc_encoded, params):
+        kc_digest = hashlib.sha256(kc_encoded.encode("utf-8") if isinstance(kc_encoded, str) else kc_encoded)
+        return os.path.realpath(file_path), kc_digest.hexdigest(), params
+
+    def get(self, file_path, kc_encoded, params):
+        """
+        Return SimpleNamespace(f_double_circle, responses, encrypted_size) for an unchanged
+        file, or None. The responses are frozenbitarrays and must not be modified.
+        """
+        key = self.key(file_path, kc_encoded, params)
+        try:
+            stamp = file_stamp(file_path)
+        except OSError:
+            stamp = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp != stamp:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, file_path, kc_encoded, params, f_double_circle, responses, stamp=None):
+        """
+        Store the CRP data of file_path. `stamp` is the file_stamp() the data was computed
+        from (taken now if not given); entries larger than the whole budget are not kept.
+        """
+        key = self.key(file_path, kc_encoded, params)
+        stamp = stamp or file_stamp(file_path)
+        responses = tuple(frozenbitarray(r) for r in responses)
+        cost = len(f_double_circle) + sum(sys.getsizeof(r) for r in responses)
+        if cost > self.max_bytes:
+            return
+        entry = SimpleNamespace(f_double_circle=bytes(f_double_circle), responses=responses,
+                                encrypted_size=stamp[2], stamp=stamp, cost=cost)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += cost
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, file_path=None):
+        """Drop every entry for file_path, or everything if no path is given."""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            path = os.path.realpath(file_path)
+            for key in [k for k in self._entries if k[0] == path]:
+                self._drop(key)
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key).cost
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+
+# Process-wide cache used by verification, and primed by enrollments that opt in. It only
+# pays off where repeats run in the same process: the GUI's worker threads and in-process
+# AsyncProtocols. Process pools and batch jobs (app/server.py, the GUI process bridge,
+# DataEncap.enroll / DataEncap.verify) turn it off.
+CRP_CACHE = CRPCache()
+
+
+def resolve_cache(crp_cache):
+    """The crp_cache argument of the protocols: None or True -> CRP_CACHE, False -> None (no caching)."""
+    if crp_cache is None or crp_cache is True:
+        return CRP_CACHE
+    return None if crp_cache is False else crp_cache
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+
+from DataEncap.crp_cache import file_stamp
+
+# The persistent digest cache is off unless this is set: "1" (true, yes, on) for
+# default_path(), or a database path, recognised by a path separator or a ".sqlite3"
+# suffix. "0" (false, no, off, empty) and any other value keep it off.
+ENV_VAR = "VT_DIGEST_CACHE"
+ON_VALUES = ("1", "true", "yes", "on")
+OFF_VALUES = ("", "0", "false", "no", "off")
+
+# Files modified less than this long before they were hashed are not cached: a second
+# write within the same timestamp tick (2 s on FAT-formatted USB drives) would keep the
+# same (size, mtime_ns) and go unnoticed
+RACY_WINDOW_NS = 3 * 10**9
+
+SCHEMA_VERSION = 1
+
+
+def default_path():
+    """Location of the shared cache database: $XDG_CACHE_HOME/virtualtoken/digests.sqlite3."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "virtualtoken", "digests.sqlite3")
+
+
+def _i64(value):
+    # SQLite integers are signed 64-bit; inode and device numbers may use the full unsigned range
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _key(stamp):
+    return tuple(_i64(v) for v in stamp)
+
+
+class DigestCache:
+    """
+    Persistent SHA-256 digests of files, in a small SQLite database shared by every
+    process, so an unchanged (possibly multi-GB) file is not hashed again across runs.
+    Only meant for encrypted (.hypn) files: a digest of a plaintext or NFT input, stored
+    next to its real path, would outlive the file and leak what it contained.
+
+    Rows are keyed by crp_cache.file_stamp(): (device, inode, size, mtime_ns). A row is
+    only returned if the file's ctime also still matches, which no utime() call can
+    restore, and a digest is only stored if the file did not change while it was hashed
+    and was last modified more than RACY_WINDOW_NS before. Any database error is treated
+    as a miss, so an unwritable, locked or corrupt cache never stops a file from being hashed.
+
+    Args:
+        path (str, optional): Database file. Defaults to default_path().
+        max_entries (int, optional): Rows kept; the least recently used are pruned.
+    """
+
+    def __init__(self, path=None, max_entries=100_000):
+        self.path = path or default_path()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        # One connection per process: a connection must not cross a fork
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(f"""
+                    DROP TABLE IF EXISTS digests;
+                    CREATE TABLE digests (
+                        dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+                        ctime_ns INTEGER NOT NULL, path TEXT NOT NULL, sha256 BLOB NOT NULL, used REAL NOT NULL,
+                        PRIMARY KEY (dev, ino, size, mtime_ns)
+                    ) WITHOUT ROWID;
+                    CREATE INDEX IF NOT EXISTS digests_path ON digests (path);
+                    PRAGMA user_version = {SCHEMA_VERSION};
+                """)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, path):
+        """SHA-256 of path if a valid digest is cached for its current version, else None."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = _key((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns))
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT ctime_ns, sha256 FROM digests WHERE dev=? AND ino=? AND size=? AND mtime_ns=?", key
+                ).fetchone()
+                if row is not None and row[0] != st.st_ctime_ns:
+                    conn.execute("DELETE FROM digests WHERE dev=? AND ino=? AND size=? AND mtime_ns=?", key)
+                    row = None
+                if row is not None:
+                    conn.execute("UPDATE digests SET used=? WHERE dev=? AND ino=? AND size=? AND mtime_ns=?",
+                                 (time.time(), *key))
+        except (sqlite3.Error, OSError):
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bytes(row[1])
+
+    def put(self, path, digest, stamp):
+        """
+        Record the SHA-256 of path. `stamp` is the file_stamp() taken before hashing; nothing
+        is stored if the file has changed since, or was modified too recently to trust its mtime.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) != tuple(stamp):
+            return
+        if st.st_mtime_ns > time.time_ns() - RACY_WINDOW_NS:
+            return
+        row = (*_key(stamp), st.st_ctime_ns, os.path.realpath(path), bytes(digest), time.time())
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+                (count,) = conn.execute("SELECT COUNT(*) FROM digests").fetchone()
+                if count > self.max_entries:
+                    conn.execute("DELETE FROM digests WHERE (dev, ino, size, mtime_ns) IN (SELECT dev, ino, size, "
+                                 "mtime_ns FROM digests ORDER BY used LIMIT ?)", (count - self.max_entries,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def sha256(self, path, chunk_size=1024 * 1024):
+        """SHA-256 of a file: from the cache if it is unchanged, else hashed and recorded."""
+        digest = self.get(path)
+        if digest is None:
+            stamp = file_stamp(path)
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    h.update(chunk)
+            digest = h.digest()
+            self.put(path, digest, stamp)
+        return digest
+
+    def invalidate(self, path=None):
+        """Forget every digest recorded for path, or all digests if no path is given."""
+        try:
+            with self._lock:
+                conn = self._connect()
+                if path is None:
+                    conn.execute("DELETE FROM digests")
+                else:
+                    conn.execute("DELETE FROM digests WHERE path=?", (os.path.realpath(path),))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+_default = None
+
+
+def default_cache():
+    """
+    The process-wide DigestCache if VT_DIGEST_CACHE opts in: at default_path() for "1"
+    (or true/yes/on), else at the path it names. None otherwise (every file is hashed
+    every time). A value is only taken as a path if it contains a path separator or
+    ends in ".sqlite3", so a misspelt "flase" does not create a database named that.
+    """
+    global _default
+    setting = os.environ.get(ENV_VAR, "").strip()
+    if setting.lower() in OFF_VALUES:
+        return None
+    if setting.lower() in ON_VALUES:
+        path = default_path()
+    elif os.sep in setting or "/" in setting or setting.endswith(".sqlite3"):
+        path = setting
+    else:
+        warnings.warn(f"{ENV_VAR}={setting!r} is neither a switch nor a database path; "
+                      "the digest cache stays off", RuntimeWarning, stacklevel=2)
+        return None
+    if _default is None or _default.path != path:
+        _default = DigestCache(path)
+    return _default
+
+
+def resolve_digest_cache(digest_cache):
+    """The digest_cache argument of the entry points: None or True -> default_cache(), False -> None."""
+    if digest_cache is None or digest_cache is True:
+        return default_cache()
+    return None if digest_cache is False else digest_cache
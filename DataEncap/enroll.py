@@ -0,0 +1,241 @@
+"""
+Headless batch enrollment.
+
+Walks a directory tree and runs enrollment_protocol on every file across a
+process pool. Each result is appended to a JSON Lines manifest as soon as it
+finishes, so an interrupted run can be restarted and will skip files that were
+already enrolled and have not changed since.
+
+Usage:
+    python -m DataEncap.enroll SOURCE_DIR --output OUT_DIR [--jobs N]
+        [--manifest PATH] [--keys-dir DIR [--keys-password-file PATH]] [--profile NAME] [--metrics PATH]
+
+The keystore password is read from --keys-password-file, else from $VT_KEYS_PASSWORD,
+else prompted for; it is never taken from the command line.
+"""
+import argparse
+import contextlib
+import getpass
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from DataEncap import metrics
+from DataEncap.enrollment.enrollment import enrollment_protocol
+from DataEncap.manifest import ManifestWriter, read_manifest
+from DataEncap.protocol_config import PROFILES
+
+ENCRYPTED_SUFFIX = ".hypn"
+
+# Environment variable holding the keystore password, for non-interactive runs
+PASSWORD_ENV_VAR = "VT_KEYS_PASSWORD"
+
+# Fields of a record holding key material (base64 pickles)
+KEY_FIELDS = ("kc", "kr", "hkey")
+
+
+def read_keys_password(password_file=None, confirm=False):
+    """
+    The keystore password: the first line of password_file if given, else $VT_KEYS_PASSWORD,
+    else asked for on the terminal (twice if confirm). Raises ValueError if it is empty.
+    """
+    if password_file:
+        with open(password_file, "r", encoding="utf-8") as f:
+            password = f.readline().rstrip("\r\n")
+    elif os.environ.get(PASSWORD_ENV_VAR):
+        password = os.environ[PASSWORD_ENV_VAR]
+    else:
+        password = getpass.getpass("Keystore password: ")
+        if confirm and getpass.getpass("Repeat keystore password: ") != password:
+            raise ValueError("Passwords do not match")
+    if not password:
+        raise ValueError("Empty keystore password")
+    return password
+
+
+@contextlib.contextmanager
+def quiet_stdout(enabled):
+    """Discard what the protocol prints (timings on every call) while the block runs, if enabled."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def iter_source_files(source_dir, exclude_dirs=()):
+    """
+    Yield (absolute path, path relative to source_dir) for every regular file under
+    source_dir, in a stable order. Already-encrypted ".hypn" files and anything under
+    exclude_dirs are skipped.
+    """
+    source_dir = os.path.abspath(source_dir)
+    excluded = [os.path.abspath(p) for p in exclude_dirs]
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) not in excluded)
+        for name in sorted(files):
+            if name.endswith(ENCRYPTED_SUFFIX):
+                continue
+            path = os.path.join(root, name)
+            if os.path.isfile(path):
+                yield path, os.path.relpath(path, source_dir)
+
+
+def output_path_for(output_dir, rel_path):
+    # Keep the original extension in the name so "a.pdf" and "a.txt" never share "a.hypn"
+    return os.path.join(output_dir, rel_path + ENCRYPTED_SUFFIX)
+
+
+def is_up_to_date(record, stat_result):
+    """Return True if a manifest record covers the current version of the source file."""
+    if not record or record.get("status") != "ok":
+        return False
+    if record.get("size") != stat_result.st_size or record.get("mtime_ns") != stat_result.st_mtime_ns:
+        return False
+    file_info = record.get("file_info") or {}
+    return bool(file_info.get("file_path")) and os.path.exists(file_info["file_path"])
+
+
+def _enroll_one(job):
+    """Process-pool task: enroll a single file and return its manifest record."""
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(job["output_path"]), exist_ok=True)
+    keys_path = job.get("keys_path")
+    if keys_path:
+        os.makedirs(os.path.dirname(keys_path), exist_ok=True)
+
+    filename = os.path.basename(job["source"])
+    with quiet_stdout(job.get("quiet")):
+        success, file_info, message = enrollment_protocol(
+            job["source"], filename, job["description"], os.path.splitext(filename)[1],
+            external_path=keys_path, external_pw=job.get("keys_password"),
+            output_path=job["output_path"], params=job.get("profile"),
+        )
+    file_info = vars(file_info) if success else None
+    if file_info is not None and keys_path:
+        # The password-protected keystore holds the keys; keep them out of the plaintext manifest
+        file_info = {k: v for k, v in file_info.items() if k not in KEY_FIELDS}
+    record = {
+        "source": job["rel_path"],
+        "size": job["size"],
+        "mtime_ns": job["mtime_ns"],
+        "status": "ok" if success else "error",
+        "message": message,
+        "duration": time.perf_counter() - start,
+        "file_info": file_info,
+        "keys_path": keys_path if success else None,
+    }
+    return record
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m DataEncap.enroll",
+        description="Enroll every file under a directory tree using a process pool."
+    )
+    parser.add_argument("source", help="Directory tree to enroll.")
+    parser.add_argument("--output", "-o", required=True,
+                        help="Directory that receives the .hypn files (mirrors the source tree).")
+    parser.add_argument("--manifest", default=None,
+                        help="JSON Lines manifest to write and resume from (default: OUTPUT/manifest.jsonl).")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes.")
+    parser.add_argument("--description", default="",
+                        help="Description encrypted alongside every file.")
+    parser.add_argument("--keys-dir", default=None,
+                        help="Also write each file's Kc/Kr/hash keystore to KEYS_DIR/<relpath>.keys.bin.")
+    parser.add_argument("--keys-password-file", default=None,
+                        help="File whose first line is the password protecting the keystores written to --keys-dir "
+                             f"(default: ${PASSWORD_ENV_VAR}, else a prompt). The manifest then holds no keys.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default",
+                        help="Protocol parameter set to enroll with (recorded per file; verification reads it back).")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-enroll files even if the manifest says they are done.")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                        help="Suppress per-stage protocol output from the workers.")
+    parser.add_argument("--metrics", default=None,
+                        help="Write per-stage timings and counters to this file (OpenMetrics text).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    keys_password = None
+    if args.keys_dir:
+        try:
+            keys_password = read_keys_password(args.keys_password_file, confirm=True)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read the keystore password: {e}", file=sys.stderr)
+            return 2
+    elif args.keys_password_file:
+        print("--keys-password-file needs --keys-dir", file=sys.stderr)
+        return 2
+
+    source_dir = os.path.abspath(args.source)
+    output_dir = os.path.abspath(args.output)
+    manifest_path = args.manifest or os.path.join(output_dir, "manifest.jsonl")
+    keys_dir = os.path.abspath(args.keys_dir) if args.keys_dir else None
+    os.makedirs(output_dir, exist_ok=True)
+
+    done = {} if args.force else read_manifest(manifest_path)
+    jobs, skipped = [], 0
+    for path, rel_path in iter_source_files(source_dir, exclude_dirs=[d for d in (output_dir, keys_dir) if d]):
+        st = os.stat(path)
+        if is_up_to_date(done.get(rel_path), st):
+            skipped += 1
+            continue
+        jobs.append({
+            "source": path,
+            "rel_path": rel_path,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "output_path": output_path_for(output_dir, rel_path),
+            "description": args.description,
+            "keys_path": os.path.join(keys_dir, rel_path + ".keys.bin") if keys_dir else None,
+            "keys_password": keys_password,
+            "profile": args.profile,
+            "quiet": args.quiet,
+        })
+
+    print(f"{len(jobs)} file(s) to enroll, {skipped} already done, {args.jobs} worker(s).")
+    ok_files, ok_bytes, failed = 0, 0, 0
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        manifest = stack.enter_context(ManifestWriter(manifest_path))
+        pool = stack.enter_context(
+            ProcessPoolExecutor(max_workers=max(1, args.jobs))
+        )
+        futures = {pool.submit(metrics.metered, _enroll_one, job): job for job in jobs}
+        for n, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            try:
+                record, snapshot = future.result()
+                metrics.REGISTRY.merge(snapshot)
+            except Exception as e:
+                record = {"source": job["rel_path"], "size": job["size"], "mtime_ns": job["mtime_ns"],
+                          "status": "error", "message": f"Worker crashed: {e}", "duration": None,
+                          "file_info": None, "keys_path": None}
+            manifest.append(record)
+            if record["status"] == "ok":
+                ok_files += 1
+                ok_bytes += record["size"]
+                print(f"[{n}/{len(jobs)}] ok     {record['source']} ({record['duration']:.2f}s)")
+            else:
+                failed += 1
+                print(f"[{n}/{len(jobs)}] FAILED {record['source']}: {record['message']}")
+    elapsed = time.perf_counter() - start
+
+    files_per_s = ok_files / elapsed if elapsed > 0 else 0.0
+    mb_per_s = ok_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    print(f"Enrolled {ok_files} file(s) ({ok_bytes} bytes), {failed} failed, {skipped} skipped "
+          f"in {elapsed:.2f}s: {files_per_s:.2f} files/s, {mb_per_s:.2f} MB/s")
+    print(f"Manifest: {manifest_path}")
+    if args.metrics:
+        metrics.write_openmetrics(args.metrics)
+        print(f"Metrics: {args.metrics}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
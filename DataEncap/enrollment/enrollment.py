@@ -1,11 +1,19 @@
+import hashlib
 import os
 import time
 
-from DataEncap.protocol_config import size, d, alpha, beta, P, D
+from DataEncap.crp_cache import resolve_cache
+from DataEncap.protocol_config import resolve_params
 from DataEncap.enrollment.enrollmentUtils import enrollmentUtils
+from DataEncap.metrics import instrument
+from DataEncap.progress import (
+    CancelToken, ProgressEvent, drain,
+    STAGE_KEYS, STAGE_ENCRYPT, STAGE_HASH, STAGE_CHALLENGES, STAGE_SERIALIZE,
+)
 from DataEncap.protocolUtils import protocolUtils
 
-def enrollment_protocol(file_path, filename, description, file_extension, external_path=None, external_pw=None):
+def enrollment_protocol(file_path, filename, description, file_extension, external_path=None, external_pw=None,
+                        output_path=None, params=None, crp_cache=False):
     """
     Enrollment protocol for a file as described in the Data Encapsulation Whitepaper.
     Stores Kc, Kr, and the file hash externally if a path is provided.
@@ -17,64 +25,134 @@ def enrollment_protocol(file_path, filename, description, file_extension, extern
         file_extension (str): The file extension.
         external_path (str, optional): Path to external storage (e.g., USB) for saving keys.
         external_pw (str, optional): Password to encrypt keys for external storage.
+        output_path (str, optional): Where to write the encrypted file. Defaults to the
+            source path with its extension replaced by ".hypn".
+        params (ParameterSet or str, optional): Protocol parameters, or the name of one of
+            protocol_config.PROFILES. Defaults to protocol_config.DEFAULT_PARAMS. The set is
+            recorded in the file info, so verification needs no further hint.
+        crp_cache (CRPCache or bool, optional): Cache to prime with f°° and the responses, so
+            a verification of the new file in this process skips regenerating them. True
+            primes crp_cache.CRP_CACHE. Off by default: only worth it where the verification
+            will run in the same process (not in a process pool or batch job).
 
     Returns:
         (bool, SimpleNamespace or None, str): Tuple indicating success, file info (if successful), and message.
     """
     try:
-        # Start timer for the enrollment process
-        start_enrollment = time.time()
-
-        pUtils = protocolUtils()
-        eUtils = enrollmentUtils()
-
-        # Generate the ephemeral key (CSPRNG) for file encryption.
-        l = eUtils.generate_ephemeral_key(size)
-        hkey = pUtils.hash_key(l)
-
-        # Generate omega and s for the Kc key
-        w, s = eUtils.generate_Kc(size)
-
-        # Encrypt the file using the ephemeral key l
-        encrypted_file_path = eUtils.encrypt_file(file_path, l)
-
-        # Generate the CRP data and responses
-        f_double_circle = pUtils.generate_f_double_circle(encrypted_file_path, [w, s], d)
-        challenges = pUtils.generate_challenges(s, D)
-        responses = pUtils.generate_responses(f_double_circle, challenges, alpha, beta, P, d)
-
-        # Use the first response (k0) to encrypt the description
-        k0 = responses[0]
-        encrypted_description = eUtils.encrypt_description(description, k0)
-
-        # Get the remaining responses and prepare subset
-        response = responses[1:]
-        subset_of_res = eUtils.subset_of_responses(l, response)
-
-        # Serialize and encode keys (Kc, Kr) and hash of ephemeral key
-        kc_encoded, kr_encoded, hkey_encoded = eUtils.serialize_and_encode_keys([w, s], subset_of_res, hkey)
-
-        # If an external path and password are provided, save keys to external storage
-        if external_path and external_pw:
-            # Use enrollmentUtils helper to save the keys and hash to a binary encrypted file
-            eUtils.save_keys_to_usb(kc_encoded, kr_encoded, hkey_encoded, external_path, external_pw)
+        file_info = drain(enrollment_stages(
+            file_path, filename, description, file_extension,
+            external_path=external_path, external_pw=external_pw, output_path=output_path, params=params,
+            crp_cache=crp_cache,
+        ))
+        return True, file_info, "File enrolled successfully."
 
-        # Get the file size (of original file)
-        file_size = eUtils.get_file_size(file_path)
+    except Exception as e:
+        return False, None, f"Error enrolling file: {e}"
 
-        # (Optional) Remove the original file - disabled for now
-        # os.remove(file_path)
 
-        # Store file information in a SimpleNamespace object (simulating database record)
-        file_info = eUtils.store_file(
-            filename, encrypted_file_path, encrypted_description,
-            file_extension, kc_encoded, kr_encoded, hkey_encoded, file_size
-        )
+def enrollment_stages(file_path, filename, description, file_extension, external_path=None, external_pw=None,
+                      output_path=None, cancel=None, params=None, crp_cache=False):
+    """
+    Staged form of enrollment_protocol: a generator that yields ProgressEvent objects
+    (bytes encrypted, responses generated, ...) while it runs and returns the file info
+    record when exhausted. Errors propagate to the caller.
 
-        # End timer for the enrollment process
-        pUtils.log_timing(start_enrollment, "Enrollment process")
+    Args:
+        file_path, filename, description, file_extension, external_path, external_pw,
+        output_path, params, crp_cache: As for enrollment_protocol.
+        cancel (CancelToken, optional): Checked at every chunk boundary; when cancelled,
+            OperationCancelled is raised and no partial .hypn is left behind.
 
-        return True, file_info, "File enrolled successfully."
+    Returns:
+        SimpleNamespace: The file info record (as StopIteration value).
 
-    except Exception as e:
-        return False, None, f"Error enrolling file: {e}"
\ No newline at end of file
+    Every run is recorded in DataEncap.metrics.REGISTRY (see metrics.instrument).
+    """
+    return instrument("enrollment", _enrollment_stages(
+        file_path, filename, description, file_extension, external_path, external_pw, output_path, cancel, params,
+        crp_cache,
+    ))
+
+
+def _enrollment_stages(file_path, filename, description, file_extension, external_path, external_pw,
+                       output_path, cancel, params, crp_cache):
+    cancel = cancel or CancelToken()
+    params = resolve_params(params)
+
+    # Start timer for the enrollment process
+    start_enrollment = time.perf_counter()
+
+    pUtils = protocolUtils()
+    eUtils = enrollmentUtils()
+
+    # Generate the ephemeral key (CSPRNG) for file encryption.
+    yield ProgressEvent(STAGE_KEYS, 0, 1)
+    l = eUtils.generate_ephemeral_key(params.size, params.g)
+    hkey = pUtils.hash_key(l)
+
+    # Generate omega and s for the Kc key
+    w, s = eUtils.generate_Kc(params.size, params.g)
+    yield ProgressEvent(STAGE_KEYS, 1, 1)
+    cancel.raise_if_cancelled()
+
+    # Encrypt the file using the ephemeral key l, hashing the ciphertext as it is written
+    file_size = eUtils.get_file_size(file_path)
+    if output_path is None:
+        output_path = os.path.splitext(file_path)[0] + ".hypn"
+    encrypted_hash = hashlib.sha256()
+    encryptor = eUtils.iter_encrypt_file(file_path, l, output_path, hasher=encrypted_hash)
+    try:
+        for done in encryptor:
+            yield ProgressEvent(STAGE_ENCRYPT, done, file_size, "bytes")
+            cancel.raise_if_cancelled()
+    finally:
+        # Discards the partial output if we stopped early
+        encryptor.close()
+    encrypted_file_path = output_path
+
+    # Generate the CRP data and responses
+    f_double_circle = pUtils.generate_f_double_circle(
+        encrypted_file_path, [w, s], params.d, file_digest=encrypted_hash.digest()
+    )
+    yield ProgressEvent(STAGE_HASH, 1, 1)
+    challenges = pUtils.generate_challenges(s, params.D, num_challenges=params.size + 1)
+    yield ProgressEvent(STAGE_CHALLENGES, len(challenges), len(challenges))
+    responses = []
+    yield from pUtils.collect_responses(f_double_circle, challenges, params.alpha, params.beta, params.P, params.d,
+                                        responses, cancel)
+
+    # Use the first response (k0) to encrypt the description
+    k0 = responses[0]
+    encrypted_description = eUtils.encrypt_description(description, k0)
+
+    # Get the remaining responses and prepare subset
+    response = responses[1:]
+    subset_of_res = eUtils.subset_of_responses(l, response)
+
+    # Serialize and encode keys (Kc, Kr) and hash of ephemeral key
+    kc_encoded, kr_encoded, hkey_encoded = eUtils.serialize_and_encode_keys([w, s], subset_of_res, hkey)
+
+    # If an external path and password are provided, save keys to external storage
+    if external_path and external_pw:
+        # Use enrollmentUtils helper to save the keys and hash to a binary encrypted file
+        eUtils.save_keys_to_usb(kc_encoded, kr_encoded, hkey_encoded, external_path, external_pw)
+    yield ProgressEvent(STAGE_SERIALIZE, 1, 1)
+
+    # The .hypn is final (renamed into place), so its stamp matches the CRP data computed from it
+    crp_cache = resolve_cache(crp_cache)
+    if crp_cache is not None:
+        crp_cache.put(encrypted_file_path, kc_encoded, params, f_double_circle, responses)
+
+    # (Optional) Remove the original file - disabled for now
+    # os.remove(file_path)
+
+    # Store file information in a SimpleNamespace object (simulating database record)
+    file_info = eUtils.store_file(
+        filename, encrypted_file_path, encrypted_description,
+        file_extension, kc_encoded, kr_encoded, hkey_encoded, file_size, params=params.to_dict()
+    )
+
+    # End timer for the enrollment process
+    pUtils.log_timing(start_enrollment, "Enrollment process")
+
+    return file_info
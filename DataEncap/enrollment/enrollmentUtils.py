@@ -3,6 +3,9 @@ import os
 import pickle
 import secrets
 import hashlib
+import tempfile
+from contextlib import contextmanager
+from itertools import compress
 from types import SimpleNamespace
 
 from Crypto.Cipher import AES
@@ -11,6 +14,9 @@ from bitarray import bitarray
 
 from DataEncap.protocol_config import g
 
+# Plaintext is streamed through AES in chunks of this size (a multiple of the AES block size)
+ENCRYPT_CHUNK_SIZE = 1024 * 1024
+
 class enrollmentUtils:
     def break_runs(self, bit_array, n):
         result = bitarray()
@@ -29,43 +35,88 @@ class enrollmentUtils:
                 result.append(1)
         return result
 
-    def generate_ephemeral_key(self, size):
-        # Generate a random bitarray of length 'size', ensuring no long runs of zeros.
+    def generate_ephemeral_key(self, size, max_run=g):
+        # Generate a random bitarray of length 'size', ensuring no zero run longer than max_run.
         num_bytes = (size + 7) // 8
         random_bytes = secrets.token_bytes(num_bytes)
         key = bitarray()
         key.frombytes(random_bytes)
-        final_key = self.break_runs(key[:size], g)
+        final_key = self.break_runs(key[:size], max_run)
         return final_key
 
-    def generate_Kc(self, size):
+    def generate_Kc(self, size, max_run=g):
         # Generate two random bitarrays (omega and s) of length 'size'.
         num_bytes = (size + 7) // 8
         omega_bytes = secrets.token_bytes(num_bytes)
         s_bytes = secrets.token_bytes(num_bytes)
         omega = bitarray(); omega.frombytes(omega_bytes)
         s = bitarray(); s.frombytes(s_bytes)
-        return self.break_runs(omega[:size], g), self.break_runs(s[:size], g)
+        return self.break_runs(omega[:size], max_run), self.break_runs(s[:size], max_run)
 
-    def encrypt_file(self, filename, key):
+    def encrypt_file(self, filename, key, encrypted_filename=None, hasher=None):
         # Encrypt the file content with AES-256-CBC using the given key (bitarray or bytes).
+        # If a hashlib object is given it is updated with everything written (IV +
+        # ciphertext), sparing callers a re-read of the encrypted file.
+        if encrypted_filename is None:
+            base, ext = os.path.splitext(filename)
+            encrypted_filename = base + ".hypn"
+        for _ in self.iter_encrypt_file(filename, key, encrypted_filename, hasher):
+            pass
+        return encrypted_filename
+
+    def iter_encrypt_file(self, filename, key, encrypted_filename, hasher=None):
+        # Generator form of encrypt_file: yields the number of plaintext bytes encrypted
+        # after every chunk. The source is streamed through one reusable buffer and
+        # encrypted in place, so memory stays flat regardless of file size. Closing the
+        # generator early discards the partial output.
         if isinstance(key, bitarray):
             key = key.tobytes()
         if len(key) < 32:
             raise ValueError("Key must be at least 32 bytes long for AES-256.")
         key = key[:32]
         cipher = AES.new(key, AES.MODE_CBC)
-        with open(filename, "rb") as file:
-            plaintext = file.read()
-        padded_plaintext = pad(plaintext, AES.block_size, style="pkcs7")
-        ciphertext = cipher.encrypt(padded_plaintext)
-        base, ext = os.path.splitext(filename)
-        encrypted_filename = base + ".hypn"
-        # Write IV + ciphertext to the encrypted file
-        with open(encrypted_filename, "wb") as enc_file:
-            enc_file.write(cipher.iv)
-            enc_file.write(ciphertext)
-        return encrypted_filename
+        buffer = bytearray(ENCRYPT_CHUNK_SIZE)
+        view = memoryview(buffer)
+        done = 0
+        # Write IV + ciphertext to a temp file next to the target and rename it into
+        # place, so concurrent enrollments never observe or clobber a partial file
+        with open(filename, "rb") as file, self.atomic_writer(encrypted_filename) as enc_file:
+            def emit(chunk):
+                enc_file.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+
+            emit(cipher.iv)
+            while True:
+                n = file.readinto(view)
+                done += n
+                if n < ENCRYPT_CHUNK_SIZE:
+                    # Last (possibly empty) chunk carries the PKCS#7 padding
+                    emit(cipher.encrypt(pad(view[:n].tobytes(), AES.block_size, style="pkcs7")))
+                    break
+                cipher.encrypt(view, output=view)
+                emit(view)
+                yield done
+        yield done
+
+    @contextmanager
+    def atomic_writer(self, target_path):
+        # Open a temp file in the target's directory; it is renamed over target_path
+        # only when the block exits cleanly, otherwise it is removed.
+        target_path = os.fspath(target_path)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix="." + os.path.basename(target_path) + ".", suffix=".tmp",
+            dir=os.path.dirname(target_path) or "."
+        )
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                yield tmp_file
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, target_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
     def encrypt_description(self, description, key):
         # Encrypt the text description using AES-256-CBC and return base64 string.
@@ -106,11 +157,8 @@ class enrollmentUtils:
     def subset_of_responses(self, key, responses):
         if len(key) != len(responses):
             raise ValueError("Key and responses must have the same length.")
-        subset_responses = []
-        for i, bit in enumerate(key):
-            if bit == 1:
-                subset_responses.append(responses[i])
-        return subset_responses
+        # The responses at the key's 1 bits, in order
+        return list(compress(responses, key))
 
     def serialize_and_encode_keys(self, kc, kr, hkey):
         kc_encoded = base64.b64encode(pickle.dumps(kc)).decode("utf-8")
@@ -122,7 +170,7 @@ class enrollmentUtils:
         return os.path.getsize(file_path)
 
     def store_file(self, filename, file_path, file_description, file_extension,
-                   kc, kr, hkey, file_size) -> SimpleNamespace:
+                   kc, kr, hkey, file_size, params=None) -> SimpleNamespace:
         # Build and return a record object with attribute access (simulate DB record)
         record = SimpleNamespace(
             filename=filename,
@@ -132,7 +180,9 @@ class enrollmentUtils:
             kc=kc,
             kr=kr,
             hkey=hkey,
-            size=file_size
+            size=file_size,
+            # Parameter set (ParameterSet.to_dict()) the responses were generated with
+            params=params
         )
         return record
 
@@ -171,4 +221,4 @@ class enrollmentUtils:
             key_file.write(cipher.iv)
             key_file.write(ciphertext)
         # Successfully written keys to external file
-        return True
\ No newline at end of file
+        return True
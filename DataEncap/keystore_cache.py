@@ -0,0 +1,168 @@
+import contextlib
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+# Default lifetime of an unlocked keystore, in seconds
+DEFAULT_TTL = 300.0
+
+
+def keystore_identity(key_file_path):
+    """
+    Which keystore a path refers to right now: (real path, device, inode, size, mtime_ns).
+    Replacing or rewriting the file, or mounting another drive at the same path, changes it.
+    """
+    st = os.stat(key_file_path)
+    return os.path.realpath(key_file_path), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _wipe(buffer):
+    buffer[:] = bytes(len(buffer))
+
+
+class KeystoreCache:
+    """
+    Unlocked USB keystores (Kc, Kr and the key hash, still encoded) kept in memory for
+    `ttl` seconds after they were read, so a batch of decryptions against one drive reads
+    and decrypts each keystore once.
+
+    Entries are keyed by keystore_identity() and only returned for the password that
+    unlocked them (compared as an HMAC under a per-cache random key; the password itself
+    is not kept). The key material is held in bytearrays that are overwritten with zeros
+    when an entry expires, is replaced or the cache is cleared. A timer thread expires
+    entries even if the cache is never consulted again. Values handed out by get() are
+    ordinary strings owned by the caller and are not wiped.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._mac_key = secrets.token_bytes(32)
+        self._timer = None
+        self.hits = 0
+        self.misses = 0
+
+    def _password_tag(self, password):
+        return hmac.new(self._mac_key, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def get(self, key_file_path, password):
+        """Return (kc_encoded, kr_encoded, hkey_encoded) if the keystore is cached and unchanged, else None."""
+        try:
+            identity = keystore_identity(key_file_path)
+        except OSError:
+            return None
+        tag = self._password_tag(password)
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(identity)
+            if entry is None or not hmac.compare_digest(entry["tag"], tag):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return tuple(bytes(value).decode("utf-8") for value in entry["keys"])
+
+    def put(self, key_file_path, password, keys, identity=None):
+        """
+        Cache the decoded contents of a keystore. `identity` is the keystore_identity()
+        taken before the file was read (taken now if not given).
+        """
+        identity = identity or keystore_identity(key_file_path)
+        entry = {
+            "tag": self._password_tag(password),
+            "keys": [bytearray(value.encode("utf-8")) for value in keys],
+            "expires": time.monotonic() + self.ttl,
+        }
+        with self._lock:
+            self._discard(identity)
+            self._entries[identity] = entry
+            while len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]["expires"])
+                self._discard(oldest)
+            self._schedule()
+
+    def clear(self):
+        """Wipe and drop every entry."""
+        with self._lock:
+            for identity in list(self._entries):
+                self._discard(identity)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _discard(self, identity):
+        entry = self._entries.pop(identity, None)
+        if entry is not None:
+            for value in entry["keys"]:
+                _wipe(value)
+
+    def _expire(self, now):
+        for identity in [k for k, e in self._entries.items() if e["expires"] <= now]:
+            self._discard(identity)
+
+    def _schedule(self):
+        # One daemon timer, armed for the earliest expiry
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._entries:
+            return
+        delay = max(0.0, min(e["expires"] for e in self._entries.values()) - time.monotonic())
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._expire(time.monotonic())
+            self._schedule()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache consulted by verificationUtils.load_keys_from_usb while a session is open
+_active = None
+
+
+def active_cache():
+    """The KeystoreCache of the open session, or None (keystores are then read every time)."""
+    return _active
+
+
+@contextlib.contextmanager
+def session(ttl=DEFAULT_TTL):
+    """
+    Cache unlocked keystores process-wide until the block exits, each for at most `ttl`
+    seconds; everything is wiped on exit.
+
+    Usage:
+        with keystore_cache.session(ttl=600):
+            for record in records:
+                verification_protocol(record, external_path=usb, external_pw=pw)
+    """
+    global _active
+    previous, cache = _active, KeystoreCache(ttl)
+    _active = cache
+    try:
+        yield cache
+    finally:
+        _active = previous
+        cache.clear()
+
+
+def open_session(ttl=DEFAULT_TTL):
+    """
+    Start a session that lasts for the rest of the process (e.g. from a pool worker's
+    initializer), replacing any open one. Returns its cache.
+    """
+    global _active
+    if _active is not None:
+        _active.clear()
+    _active = KeystoreCache(ttl)
+    return _active
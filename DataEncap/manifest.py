@@ -0,0 +1,63 @@
+import json
+import os
+
+
+def read_manifest(manifest_path):
+    """
+    Load a batch manifest written by ManifestWriter.
+
+    The manifest is a JSON Lines file that is only ever appended to, so a later
+    record for the same source supersedes an earlier one. A torn final line left
+    by an interrupted run is ignored.
+
+    Args:
+        manifest_path (str): Path to the manifest file.
+
+    Returns:
+        dict: Mapping of source path -> latest record (dict). Empty if the file does not exist.
+    """
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path, "r", encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            source = record.get("source")
+            if source is not None:
+                records[source] = record
+    return records
+
+
+class ManifestWriter:
+    """
+    Append-only JSON Lines writer. Every record is flushed and fsynced before
+    append() returns, so a finished file is never lost if the run is interrupted.
+    """
+
+    def __init__(self, manifest_path):
+        dir_name = os.path.dirname(manifest_path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        self.manifest_path = manifest_path
+        self._file = open(manifest_path, "a", encoding="utf-8")
+
+    def append(self, record):
+        self._file.write(json.dumps(record, sort_keys=True) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+
+from DataEncap.progress import OperationCancelled
+
+# Upper bounds (seconds) of the duration histogram buckets; +Inf is implicit
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                    60.0, 120.0)
+
+# Counter family for each ProgressEvent unit worth counting across runs
+UNIT_COUNTERS = {
+    "bytes": ("dataencap_processed_bytes", "Bytes encrypted, hashed or decrypted, by stage."),
+    "responses": ("dataencap_responses_generated", "CRP responses generated."),
+    "candidates": ("dataencap_candidates_tried", "Key candidates hashed during key recovery."),
+}
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters and histograms, keyed by family name and labels.
+
+    Everything is kept as plain dicts and tuples so a snapshot can be pickled across
+    a process boundary and merged into the parent's registry (see take() / merge()).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def _family(self, name, kind, help_text, unit=None, buckets=None):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = {
+                "type": kind, "help": help_text, "unit": unit, "buckets": buckets, "samples": {},
+            }
+        elif family["type"] != kind:
+            raise ValueError(f"Metric {name} is a {family['type']}, not a {kind}")
+        return family
+
+    def inc(self, name, help_text, amount=1, **labels):
+        """Add `amount` to the counter `name` with the given labels."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._family(name, "counter", help_text)["samples"]
+            samples[key] = samples.get(key, 0) + amount
+
+    def observe(self, name, help_text, value, buckets=DURATION_BUCKETS, unit="seconds", **labels):
+        """Record `value` in the histogram `name` with the given labels."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._family(name, "histogram", help_text, unit, tuple(buckets))
+            counts, total, count = family["samples"].get(key) or ([0] * len(family["buckets"]), 0.0, 0)
+            counts = list(counts)
+            for i, bound in enumerate(family["buckets"]):
+                if value <= bound:
+                    counts[i] += 1
+            family["samples"][key] = (counts, total + value, count + 1)
+
+    def snapshot(self):
+        """A picklable deep copy of every family."""
+        with self._lock:
+            return {name: dict(family, samples=dict(family["samples"])) for name, family in self._families.items()}
+
+    def take(self):
+        """Snapshot and reset in one step, e.g. to ship a child process's metrics to its parent."""
+        with self._lock:
+            families, self._families = self._families, {}
+        return families
+
+    def merge(self, snapshot):
+        """Add the counts of a snapshot (from take() or snapshot()) to this registry."""
+        if not snapshot:
+            return
+        with self._lock:
+            for name, other in snapshot.items():
+                family = self._family(name, other["type"], other["help"], other["unit"], other["buckets"])
+                for key, value in other["samples"].items():
+                    if other["type"] == "counter":
+                        family["samples"][key] = family["samples"].get(key, 0) + value
+                    else:
+                        counts, total, count = family["samples"].get(key) or ([0] * len(family["buckets"]), 0.0, 0)
+                        family["samples"][key] = ([a + b for a, b in zip(counts, value[0])],
+                                                  total + value[1], count + value[2])
+
+    def reset(self):
+        with self._lock:
+            self._families = {}
+
+    def to_openmetrics(self):
+        """
+        Render the registry in the OpenMetrics text exposition format.
+
+        Returns:
+            str: The exposition, ending with "# EOF".
+        """
+        lines = []
+        for name, family in sorted(self.snapshot().items()):
+            lines.append(f"# TYPE {name} {family['type']}")
+            if family["unit"]:
+                lines.append(f"# UNIT {name} {family['unit']}")
+            lines.append(f"# HELP {name} {_escape(family['help'])}")
+            for key, value in sorted(family["samples"].items()):
+                if family["type"] == "counter":
+                    lines.append(f"{name}_total{_labels(key)} {_number(value)}")
+                    continue
+                counts, total, count = value
+                for bound, n in zip(family["buckets"], counts):
+                    lines.append(f"{name}_bucket{_labels(key + (('le', _number(float(bound))),))} {n}")
+                lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+                lines.append(f"{name}_sum{_labels(key)} {_number(total)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(text):
+    return str(text).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Process-wide registry the protocols report into
+REGISTRY = MetricsRegistry()
+
+# Process that REGISTRY's contents belong to; a forked child starts with a copy of them
+_registry_pid = os.getpid()
+
+
+def instrument(protocol, stages, registry=None):
+    """
+    Wrap a staged protocol generator so that its run is recorded in `registry`
+    (default: REGISTRY). Returns a generator that yields the same events and returns
+    the same value.
+
+    Only the time spent inside the wrapped generator counts, not the time the
+    consumer takes between events. The time up to each event is charged to that
+    event's stage, and anything after the last event to the last stage. Per run it records:
+        - dataencap_stage_duration_seconds{protocol, stage}: time per stage,
+        - dataencap_protocol_duration_seconds{protocol}: total protocol time,
+        - dataencap_runs{protocol, outcome}: outcome is ok, error or cancelled,
+        - the UNIT_COUNTERS families, from each stage's final `done` count.
+    """
+    registry = registry or REGISTRY
+    durations = {}
+    units = {}
+    stage = None
+    outcome = "error"
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                event = next(stages)
+            except BaseException:
+                # Finished (StopIteration) or failed: the tail belongs to the last stage
+                if stage is not None:
+                    durations[stage] += time.perf_counter() - start
+                raise
+            stage = event.stage
+            durations[stage] = durations.get(stage, 0.0) + time.perf_counter() - start
+            if event.unit in UNIT_COUNTERS:
+                units[(stage, event.unit)] = event.done
+            yield event
+    except StopIteration as stop:
+        outcome = "ok"
+        return stop.value
+    except (OperationCancelled, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        stages.close()
+        _record_run(registry, protocol, outcome, durations, units)
+
+
+def _record_run(registry, protocol, outcome, durations, units):
+    for stage, seconds in durations.items():
+        registry.observe("dataencap_stage_duration_seconds", "Time spent in each protocol stage, per run.",
+                         seconds, protocol=protocol, stage=stage)
+    registry.observe("dataencap_protocol_duration_seconds", "Time spent in the whole protocol, per run.",
+                     sum(durations.values()), protocol=protocol)
+    registry.inc("dataencap_runs", "Protocol runs by outcome (ok, error, cancelled).",
+                 protocol=protocol, outcome=outcome)
+    for (stage, unit), done in units.items():
+        name, help_text = UNIT_COUNTERS[unit]
+        labels = {"protocol": protocol, "stage": stage} if unit == "bytes" else {"protocol": protocol}
+        registry.inc(name, help_text, done, **labels)
+
+
+def write_openmetrics(path, registry=None):
+    """Write (atomically) the OpenMetrics exposition of `registry` (default: REGISTRY) to path."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write((registry or REGISTRY).to_openmetrics())
+    os.replace(tmp, path)
+
+
+def metered(fn, *args, **kwargs):
+    """
+    Process-pool task wrapper: run fn and return (result, metrics recorded in this
+    process), for the parent to merge() into its own registry.
+    """
+    global _registry_pid
+    if os.getpid() != _registry_pid:
+        # Forked worker: drop what was inherited from the parent, or it would be merged back twice
+        REGISTRY.reset()
+        _registry_pid = os.getpid()
+    result = fn(*args, **kwargs)
+    return result, REGISTRY.take()
@@ -0,0 +1,91 @@
+import threading
+from dataclasses import dataclass
+
+# Stage names reported by the staged protocol APIs
+STAGE_KEYS = "keys"
+STAGE_ENCRYPT = "encrypt"
+STAGE_HASH = "hash"
+STAGE_CHALLENGES = "challenges"
+STAGE_RESPONSES = "responses"
+STAGE_SERIALIZE = "serialize"
+STAGE_ERROR_DETECTION = "error_detection"
+STAGE_CANDIDATES = "candidates"
+STAGE_DECRYPT = "decrypt"
+
+STAGE_LABELS = {
+    STAGE_KEYS: "Generating / retrieving keys",
+    STAGE_ENCRYPT: "Encrypting file content",
+    STAGE_HASH: "Hashing encrypted file (f°°)",
+    STAGE_CHALLENGES: "Generating challenges",
+    STAGE_RESPONSES: "Generating responses",
+    STAGE_SERIALIZE: "Encrypting description and serializing keys",
+    STAGE_ERROR_DETECTION: "Running error detection",
+    STAGE_CANDIDATES: "Searching key candidates",
+    STAGE_DECRYPT: "Decrypting file content",
+}
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """
+    One progress report from a staged protocol run.
+
+    Attributes:
+        stage (str): One of the STAGE_* names.
+        done (int): Units completed so far within the stage.
+        total (int): Units expected for the stage (0 if unknown).
+        unit (str): What is being counted ("bytes", "responses", "candidates", "steps").
+    """
+    stage: str
+    done: int
+    total: int
+    unit: str = "steps"
+
+    @property
+    def fraction(self):
+        if self.total <= 0:
+            return 0.0
+        return min(1.0, self.done / self.total)
+
+    @property
+    def label(self):
+        return STAGE_LABELS.get(self.stage, self.stage)
+
+
+class OperationCancelled(Exception):
+    """Raised inside a staged protocol run when its CancelToken is cancelled."""
+
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag checked by the staged protocols at chunk boundaries.
+    Any object with is_set()/set() (e.g. a multiprocessing Event) can back it.
+    """
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    @property
+    def event(self):
+        """The underlying event, e.g. to hand the same flag to a child process."""
+        return self._event
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled("Operation cancelled")
+
+
+def drain(stages):
+    """Run a staged generator to completion, discarding its events, and return its result."""
+    while True:
+        try:
+            next(stages)
+        except StopIteration as stop:
+            return stop.value
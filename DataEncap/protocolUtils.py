@@ -1,12 +1,69 @@
 import hashlib
 import time
+from functools import lru_cache
 
+import numpy as np
 from bitarray import bitarray
-from DataEncap.enrollment.enrollmentUtils import enrollmentUtils
+from DataEncap.digest_cache import resolve_digest_cache
+from DataEncap.progress import ProgressEvent, STAGE_RESPONSES
+from DataEncap.protocol_config import MAX_D, size
+
+# Length of the first response (k0), which is used as an AES-256 key for the description
+K0_BITS = 256
+
+
+# Responses are gathered in blocks of this many challenges at a time
+RESPONSE_BLOCK = 256
+
+
+@lru_cache(maxsize=64)
+def lcg_coefficients(alpha, beta, steps, d):
+    """
+    Affine form of the first `steps` outputs of the linear congruent RNG: the k-th
+    position generated from seed x is (A_k * x + B_k) % d. Cached, so each parameter
+    set computes its tables once per process instead of once per challenge.
+
+    Returns:
+    (np.ndarray, np.ndarray): A and B, read-only uint64 arrays of length `steps`.
+    """
+    a_list, b_list = [], []
+    a, b = 1, 0
+    for _ in range(steps):
+        a, b = (alpha * a) % d, (alpha * b + beta) % d
+        a_list.append(a)
+        b_list.append(b)
+    tables = np.array(a_list, dtype=np.uint64), np.array(b_list, dtype=np.uint64)
+    for table in tables:
+        table.flags.writeable = False
+    return tables
+
+
+@lru_cache(maxsize=64)
+def challenge_weights(D):
+    """Place values (2^(D-1) ... 1) that turn a row of D challenge bits into its integer."""
+    weights = np.left_shift(np.uint64(1), np.arange(D - 1, -1, -1, dtype=np.uint64))
+    weights.flags.writeable = False
+    return weights
+
+
+def gather_bits(f_bytes, positions):
+    """
+    Read the bits at `positions` (bit 0 = most significant bit of byte 0, as in a
+    big-endian bitarray) straight from the packed buffer, with shift and mask.
+
+    Args:
+    f_bytes (np.ndarray): The packed buffer as uint8.
+    positions (np.ndarray): uint64 bit positions, any shape.
+
+    Returns:
+    np.ndarray: uint8 array of 0/1 with the shape of positions.
+    """
+    shifts = (np.uint64(7) - (positions & np.uint64(7))).astype(np.uint8)
+    return (f_bytes[positions >> np.uint64(3)] >> shifts) & np.uint8(1)
 
 
 class protocolUtils:
-    def generate_f_double_circle(self, f_circle, kc, d):
+    def generate_f_double_circle(self, f_circle, kc, d, file_digest=None, digest_cache=False):
         """
         Generate f_double_circle by hashing the tax file content, concatenating with omega,
         and using SHAKE-256.
@@ -15,6 +72,11 @@ class protocolUtils:
         f_circle (str): The path to the tax file to be hashed.
         kc (list): A list containing the omega and s bitarrays.
         d (int): The desired size of the output in bits.
+        file_digest (bytes, optional): SHA-256 of the file if the caller already has it
+            (e.g. computed while writing it); the file is then not read again.
+        digest_cache (DigestCache or bool, optional): Persistent digest cache consulted
+            before hashing the file; True uses digest_cache.default_cache(). Off by default,
+            since f_circle may be a plaintext file: only pass it for encrypted files.
 
         Returns:
         bytes: The generated f_double_circle as a byte sequence of length d // 8.
@@ -24,13 +86,18 @@ class protocolUtils:
             raise ValueError("kc must be a list containing two bitarrays.")
 
         # Hash the file content (e.g., tax file)
-        h = hashlib.sha256()
-        with open(f_circle, "rb") as file:
-            for chunk in iter(lambda: file.read(65536), b""):  # 64KB chunks
-                h.update(chunk)
+        if file_digest is None:
+            digest_cache = resolve_digest_cache(digest_cache)
+            if digest_cache is not None:
+                file_digest = digest_cache.sha256(f_circle)
+            else:
+                h = hashlib.sha256()
+                for _ in self.iter_hash_file(f_circle, h):
+                    pass
+                file_digest = h.digest()
 
         # Convert the digest to a bitarray
-        digest = h.digest()
+        digest = file_digest
         h_bits = bitarray()
         h_bits.frombytes(digest)
 
@@ -45,97 +112,122 @@ class protocolUtils:
 
         return f_double_circle
 
-    def generate_challenges(self, s, D):
+    def iter_hash_file(self, path, hasher, chunk_size=65536):
+        """
+        Feed a file into a hashlib object in chunks (64KB by default), yielding the
+        number of bytes hashed so far after each chunk.
+        """
+        done = 0
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                hasher.update(chunk)
+                done += len(chunk)
+                yield done
+
+    def generate_challenges(self, s, D, num_challenges=size + 1):
         """
         Generate a list of challenges from a given bitarray (s) and a challenge size (D).
 
         Args:
         s (bitarray): The input bitarray from which to generate challenges.
         D (int): The size of each challenge in bits.
+        num_challenges (int, optional): How many challenges to derive: one per key bit,
+            plus one for k0 (the description key). Defaults to protocol_config.size + 1.
 
         Returns:
-        list: A list of challenges of size D (bitarrays).
+        list: A list of challenges, each an int in [0, 2**D).
         """
 
         if not isinstance(s, bitarray):
             raise ValueError("s must be a bitarray.")
 
-        if D <= 0:
-            raise ValueError("D must be a positive integer.")
+        if D <= 0 or D > MAX_D:
+            raise ValueError(f"D must be an integer in [1, {MAX_D}].")
 
-        # Number of challenges to generate (256 + 1)
-        num_challenges = 256 + 1
-        #num_challenges = 256 # Not + 1 because we don't need any abstract for now
         total_bits = num_challenges * D
         total_bytes = (total_bits + 7) // 8  # Round up to the nearest byte
 
-        # Convert s to bytes and hash it
-        s_bytes = s.tobytes()
+        # Hash s into a digest of length total_bytes
         shake = hashlib.shake_256()
-        shake.update(s_bytes)
+        shake.update(s.tobytes())
+        digest = np.frombuffer(shake.digest(total_bytes), dtype=np.uint8)
 
-        # Generate a digest of length total_bytes
-        digest = shake.digest(total_bytes)
-
-        # Convert the digest to a binary string
-        bit_string = ''.join(format(byte, '08b') for byte in digest)
-
-        # Split the bit string into chunks of size D
-        challenges = [bit_string[i:i+D] for i in range(0, len(bit_string), D)]
+        # Cut consecutive D-bit chunks off the front (the byte-rounding padding at the end
+        # is dropped, so num_challenges * D need not be a multiple of 8)
+        bits = np.unpackbits(digest)[:total_bits].reshape(num_challenges, D).astype(np.uint64)
+        challenges = (bits @ challenge_weights(D)).tolist()
 
         return challenges
 
-    def generate_responses(self, f_double_circle, challenges, alpha, beta, P, d):
+    def generate_responses(self, f_double_circle, challenges, alpha, beta, P, d, first_length=K0_BITS):
         """
         Generate a list of bitarrays (responses) from the f_double_circle, challenges
         and linear congruent parameters.
 
         Args:
         f_double_circle (bytes): The input byte data (e.g., hash digest).
-        challenges (list): A list of bit strings challenges.
+        challenges (list): A list of int challenges (D-bit strings are accepted too).
         alpha (int): The multiplier parameter for the linear congruent RNG.
         beta (int): The increment parameter for the linear congruent RNG.
         P (int): The number of bits to collect from each response.
         d (int): The modulo parameter for the linear congruent RNG.
+        first_length (int, optional): Bits in the first response (k0, the AES-256 key of the
+            description), whatever the key size. Defaults to K0_BITS.
 
         Returns:
         list: A list of bitarrays responses.
         """
-        # Convert challenges into a list of integers
-        digits = [int(chunk, 2) for chunk in challenges]
-
-        # Convert f_double_circle to a bitarray
-        f_bits = bitarray()
-        f_bits.frombytes(f_double_circle)
+        return list(self.iter_responses(f_double_circle, challenges, alpha, beta, P, d, first_length))
 
+    def iter_responses(self, f_double_circle, challenges, alpha, beta, P, d, first_length=K0_BITS):
+        """
+        Generator form of generate_responses: yields each response bitarray as soon as it
+        is gathered, in challenge order.
+        """
+        seeds = np.array([int(c, 2) if isinstance(c, str) else c for c in challenges], dtype=np.uint64)
+
+        # Bits are read from the packed bytes; f°° is never unpacked into one bit per element
+        f_bytes = np.frombuffer(f_double_circle, dtype=np.uint8)
+        if len(f_bytes) * 8 < d:
+            raise ValueError(f"f_double_circle has {len(f_bytes) * 8} bits, positions range up to {d}.")
+        if d > 2 ** MAX_D:
+            raise ValueError(f"d must be at most 2**{MAX_D}.")
+        d = np.uint64(d)
+
+        # The first response (k0) is first_length bits long, the others P bits
+        if len(seeds):
+            a, b = lcg_coefficients(alpha, beta, first_length, int(d))
+            yield self._pack_responses(gather_bits(f_bytes, (a * seeds[0] + b) % d)[np.newaxis], first_length)[0]
+
+        # All positions of a block of challenges at once: (A_k * x + B_k) % d for every seed x and step k
+        a, b = lcg_coefficients(alpha, beta, P, int(d))
+        for start in range(1, len(seeds), RESPONSE_BLOCK):
+            block = seeds[start:start + RESPONSE_BLOCK, np.newaxis]
+            yield from self._pack_responses(gather_bits(f_bytes, (block * a + b) % d), P)
+
+    def _pack_responses(self, bits, length):
+        # One bitarray of `length` bits per row of a 0/1 uint8 matrix
+        packed = np.packbits(bits, axis=1)
         responses = []
-
-        # Loop through each challenge
-        for i, digit in enumerate(digits):
-            # Set the target response length: 256 bits for the first challenge, P bits for the rest
-            target_length = 256 if i == 0 else P
-            #target_length = P # We don't need any abstract for now
-
-            # Generate positions using the linear congruent RNG
-            positions = enrollmentUtils().linear_congruent_rng(alpha, beta, digit, target_length, d)
-
-            # Generate the response bitarray
+        for row in packed:
             response = bitarray()
-            for j, pos in enumerate(positions):
-                try:
-                    if pos >= len(f_bits):
-                        raise IndexError(f"Position {pos} is out of bounds for response {i}.")
-                    response.append(f_bits[pos])
-                    if len(response) == target_length:
-                        break  # Stop if we reach the target length
-                except IndexError as e:
-                    print(f"Error at digit {i}, position {j}: {e}")
-                    continue
-
+            response.frombytes(row.tobytes())
+            del response[length:]
             responses.append(response)
-
         return responses
 
+    def collect_responses(self, f_double_circle, challenges, alpha, beta, P, d, responses, cancel, report_every=32):
+        """
+        Append the responses for `challenges` to the `responses` list, yielding a
+        ProgressEvent every `report_every` responses and checking `cancel` each time.
+        """
+        total = len(challenges)
+        for response in self.iter_responses(f_double_circle, challenges, alpha, beta, P, d):
+            responses.append(response)
+            if len(responses) % report_every == 0 or len(responses) == total:
+                yield ProgressEvent(STAGE_RESPONSES, len(responses), total, "responses")
+                cancel.raise_if_cancelled()
+
     def hash_key(self, key):
         if isinstance(key, str):
             key = key.encode("utf-8")
@@ -145,7 +237,7 @@ class protocolUtils:
         return hashlib.sha3_256(key).hexdigest()
 
     def log_timing(self, start_time, message):
-        end_time = time.time()
+        end_time = time.perf_counter()
         elapsed_time = end_time - start_time
         print(f"{message} took: {elapsed_time:.6f} seconds")
         return elapsed_time
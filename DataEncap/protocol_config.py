@@ -1,3 +1,5 @@
+from dataclasses import asdict, dataclass, fields
+
 # Constants for cryptographic operations
 BER = 0
 size = 256
@@ -8,3 +10,90 @@ beta = 73
 P = 8
 gamma0 = 6
 g = gamma0 - 1
+
+# Largest supported D: LCG positions are computed in uint64, where A * x + B must not overflow
+MAX_D = 32
+
+
+@dataclass(frozen=True)
+class ParameterSet:
+    """
+    One complete set of protocol parameters. Enrollment records the set it used in the
+    file info record, and verification reads it back from there, so files enrolled
+    with different sets can be processed side by side in one process.
+
+    Attributes:
+        size (int): Ephemeral key length in bits (one response per bit).
+        D (int): Challenge length in bits; f°° has d = 2**D bits.
+        alpha (int): LCG multiplier.
+        beta (int): LCG increment.
+        P (int): Bits per response.
+        gamma0 (int): Error-detection window; keys have no zero run longer than gamma0 - 1.
+        BER (float): Bit-error tolerance of a response match.
+    """
+    size: int = size
+    D: int = D
+    alpha: int = alpha
+    beta: int = beta
+    P: int = P
+    gamma0: int = gamma0
+    BER: float = BER
+
+    def __post_init__(self):
+        if self.size < 256:
+            raise ValueError("size must be at least 256 bits (the key is used for AES-256)")
+        if not 3 <= self.D <= MAX_D or self.P <= 0:
+            raise ValueError(f"D must be in [3, {MAX_D}] (f°° is d / 8 whole bytes) and P positive")
+        if self.gamma0 < 2:
+            raise ValueError("gamma0 must be at least 2")
+        if not 0 <= self.BER < 1:
+            raise ValueError("BER must be in [0, 1)")
+
+    @property
+    def d(self):
+        return 2 ** self.D
+
+    @property
+    def g(self):
+        return self.gamma0 - 1
+
+    def to_dict(self):
+        """Plain (JSON-serializable) form stored in enrollment records."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverse of to_dict(); unknown keys are ignored, missing ones take the defaults."""
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in names})
+
+
+# The module constants above, as a parameter set; also assumed for records that predate parameter sets
+DEFAULT_PARAMS = ParameterSet()
+
+# Named parameter sets selectable from the batch CLI and the HTTP service
+PROFILES = {
+    "default": DEFAULT_PARAMS,
+    # Smaller f°° (512 bytes) for bulk, low-value files
+    "fast": ParameterSet(D=12),
+    # Larger f°° and longer responses: fewer collisions, more work per response
+    "strong": ParameterSet(D=20, P=16),
+    # 4096-bit keys; P=16 keeps response collisions, and so the key candidates, rare at that size
+    "large": ParameterSet(size=4096, P=16),
+}
+
+
+def resolve_params(params):
+    """Accept a ParameterSet, a profile name, a dict (as stored in a record) or None (the default set)."""
+    if params is None:
+        return DEFAULT_PARAMS
+    if isinstance(params, ParameterSet):
+        return params
+    if isinstance(params, str):
+        try:
+            return PROFILES[params]
+        except KeyError:
+            raise ValueError(f"Unknown parameter profile {params!r} (known: {', '.join(PROFILES)})")
+    if isinstance(params, dict):
+        return ParameterSet.from_dict(params)
+    raise TypeError(f"Cannot use {type(params).__name__} as protocol parameters")
@@ -1,10 +1,22 @@
+import contextlib
+import hashlib
 import time
 
-from DataEncap.protocol_config import d, D, alpha, beta, P, gamma0, BER, size
+from DataEncap.crp_cache import file_stamp, resolve_cache
+from DataEncap.digest_cache import resolve_digest_cache
+from DataEncap.protocol_config import DEFAULT_PARAMS, resolve_params
+from DataEncap.enrollment.enrollmentUtils import enrollmentUtils
+from DataEncap.metrics import REGISTRY, instrument
+from DataEncap.progress import (
+    CancelToken, ProgressEvent, drain,
+    STAGE_KEYS, STAGE_HASH, STAGE_CHALLENGES, STAGE_RESPONSES, STAGE_ERROR_DETECTION, STAGE_CANDIDATES,
+    STAGE_DECRYPT,
+)
 from DataEncap.protocolUtils import protocolUtils
 from DataEncap.verification.verificationUtils import verificationUtils
 
-def verification_protocol(file_info, external_path=None, external_pw=None):
+def verification_protocol(file_info, external_path=None, external_pw=None, stats=None, output_path=None,
+                          params=None, crp_cache=None, digest_cache=None):
     """
     Recover the keys and run the verification protocol to decrypt the file and verify integrity.
 
@@ -12,50 +24,203 @@ def verification_protocol(file_info, external_path=None, external_pw=None):
         file_info: SimpleNamespace or dict containing file information (including encoded keys).
         external_path (str, optional): Path to external storage for retrieving keys.
         external_pw (str, optional): Password to decrypt the stored keys.
+        stats (dict, optional): Filled with key-recovery statistics ("candidates",
+            "candidates_tried", "key_recovered") and "error" if the protocol fails.
+        output_path (str, optional): Stream the plaintext to this file instead of returning it.
+        params (ParameterSet or str, optional): Protocol parameters. Defaults to the set
+            recorded in file_info (DEFAULT_PARAMS for records enrolled before parameter sets
+            were recorded); if given, it must match the recorded set.
+        crp_cache (CRPCache or bool, optional): Where to look up and keep f°° and the responses
+            of an unchanged encrypted file, so a repeat verification skips hashing the file.
+            Defaults to crp_cache.CRP_CACHE; False disables caching (do that if someone else
+            could rewrite the file and restore its size and mtime). stats["crp_cache"] records
+            "hit", "miss" or "off".
+        digest_cache (DigestCache or bool, optional): Persistent SHA-256 cache of encrypted
+            files, consulted on a CRP cache miss so an unchanged file is not hashed again in a
+            later run. Defaults to digest_cache.default_cache(), which is off unless
+            VT_DIGEST_CACHE is set; False always hashes the file. stats["digest_cache"] records "hit", "miss" or "off".
 
     Returns:
-        (bytes or None, str or None): The decrypted file bytes and the decrypted description (or None on failure).
+        (bytes or None, str or None): The decrypted file bytes (or output_path if given) and the
+        decrypted description (or None on failure).
     """
     try:
-        start_time = time.time()
-        pUtils = protocolUtils()
-        vUtils = verificationUtils()
+        return drain(verification_stages(
+            file_info, external_path=external_path, external_pw=external_pw, stats=stats,
+            output_path=output_path, params=params, crp_cache=crp_cache, digest_cache=digest_cache,
+        ))
 
-        # Retrieve keys from external file if provided, otherwise use stored values
-        if external_path and external_pw:
-            kc_enc, kr_enc, hkey_enc = vUtils.load_keys_from_usb(external_path, external_pw)
-        else:
-            kc_enc, kr_enc, hkey_enc = file_info.kc, file_info.kr, file_info.hkey
+    except Exception as e:
+        if stats is not None:
+            stats["error"] = str(e)
+        print(f"Verification protocol failed: {e}")
+        return None, None
 
-        # Decode the keys and hash to their original forms
-        kc, kr, hkey = vUtils.retrieve_encryption_keys(kc_enc, kr_enc, hkey_enc)
 
-        # Reconstruct CRP data and responses using Kc
-        f_double_circle = pUtils.generate_f_double_circle(file_info.file_path, [kc[0], kc[1]], d)
-        challenges = pUtils.generate_challenges(kc[1], D)
-        responses = pUtils.generate_responses(f_double_circle, challenges, alpha, beta, P, d)
+def verification_stages(file_info, external_path=None, external_pw=None, stats=None, output_path=None,
+                        cancel=None, digest_plaintext=False, params=None, crp_cache=None, sink=None,
+                        digest_cache=None):
+    """
+    Staged form of verification_protocol: a generator that yields ProgressEvent objects
+    (bytes hashed, responses generated, candidates tried, bytes decrypted) while it runs
+    and returns (plaintext, description) when exhausted. Errors propagate to the caller.
+
+    Args:
+        file_info, external_path, external_pw, stats, output_path, params, crp_cache,
+            digest_cache: As for verification_protocol.
+        cancel (CancelToken, optional): Checked at every chunk boundary; when cancelled,
+            OperationCancelled is raised and no partial output file is left behind.
+        digest_plaintext (bool, optional): Also SHA-256 the plaintext as it is decrypted and
+            store the hex digest in stats["plaintext_sha256"], so later steps (e.g. the NFT
+            protocol) need not read the decrypted file again.
+        sink (callable, optional): Called with each plaintext chunk, in order, instead of
+            collecting the plaintext or writing output_path (e.g. to stream it elsewhere).
 
-        # Use the first response (k0) to decrypt the description
-        k0 = responses[0]
-        decrypted_description = vUtils.decrypt_description(file_info.file_description, k0)
+    Returns:
+        (bytes or str or None, str): The plaintext (output_path if given, None if streamed to
+        sink) and the description (as StopIteration value).
 
-        # Use remaining responses for error detection and key recovery
-        response = responses[1:]
-        match_index, collision_index, ftd_index = vUtils.error_detection(response, kr, gamma0, BER, size)
-        updated_matches_index, updated_collision_index = vUtils.merge_matches_with(match_index, collision_index)
-        updated_matches_index, updated_ftd_index = vUtils.merge_matches_with(updated_matches_index, ftd_index)
+    Every run is recorded in DataEncap.metrics.REGISTRY (see metrics.instrument).
+    """
+    return instrument("verification", _verification_stages(
+        file_info, external_path, external_pw, stats, output_path, cancel, digest_plaintext, params, crp_cache,
+        sink, digest_cache,
+    ))
 
-        # Generate possible key from matches/collisions and verify against hash
-        l = vUtils.generate_possible_keys(updated_matches_index, updated_collision_index, updated_ftd_index, size, hkey)
 
-        # Decrypt the file using the recovered key
-        decrypted_file = vUtils.decrypt_file(file_info.file_path, l)
+def record_params(file_info, params=None):
+    """
+    The parameter set a record was enrolled with. Raises ValueError if `params` is
+    given and differs from it, since the responses could never match.
+    """
+    recorded = getattr(file_info, "params", None)
+    recorded = resolve_params(recorded) if recorded else DEFAULT_PARAMS
+    if params is not None and resolve_params(params) != recorded:
+        raise ValueError(f"File was enrolled with {recorded}, not {resolve_params(params)}")
+    return recorded
 
-        # End time for the verification process
-        pUtils.log_timing(start_time, "Verification process")
 
-        return decrypted_file, decrypted_description
+def _verification_stages(file_info, external_path, external_pw, stats, output_path, cancel, digest_plaintext,
+                         params, crp_cache, sink, digest_cache):
+    cancel = cancel or CancelToken()
+    params = record_params(file_info, params)
+    crp_cache = resolve_cache(crp_cache)
+    digest_cache = resolve_digest_cache(digest_cache)
+    if stats is None:
+        stats = {}
+    start_time = time.perf_counter()
+    pUtils = protocolUtils()
+    vUtils = verificationUtils()
 
-    except Exception as e:
-        print(f"Verification protocol failed: {e}")
-        return None, None
\ No newline at end of file
+    # Retrieve keys from external file if provided, otherwise use stored values
+    yield ProgressEvent(STAGE_KEYS, 0, 1)
+    if external_path and external_pw:
+        kc_enc, kr_enc, hkey_enc = vUtils.load_keys_from_usb(external_path, external_pw)
+    else:
+        kc_enc, kr_enc, hkey_enc = file_info.kc, file_info.kr, file_info.hkey
+
+    # Decode the keys and hash to their original forms
+    kc, kr, hkey = vUtils.retrieve_encryption_keys(kc_enc, kr_enc, hkey_enc)
+    yield ProgressEvent(STAGE_KEYS, 1, 1)
+    cancel.raise_if_cancelled()
+
+    # Reuse f°° and the responses if this file and Kc were seen before and the file is unchanged
+    crp = crp_cache.get(file_info.file_path, kc_enc, params) if crp_cache is not None else None
+    stats["crp_cache"] = "off" if crp_cache is None else "hit" if crp is not None else "miss"
+    if crp_cache is not None:
+        REGISTRY.inc("dataencap_crp_cache_lookups", "CRP cache lookups during verification, by result.",
+                     result=stats["crp_cache"])
+    if crp is not None:
+        encrypted_size = crp.encrypted_size
+        responses = list(crp.responses)
+        yield ProgressEvent(STAGE_HASH, 1, 1)
+        yield ProgressEvent(STAGE_RESPONSES, len(responses), len(responses))
+    else:
+        # Reconstruct CRP data and responses using Kc; the stamp is taken before hashing, so a
+        # file changed meanwhile never matches the cached entry
+        stamp = file_stamp(file_info.file_path)
+        encrypted_size = stamp[2]
+        file_digest = digest_cache.get(file_info.file_path) if digest_cache is not None else None
+        stats["digest_cache"] = "off" if digest_cache is None else "hit" if file_digest is not None else "miss"
+        if digest_cache is not None:
+            REGISTRY.inc("dataencap_digest_cache_lookups", "Persistent digest cache lookups during verification, "
+                         "by result.", result=stats["digest_cache"])
+        if file_digest is not None:
+            yield ProgressEvent(STAGE_HASH, encrypted_size, encrypted_size, "bytes")
+        else:
+            encrypted_hash = hashlib.sha256()
+            for done in pUtils.iter_hash_file(file_info.file_path, encrypted_hash, chunk_size=1024 * 1024):
+                yield ProgressEvent(STAGE_HASH, done, encrypted_size, "bytes")
+                cancel.raise_if_cancelled()
+            file_digest = encrypted_hash.digest()
+            if digest_cache is not None:
+                digest_cache.put(file_info.file_path, file_digest, stamp)
+        f_double_circle = pUtils.generate_f_double_circle(
+            file_info.file_path, [kc[0], kc[1]], params.d, file_digest=file_digest
+        )
+        challenges = pUtils.generate_challenges(kc[1], params.D, num_challenges=params.size + 1)
+        yield ProgressEvent(STAGE_CHALLENGES, len(challenges), len(challenges))
+        responses = []
+        yield from pUtils.collect_responses(f_double_circle, challenges, params.alpha, params.beta, params.P,
+                                            params.d, responses, cancel)
+        if crp_cache is not None:
+            crp_cache.put(file_info.file_path, kc_enc, params, f_double_circle, responses, stamp=stamp)
+
+    # Use the first response (k0) to decrypt the description
+    k0 = responses[0]
+    decrypted_description = vUtils.decrypt_description(file_info.file_description, k0)
+
+    # Use remaining responses for error detection and key recovery
+    response = responses[1:]
+    match_index, collision_index, ftd_index = vUtils.error_detection(
+        response, kr, params.gamma0, params.BER, params.size
+    )
+    updated_matches_index, updated_collision_index = vUtils.merge_matches_with(match_index, collision_index)
+    updated_matches_index, updated_ftd_index = vUtils.merge_matches_with(updated_matches_index, ftd_index)
+    yield ProgressEvent(STAGE_ERROR_DETECTION, 1, 1)
+    cancel.raise_if_cancelled()
+
+    # Generate possible key from matches/collisions and verify against hash
+    search = vUtils.iter_possible_keys(updated_matches_index, updated_collision_index, updated_ftd_index,
+                                       params.size, hkey, stats=stats)
+    while True:
+        try:
+            tried = next(search)
+        except StopIteration as stop:
+            l = stop.value
+            break
+        yield ProgressEvent(STAGE_CANDIDATES, tried, stats["candidates"], "candidates")
+        cancel.raise_if_cancelled()
+    yield ProgressEvent(STAGE_CANDIDATES, stats["candidates_tried"], stats["candidates"], "candidates")
+
+    # Decrypt the file using the recovered key, to the sink, to memory or straight to output_path
+    with contextlib.ExitStack() as stack:
+        if sink is not None:
+            write = sink
+        elif output_path is None:
+            plaintext = bytearray()
+            write = plaintext.extend
+        else:
+            write = stack.enter_context(enrollmentUtils().atomic_writer(output_path)).write
+        if digest_plaintext:
+            plaintext_hash = hashlib.sha256()
+            target = write
+
+            def write(chunk):
+                target(chunk)
+                plaintext_hash.update(chunk)
+        decryptor = stack.enter_context(contextlib.closing(vUtils.iter_decrypt_file(file_info.file_path, l, write)))
+        for done in decryptor:
+            yield ProgressEvent(STAGE_DECRYPT, done, encrypted_size - 16, "bytes")
+            cancel.raise_if_cancelled()
+    if sink is not None:
+        decrypted_file = None
+    else:
+        decrypted_file = bytes(plaintext) if output_path is None else output_path
+    if digest_plaintext:
+        stats["plaintext_sha256"] = plaintext_hash.hexdigest()
+
+    # End time for the verification process
+    pUtils.log_timing(start_time, "Verification process")
+
+    return decrypted_file, decrypted_description
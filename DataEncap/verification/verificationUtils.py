@@ -1,4 +1,5 @@
 import base64
+import heapq
 import os
 import pickle
 from itertools import product
@@ -6,17 +7,22 @@ from itertools import product
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
 from bitarray import bitarray
+from bitarray.util import count_xor
 
-from DataEncap.protocol_config import g
+from DataEncap import keystore_cache
+from DataEncap.progress import drain
 from DataEncap.protocolUtils import protocolUtils
 import hashlib  # for key derivation in load_keys_from_usb
 
+# Ciphertext is decrypted in chunks of this size (a multiple of the AES block size)
+DECRYPT_CHUNK_SIZE = 1024 * 1024
+
 class verificationUtils:
     def find_match(self, b1, b2, tolerance):
         if len(b1) != len(b2):
             raise ValueError("Bitarrays must be of the same length.")
-        hamming_distance = (b1 ^ b2).count()
-        return hamming_distance <= tolerance
+        # count_xor counts differing bits without building the XOR bitarray
+        return count_xor(b1, b2) <= tolerance
 
     def check_match(self, gamma, i, responses, subres, BER):
         tolerance_bits = int(len(subres) * BER)
@@ -35,11 +41,17 @@ class verificationUtils:
             nomatch = [i + g for g in range(gamma) if (i + g) < len(responses)]
         return len(match_idx), match_idx, nomatch
 
-    def error_detection(self, responses, subres, gamma0, BER, num_responses):
+    def error_detection(self, responses, subres, gamma0, BER, num_responses=None):
+        # Each stored response is compared against a window of gamma regenerated ones, so the
+        # work is linear in the key size. num_responses defaults to len(responses).
+        if num_responses is None:
+            num_responses = len(responses)
         match_idx = []
         collision_idx = []
         ftd_idx = []
         i, j = 0, 0
+        # Longest run of unselected responses the enrolled key allows (see break_runs)
+        g = gamma0 - 1
         gamma = gamma0
         while j < len(subres):
             gamma = min(gamma, num_responses - i)
@@ -59,14 +71,35 @@ class verificationUtils:
         return match_idx, collision_idx, ftd_idx
 
     def merge_matches_with(self, a, b):
+        # Every index in a that also appears in a sublist of b cuts that sublist short before
+        # it; a sublist left with one index becomes a match and leaves b (as list.remove
+        # would: the first sublist in b equal to it). a and b are updated in place.
+        # Only the sublists holding a given index are visited, through an index -> sublists
+        # map, and single-index sublists are kept in a heap per index, so this runs in
+        # O(total size of a and b * log) instead of comparing every index with every sublist.
+        holders = {}
+        singles = {}
+        for position, sublist in enumerate(b):
+            for num in sublist:
+                holders.setdefault(num, []).append((position, sublist))
+            if len(sublist) == 1:
+                singles.setdefault(sublist[0], []).append(position)
+        removed = set()
         for num in a[:]:
-            for sublist in b[:]:
-                if num in sublist:
-                    index = sublist.index(num)
-                    sublist[:] = sublist[:index]
-                    if len(sublist) == 1:
-                        a.append(sublist[0])
-                        b.remove(sublist)
+            for position, sublist in holders.get(num, ()):
+                if position in removed or num not in sublist:
+                    continue
+                del sublist[sublist.index(num):]
+                if len(sublist) == 1:
+                    a.append(sublist[0])
+                    heap = singles.setdefault(sublist[0], [])
+                    heapq.heappush(heap, position)
+                    # Skip entries that were removed or have since been cut to nothing
+                    while heap[0] in removed or b[heap[0]] != sublist:
+                        heapq.heappop(heap)
+                    removed.add(heapq.heappop(heap))
+        if removed:
+            b[:] = [sublist for position, sublist in enumerate(b) if position not in removed]
         return a, b
 
     def get_num_possible_keys(self, collision_idx, ftd_idx, max_keys=1e7):
@@ -86,24 +119,48 @@ class verificationUtils:
                 bit_array[index] = 1
         return bit_array
 
-    def generate_possible_keys(self, match_idx, collision_idx, ftd_idx, n, hk):
+    def generate_possible_keys(self, match_idx, collision_idx, ftd_idx, n, hk, stats=None):
+        # stats (dict, optional) receives "candidates", "candidates_tried" and "key_recovered"
+        return drain(self.iter_possible_keys(match_idx, collision_idx, ftd_idx, n, hk, stats))
+
+    def iter_possible_keys(self, match_idx, collision_idx, ftd_idx, n, hk, stats=None, report_every=1024):
+        # Generator form of generate_possible_keys: yields the number of candidates tried
+        # every `report_every` candidates and returns the recovered (or raw) key.
+        if stats is None:
+            stats = {}
         pUtils = protocolUtils()
         raw_key = bitarray(self.generate_bitarray(match_idx, n))
         combined_list = collision_idx + ftd_idx
         num_possible_keys = self.get_num_possible_keys(collision_idx, ftd_idx)
+        stats["candidates"] = num_possible_keys
+        stats["candidates_tried"] = 0
+        stats["key_recovered"] = False
         print(f"Number of possible keys: {num_possible_keys}")
         if num_possible_keys > 1e6:
             print(f"Number of possible keys exceeds limit: {num_possible_keys}")
             return raw_key
+        # Candidates are visited in product() order, which mostly changes the last position:
+        # flip only the positions that differ from the previous candidate instead of
+        # rebuilding the key, so each candidate costs one hash (linear in n).
+        modified_key = raw_key.copy()
+        flipped = ()
         for indices_to_flip in product(*combined_list):
-            modified_key = raw_key.copy()
-            for index in indices_to_flip:
-                modified_key[index] = not modified_key[index]
-            if pUtils.hash_key(modified_key) == hk:
+            for k, index in enumerate(indices_to_flip):
+                if not flipped or flipped[k] != index:
+                    if flipped:
+                        modified_key.invert(flipped[k])
+                    modified_key.invert(index)
+            flipped = indices_to_flip
+            stats["candidates_tried"] += 1
+            candidate_hash = pUtils.hash_key(modified_key)
+            if candidate_hash == hk:
                 print(f"Key successfully recovered!")
+                stats["key_recovered"] = True
                 return modified_key
             else:
-                print(f"Hash mismatch: {pUtils.hash_key(modified_key)} != {hk}")
+                print(f"Hash mismatch: {candidate_hash} != {hk}")
+            if stats["candidates_tried"] % report_every == 0:
+                yield stats["candidates_tried"]
         return raw_key
 
     def retrieve_encryption_keys(self, kc_enc, kr_enc, hkey_enc):
@@ -125,6 +182,13 @@ class verificationUtils:
         return total_bitarrays, total_bits, total_kb
 
     def decrypt_file(self, encrypted_file_path, key):
+        plaintext = bytearray()
+        drain(self.iter_decrypt_file(encrypted_file_path, key, plaintext.extend))
+        return bytes(plaintext)
+
+    def iter_decrypt_file(self, encrypted_file_path, key, write, chunk_size=DECRYPT_CHUNK_SIZE):
+        # Generator form of decrypt_file: decrypts chunk by chunk, passes plaintext to
+        # write(chunk) and yields the number of ciphertext bytes processed so far.
         if isinstance(key, bitarray):
             key = key.tobytes()
         if isinstance(key, str):
@@ -134,13 +198,24 @@ class verificationUtils:
         key = key[:32]
         with open(encrypted_file_path, "rb") as file:
             iv = file.read(16)
-            ciphertext = file.read()
-        if len(iv) != 16:
-            raise ValueError("IV must be 16 bytes")
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        decrypted_content = cipher.decrypt(ciphertext)
-        plaintext = unpad(decrypted_content, AES.block_size, style="pkcs7")
-        return plaintext
+            if len(iv) != 16:
+                raise ValueError("IV must be 16 bytes")
+            total = os.fstat(file.fileno()).st_size - 16
+            if total <= 0 or total % AES.block_size:
+                raise ValueError("Ciphertext length must be a positive multiple of the AES block size")
+            cipher = AES.new(key, AES.MODE_CBC, iv)
+            done = 0
+            while done < total:
+                chunk = file.read(min(chunk_size, total - done))
+                if not chunk:
+                    raise ValueError("Encrypted file is truncated")
+                done += len(chunk)
+                decrypted_content = cipher.decrypt(chunk)
+                if done == total:
+                    # The final chunk holds the PKCS#7 padding
+                    decrypted_content = unpad(decrypted_content, AES.block_size, style="pkcs7")
+                write(decrypted_content)
+                yield done
 
     def decrypt_description(self, encrypted_description, key):
         if isinstance(key, bitarray):
@@ -160,10 +235,13 @@ class verificationUtils:
         plaintext = plaintext_bytes.decode("utf-8")
         return plaintext
 
-    def load_keys_from_usb(self, source_path, password):
+    def load_keys_from_usb(self, source_path, password, cache=None):
         """
         Load and decrypt the keys and hash from an external file (USB).
         Returns a tuple (kc_encoded, kr_encoded, hkey_encoded).
+
+        cache (KeystoreCache, optional) is consulted first and filled after a successful
+        read; by default that is the cache of the open keystore_cache.session(), if any.
         """
         path = source_path
         if len(path) == 2 and path[1] == ':' and not path.endswith(os.sep):
@@ -173,6 +251,15 @@ class verificationUtils:
         else:
             key_file_path = path
 
+        # Reuse the unlocked keystore if this session already read this exact file with this password
+        if cache is None:
+            cache = keystore_cache.active_cache()
+        if cache is not None:
+            keys = cache.get(key_file_path, password)
+            if keys is not None:
+                return keys
+            identity = keystore_cache.keystore_identity(key_file_path)
+
         # Read the encrypted key file (IV + ciphertext)
         with open(key_file_path, "rb") as key_file:
             data = key_file.read()
@@ -194,4 +281,6 @@ class verificationUtils:
         hkey_enc = data.get('hkey')
         if not (kc_enc and kr_enc and hkey_enc):
             raise ValueError("Key file is missing expected data")
+        if cache is not None:
+            cache.put(key_file_path, password, (kc_enc, kr_enc, hkey_enc), identity=identity)
         return kc_enc, kr_enc, hkey_enc
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""
+Headless batch verification / decryption.
+
+Runs verification_protocol over many enrollment records in a process pool and
+writes the decrypted files to a target directory. Records can come from batch
+enrollment manifests (python -m DataEncap.enroll) or from the GUI's
+enrollment_state.json; keys are taken from the record itself or from the
+per-file USB keystores. The app's artifact store (app/objects/store.py) is not a
+record source: its index only tracks the .hypn files, not the enrollment records
+(keys, description) needed to decrypt them, which the GUI keeps in its state file.
+A machine-readable JSON report with per-file latency, key-recovery candidate
+counts and failures is written at the end. Decrypted descriptions are left out of
+it unless --report-descriptions is given.
+
+Usage:
+    python -m DataEncap.verify --manifest enrolled/manifest.jsonl --output restored/
+        [--keystores] [--keys-dir DIR] [--keys-password-file PATH] [--jobs N]
+        [--report PATH] [--report-descriptions] [--metrics PATH]
+
+Records without keys (enrolled with --keys-dir) are always verified against their
+keystore; the password is read as in DataEncap.enroll (file, $VT_KEYS_PASSWORD or a
+prompt), never from the command line.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import SimpleNamespace
+
+from DataEncap import digest_cache, metrics
+from DataEncap.enroll import KEY_FIELDS, quiet_stdout, read_keys_password
+from DataEncap.enrollment.enrollmentUtils import enrollmentUtils
+from DataEncap.manifest import read_manifest
+from DataEncap.verification.verification import verification_protocol
+
+
+def records_from_manifest(manifest_path, keys_dir=None, use_keystores=False):
+    """
+    Build verification jobs from the successful entries of an enrollment manifest.
+    Keys are read from each file's keystore if use_keystores is set or the record holds
+    none: keys_dir/<source>.keys.bin if keys_dir is given (e.g. the USB drive is mounted
+    elsewhere now), else the recorded keys_path. The caller fills in keys_password.
+    """
+    jobs = []
+    for source, record in read_manifest(manifest_path).items():
+        if record.get("status") != "ok" or not record.get("file_info"):
+            continue
+        keys_path = None
+        if use_keystores or not all(record["file_info"].get(k) for k in KEY_FIELDS):
+            keys_path = os.path.join(keys_dir, source + ".keys.bin") if keys_dir else record.get("keys_path")
+        jobs.append({
+            "source": source,
+            "file_info": record["file_info"],
+            "keys_path": keys_path,
+            "keys_password": None,
+        })
+    return jobs
+
+
+def records_from_state(state_path):
+    """Build a verification job from a GUI enrollment_state.json file."""
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    file_info = state.get("file_info")
+    if not file_info:
+        raise ValueError(f"{state_path}: missing file_info")
+    return [{
+        # Only the file name: the record may come from anywhere and must not pick the output directory
+        "source": os.path.basename(file_info.get("filename") or file_info["file_path"]),
+        "file_info": file_info,
+        "keys_path": state.get("usb_path"),
+        "keys_password": state.get("storage_password"),
+    }]
+
+
+def output_name(source):
+    """
+    Path, relative to the output directory, that a record's source is restored to.
+    Raises ValueError for names that would land outside it (absolute, drive or ".." paths).
+    """
+    name = os.path.normpath(source.replace("\\", "/"))
+    if (not source or os.path.isabs(name) or os.path.splitdrive(name)[0] or name == "."
+            or name.split(os.sep)[0] == ".."):
+        raise ValueError(f"Unsafe output name {source!r}")
+    return name
+
+
+def unique_output_names(names):
+    """
+    Output names for a list of record names, in order. A name seen again gets the first
+    free "<stem>_<n><ext>", skipping every name already taken or used by another record.
+    """
+    reserved = set(names)
+    taken = set()
+    result = []
+    for name in names:
+        candidate, n = name, 0
+        stem, ext = os.path.splitext(name)
+        while candidate in taken or (n and candidate in reserved):
+            n += 1
+            candidate = f"{stem}_{n}{ext}"
+        taken.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def _error_entry(job, message):
+    return {"source": job["source"], "encrypted_path": job["file_info"].get("file_path"),
+            "status": "error", "latency_s": None, "candidates": None, "candidates_tried": None,
+            "key_recovered": False, "output_path": None, "bytes": None, "error": message}
+
+
+def _verify_one(job):
+    """Process-pool task: verify and decrypt one record, returning its report entry."""
+    stats = {}
+    output_path = job["output_path"]
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    start = time.perf_counter()
+    # Plaintext is streamed straight to output_path (atomically), never held in memory.
+    # No keystore session: every record has its own keys.bin, read once.
+    with quiet_stdout(job.get("quiet")):
+        written, description = verification_protocol(
+            SimpleNamespace(**job["file_info"]),
+            external_path=job["keys_path"], external_pw=job["keys_password"], stats=stats,
+            # Each record is verified once, so there is nothing for a CRP cache to reuse
+            output_path=output_path, crp_cache=False,
+        )
+    latency = time.perf_counter() - start
+
+    entry = {
+        "source": job["source"],
+        "encrypted_path": job["file_info"].get("file_path"),
+        "status": "ok" if written is not None else "error",
+        "latency_s": latency,
+        "candidates": stats.get("candidates"),
+        "candidates_tried": stats.get("candidates_tried"),
+        "key_recovered": stats.get("key_recovered", False),
+        "output_path": None,
+        "bytes": None,
+        "error": stats.get("error"),
+    }
+    if written is None:
+        return entry
+
+    entry["output_path"] = output_path
+    entry["bytes"] = os.path.getsize(output_path)
+    if job.get("report_description"):
+        entry["description"] = description
+    return entry
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m DataEncap.verify",
+        description="Verify and decrypt many enrolled files in parallel."
+    )
+    parser.add_argument("--manifest", action="append", default=[],
+                        help="Enrollment manifest (JSON Lines) to restore. May be repeated.")
+    parser.add_argument("--state", action="append", default=[],
+                        help="GUI enrollment_state.json to restore. May be repeated.")
+    parser.add_argument("--output", "-o", required=True,
+                        help="Directory that receives the decrypted files.")
+    parser.add_argument("--report", default=None,
+                        help="JSON report path (default: OUTPUT/verify_report.json).")
+    parser.add_argument("--report-descriptions", action="store_true",
+                        help="Include each file's decrypted description in the report (left out by default: "
+                             "the report is plaintext).")
+    parser.add_argument("--keystores", action="store_true",
+                        help="Read keys from the USB keystores written at enrollment even for records that hold "
+                             "keys (records without keys always use their keystore).")
+    parser.add_argument("--keys-dir", default=None,
+                        help="Directory holding the keystores (<source>.keys.bin), if it moved since enrollment.")
+    parser.add_argument("--keys-password-file", default=None,
+                        help="File whose first line is the keystore password (default: $VT_KEYS_PASSWORD, "
+                             "else a prompt).")
+    parser.add_argument("--no-digest-cache", action="store_true",
+                        help="Hash every encrypted file even if VT_DIGEST_CACHE enables the persistent "
+                             "digest cache (sets VT_DIGEST_CACHE=0 for the workers).")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes.")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                        help="Suppress per-stage protocol output from the workers.")
+    parser.add_argument("--metrics", default=None,
+                        help="Write per-stage timings and counters to this file (OpenMetrics text).")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.no_digest_cache:
+        os.environ[digest_cache.ENV_VAR] = "0"
+    if not args.manifest and not args.state:
+        parser.error("at least one --manifest or --state is required")
+
+    jobs = []
+    for manifest_path in args.manifest:
+        jobs.extend(records_from_manifest(manifest_path, args.keys_dir, args.keystores))
+    if any(job["keys_path"] for job in jobs):
+        try:
+            keys_password = read_keys_password(args.keys_password_file)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read the keystore password: {e}", file=sys.stderr)
+            return 2
+        for job in jobs:
+            if job["keys_path"]:
+                job["keys_password"] = keys_password
+    for state_path in args.state:
+        jobs.extend(records_from_state(state_path))
+    for job in jobs:
+        job["quiet"] = args.quiet
+        job["report_description"] = args.report_descriptions
+
+    output_dir = os.path.abspath(args.output)
+    report_path = args.report or os.path.join(output_dir, "verify_report.json")
+    os.makedirs(output_dir, exist_ok=True)
+    entries = []
+    valid = []
+    for job in jobs:
+        try:
+            job["output_name"] = output_name(job["source"])
+        except ValueError as e:
+            print(f"SKIPPED {job['source']!r}: {e}")
+            entries.append(_error_entry(job, str(e)))
+            continue
+        valid.append(job)
+    jobs = valid
+    # Several state files may name the same file; keep their outputs apart
+    for job, name in zip(jobs, unique_output_names([job["output_name"] for job in jobs])):
+        job["output_path"] = os.path.join(output_dir, name)
+
+    print(f"{len(jobs)} record(s) to verify, {args.jobs} worker(s).")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {pool.submit(metrics.metered, _verify_one, job): job for job in jobs}
+        for n, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            try:
+                entry, snapshot = future.result()
+                metrics.REGISTRY.merge(snapshot)
+            except Exception as e:
+                entry = _error_entry(job, f"Worker crashed: {e}")
+            entries.append(entry)
+            if entry["status"] == "ok":
+                print(f"[{n}/{len(jobs)}] ok     {entry['source']} ({entry['latency_s']:.2f}s, "
+                      f"{entry['candidates']} candidate(s))")
+            else:
+                print(f"[{n}/{len(jobs)}] FAILED {entry['source']}: {entry['error']}")
+    elapsed = time.perf_counter() - start
+
+    ok = [e for e in entries if e["status"] == "ok"]
+    latencies = sorted(e["latency_s"] for e in ok)
+    total_bytes = sum(e["bytes"] for e in ok)
+    summary = {
+        "records": len(entries),
+        "succeeded": len(ok),
+        "failed": len(entries) - len(ok),
+        "wall_time_s": elapsed,
+        "bytes_restored": total_bytes,
+        "latency_mean_s": sum(latencies) / len(latencies) if latencies else None,
+        "latency_max_s": latencies[-1] if latencies else None,
+        "candidates_total": sum(e["candidates"] or 0 for e in ok),
+    }
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": socket.gethostname(),
+        "output_dir": output_dir,
+        "summary": summary,
+        "files": sorted(entries, key=lambda e: e["source"]),
+    }
+    with enrollmentUtils().atomic_writer(report_path) as f:
+        f.write(json.dumps(report, indent=2).encode("utf-8"))
+
+    print(f"Restored {summary['succeeded']}/{summary['records']} file(s) ({total_bytes} bytes) in {elapsed:.2f}s, "
+          f"{summary['failed']} failed.")
+    print(f"Report: {report_path}")
+    if args.metrics:
+        metrics.write_openmetrics(args.metrics)
+        print(f"Metrics: {args.metrics}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
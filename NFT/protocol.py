@@ -5,14 +5,45 @@ def nft_protocol(file_path, password):
     Executes the NFT protocol which involves generating a crypto table from a file and password,
     creating an address table from a random seed, and generating an ephemeral key.
     """
-    # 1) Generate the crypto table from a file and password (defaults to 500 KB)
-    crypto_table = derive_key_from_file(file_path, password)
+    return nft_finish(nft_prepare(file_path), password)
+
+def nft_prepare(file_path, file_digest=None):
+    """
+    The password-independent half of nft_protocol: hash the file and build the address table.
+    Can run ahead of time (e.g. while the user types the password); each result must be
+    used for a single nft_finish call, since it carries the one-time seed R1.
+
+    Args:
+        file_path: The file the key is derived from.
+        file_digest (bytes, optional): Its SHA-256 if already known (e.g. taken while
+            decrypting it), which skips reading the file again.
+
+    Returns:
+        (bytes, bytes, np.ndarray): SHA-256 of the file, R1 and the address table.
+    """
+    # 1a) Hash the file (the only file-dependent input of the crypto table)
+    if file_digest is None:
+        file_digest = hash_file_input(file_path)
+    else:
+        print(f"[derive_key_from_file] Reusing SHA256(file) computed during decryption: {file_digest.hex()}")
     print()
 
     # 2) Generate the 256x256 address table from a 32-byte random seed
     seed1, addr_table = generate_address_table(rows=256, cols=256)
     print()
 
+    return file_digest, seed1, addr_table
+
+def nft_finish(prepared, password):
+    """
+    The password-dependent half of nft_protocol, given the result of nft_prepare.
+    """
+    file_digest, seed1, addr_table = prepared
+
+    # 1b) Generate the crypto table from the file digest and password (defaults to 500 KB)
+    crypto_table = derive_key_from_digest(file_digest, password)
+    print()
+
     # 3) Generate an ephemeral key from the address table and crypto table
     seed2, ephemeral_key = generate_ephemeral_key(addr_table, crypto_table, key_length=32)
 
@@ -17,6 +17,16 @@ def derive_key_from_file(
       3. Seeding SHAKE-256 with both digests and squeezing out `output_length` bytes.
     """
     # 1) Compute the 32-byte SHA-256 digest of the file or data
+    file_digest = hash_file_input(file_input)
+
+    # 2) + 3) Only the digest of the file is needed from here on
+    return derive_key_from_digest(file_digest, password, output_length)
+
+def hash_file_input(file_input: Union[str, Path, bytes]) -> bytes:
+    """
+    SHA-256 of a file (read in 8 KiB chunks) or of the provided bytes: the only
+    file-dependent input of derive_key_from_file.
+    """
     file_sha = hashlib.sha256()
     total_len = 0
     if isinstance(file_input, (bytes, bytearray)):
@@ -34,6 +44,19 @@ def derive_key_from_file(
         print(f"[derive_key_from_file] Hashed {total_len} bytes from file: {file_input}")
     file_digest = file_sha.digest()
     print(f"[derive_key_from_file] SHA256(file): {file_digest.hex()}")
+    return file_digest
+
+def derive_key_from_digest(
+    file_digest: bytes,
+    password: str,
+    output_length: int = 1000 * 512  # Default length in bytes (500 KB)
+) -> bytes:
+    """
+    Same crypto table as derive_key_from_file, starting from an already computed
+    SHA-256 digest of the file (e.g. from hash_file_input, or taken while decrypting).
+    """
+    if len(file_digest) != 32:
+        raise ValueError(f"Expected a 32-byte SHA-256 digest, got {len(file_digest)} bytes")
 
     # 2) Hash the password to 32-byte digest
     pwd_bytes = password.encode("utf-8")
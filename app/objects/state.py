@@ -9,12 +9,21 @@ class AppState:
     storage_password: Optional[str] = None
     decrypted_path: Optional[str] = None
     decrypted_desc: Optional[str] = None
+    # SHA-256 of the plaintext, taken while decrypting, and the decrypted file's mtime it is valid for
+    decrypted_sha256: Optional[str] = None
+    decrypted_mtime_ns: Optional[int] = None
     last_action: Optional[str] = None  # 'enroll' | 'decrypt' | 'nft'
+    # Bumped whenever the session moves on (new decryption, cleared state), so work
+    # started for an earlier state can tell it is stale
+    generation: int = 0
 
     def clear(self):
+        self.generation += 1
         self.file_info = None
         self.usb_path = None
         self.storage_password = None
         self.decrypted_path = None
         self.decrypted_desc = None
+        self.decrypted_sha256 = None
+        self.decrypted_mtime_ns = None
         self.last_action = None
\ No newline at end of file
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from DataEncap import digest_cache
+
+from app.objects.paths import UPLOAD_DIR
+
+# Budget for decrypted plaintexts; encrypted .hypn files are never evicted
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_AGE = 7 * 24 * 3600.0
+
+KIND_ENCRYPTED = "encrypted"
+KIND_DECRYPTED = "decrypted"
+EVICTABLE_KINDS = (KIND_DECRYPTED,)
+
+
+class ArtifactStore:
+    """
+    Managed artifact directory.
+
+    Files live under <root>/<aa>/<bb>/<name>, where aa/bb are the first hex digits
+    of SHA-256(name), so no directory grows without bound. A SQLite index records
+    every artifact and keeps a per-name counter, so allocating a unique name is one
+    indexed lookup instead of probing name_1, name_2, ... on disk. Decrypted
+    artifacts are evicted least-recently-used first once together they exceed
+    max_bytes, or when they have not been accessed for max_age seconds.
+    Encrypted artifacts are tracked but never evicted or counted in the budget.
+    Removing or evicting an artifact also drops its rows from the persistent digest
+    cache, when that is enabled.
+    """
+
+    def __init__(self, root: Path = UPLOAD_DIR, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 max_age: Optional[float] = DEFAULT_MAX_AGE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "index.sqlite3", timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                name TEXT PRIMARY KEY,
+                rel_path TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS artifacts_lru ON artifacts (kind, last_access);
+            CREATE TABLE IF NOT EXISTS name_counters (
+                base TEXT PRIMARY KEY,
+                next INTEGER NOT NULL
+            );
+            """
+        )
+
+    @staticmethod
+    def shard_for(name: str) -> Path:
+        digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+        return Path(digest[:2]) / digest[2:4]
+
+    def allocate(self, name: str, kind: str = KIND_DECRYPTED) -> Path:
+        """
+        Reserve a unique artifact name derived from `name` ("report.pdf", then
+        "report_1.pdf", ...) and return the path to write it to.
+        """
+        stem, suffix = Path(name).stem, Path(name).suffix
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._db.execute("SELECT next FROM name_counters WHERE base = ?", (name,)).fetchone()
+                    n = row[0] if row else 0
+                    self._db.execute(
+                        "INSERT INTO name_counters (base, next) VALUES (?, ?) "
+                        "ON CONFLICT(base) DO UPDATE SET next = excluded.next",
+                        (name, n + 1),
+                    )
+                    candidate = name if n == 0 else f"{stem}_{n}{suffix}"
+                    rel_path = self.shard_for(candidate) / candidate
+                    # Only a collision with an unindexed leftover file costs another round
+                    if not (self.root / rel_path).exists() and not self._db.execute(
+                            "SELECT 1 FROM artifacts WHERE name = ?", (candidate,)).fetchone():
+                        break
+                self._db.execute(
+                    "INSERT INTO artifacts (name, rel_path, kind, size, created, last_access) "
+                    "VALUES (?, ?, ?, 0, ?, ?)",
+                    (candidate, str(rel_path), kind, now, now),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        path = self.root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def commit(self, path: Path) -> None:
+        """Record the final size of a written artifact, then enforce the budget (sparing it)."""
+        path = Path(path)
+        size = path.stat().st_size
+        with self._lock:
+            self._db.execute("UPDATE artifacts SET size = ?, last_access = ? WHERE name = ?",
+                             (size, time.time(), path.name))
+        self.evict(keep=path.name)
+
+    def touch(self, path: Path) -> None:
+        """Mark an artifact as used so LRU eviction keeps it around."""
+        with self._lock:
+            self._db.execute("UPDATE artifacts SET last_access = ? WHERE name = ?", (time.time(), Path(path).name))
+
+    def lookup(self, name: str) -> Optional[Path]:
+        with self._lock:
+            row = self._db.execute("SELECT rel_path FROM artifacts WHERE name = ?", (name,)).fetchone()
+        return self.root / row[0] if row else None
+
+    def remove(self, path: Path) -> None:
+        path = Path(path)
+        with self._lock:
+            self._db.execute("DELETE FROM artifacts WHERE name = ?", (path.name,))
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        self._forget_digests([path])
+
+    @staticmethod
+    def _forget_digests(paths: List[Path]) -> None:
+        cache = digest_cache.default_cache()
+        if cache is not None:
+            for path in paths:
+                cache.invalidate(path)
+
+    def total_size(self, kinds=None) -> int:
+        query = "SELECT COALESCE(SUM(size), 0) FROM artifacts"
+        params: tuple = ()
+        if kinds:
+            query += f" WHERE kind IN ({','.join('?' for _ in kinds)})"
+            params = tuple(kinds)
+        with self._lock:
+            return self._db.execute(query, params).fetchone()[0]
+
+    def evict(self, keep: Optional[str] = None) -> List[Path]:
+        """Drop expired and least-recently-used evictable artifacts until within budget."""
+        evicted: List[Path] = []
+        placeholders = ",".join("?" for _ in EVICTABLE_KINDS)
+        total = self.total_size(EVICTABLE_KINDS)
+        with self._lock:
+            candidates = self._db.execute(
+                f"SELECT name, rel_path, size, last_access FROM artifacts "
+                f"WHERE kind IN ({placeholders}) ORDER BY last_access",
+                EVICTABLE_KINDS,
+            ).fetchall()
+            cutoff = time.time() - self.max_age if self.max_age is not None else None
+            for name, rel_path, size, last_access in candidates:
+                if name == keep:
+                    continue
+                expired = cutoff is not None and last_access < cutoff
+                over_budget = self.max_bytes is not None and total > self.max_bytes
+                if not (expired or over_budget):
+                    break
+                self._db.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+                try:
+                    os.remove(self.root / rel_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted.append(self.root / rel_path)
+        self._forget_digests(evicted)
+        return evicted
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArtifactStore:
+    """Process-wide store rooted at UPLOAD_DIR."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(UPLOAD_DIR)
+        return _store
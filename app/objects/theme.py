@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import importlib.util
+from pathlib import Path
+from typing import Any, Dict
+
+from PyQt6.QtCore import PYQT_VERSION_STR, QByteArray, QDataStream, QDir, QIODevice
+from PyQt6.QtGui import QFontDatabase, QPalette
+from PyQt6.QtWidgets import QApplication
+
+from app.objects.paths import ROOT_DIR
+
+THEME_FILE = ROOT_DIR / "dark_red_mod.xml"
+CACHE_DIR = ROOT_DIR / ".cache" / "theme"
+
+def _cache_key(theme_path: Path) -> str:
+    """Changes whenever the theme XML, qt_material or PyQt6 changes."""
+    # find_spec locates the installed package without importing it (or scanning all distributions)
+    spec = importlib.util.find_spec("qt_material")
+    version = f"{spec.origin}:{os.stat(spec.origin).st_mtime_ns}" if spec and spec.origin else "missing"
+    h = hashlib.sha256(theme_path.read_bytes())
+    h.update(f"|{version}|{PYQT_VERSION_STR}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _palette_to_text(palette: QPalette) -> str:
+    # QDataStream round-trips the whole palette in C++; setting colors one by one from
+    # Python costs tens of milliseconds on first use (PyQt6 enum/QBrush conversions)
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.OpenModeFlag.WriteOnly)
+    stream << palette
+    del stream
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def _palette_from_text(text: str) -> QPalette:
+    palette = QPalette()
+    data = QByteArray(base64.b64decode(text))
+    stream = QDataStream(data, QIODevice.OpenModeFlag.ReadOnly)
+    stream >> palette
+    return palette
+
+
+def _write_atomic(path: Path, text: str):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def apply_theme(app: QApplication, theme_path: Path = THEME_FILE) -> bool:
+    """
+    Apply the qt_material theme, reusing the stylesheet compiled on a previous launch.
+
+    qt_material renders its Jinja template and regenerates its icon set on every
+    apply_stylesheet() call. The first launch does that once, then records the
+    resulting QSS, palette, icon search paths and font files under .cache/theme/.
+    Later launches restore those directly, without importing qt_material at all.
+
+    Returns:
+        bool: True if the cached theme was used.
+    """
+    key = _cache_key(theme_path)
+    qss_path = CACHE_DIR / f"{key}.qss"
+    meta_path = CACHE_DIR / f"{key}.json"
+
+    if qss_path.exists() and meta_path.exists():
+        try:
+            meta: Dict[str, Any] = json.loads(meta_path.read_text(encoding="utf-8"))
+            stylesheet = qss_path.read_text(encoding="utf-8")
+        except (OSError, ValueError):
+            meta = {}
+        # Icons live in qt_material's own resource dir; rebuild if it has been cleaned up
+        if meta and all(Path(p).is_dir() for p in meta.get("icon_paths", [])):
+            for font in meta.get("fonts", []):
+                QFontDatabase.addApplicationFont(font)
+            QDir.setSearchPaths("icon", meta.get("icon_paths", []))
+            if meta.get("palette"):
+                app.setPalette(_palette_from_text(meta["palette"]))
+            app.setStyleSheet(stylesheet)
+            return True
+
+    try:
+        import qt_material
+        from qt_material import apply_stylesheet
+    except ImportError:
+        print("qt_material is not installed; starting with the default Qt style.")
+        return False
+    apply_stylesheet(app, theme=str(theme_path))
+
+    fonts_dir = Path(qt_material.__file__).parent / "fonts"
+    meta = {
+        "icon_paths": QDir.searchPaths("icon"),
+        "fonts": sorted(str(p) for p in fonts_dir.rglob("*.ttf")),
+        "palette": _palette_to_text(app.palette()),
+    }
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _write_atomic(qss_path, app.styleSheet())
+        _write_atomic(meta_path, json.dumps(meta, indent=2))
+    except OSError:
+        pass  # read-only checkout: keep working, just without the cache
+    return False
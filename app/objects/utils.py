@@ -12,17 +12,6 @@ def secure_filename(name: str) -> str:
     cleaned = cleaned.strip().lstrip(".")
     return cleaned or "file"
 
-def unique_path(base: Path) -> Path:
-    if not base.exists():
-        return base
-    stem, suffix = base.stem, base.suffix
-    i = 1
-    while True:
-        candidate = base.with_name(f"{stem}_{i}{suffix}")
-        if not candidate.exists():
-            return candidate
-        i += 1
-
 def open_folder(path: Path):
     try:
         if sys.platform.startswith("darwin"):
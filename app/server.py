@@ -0,0 +1,527 @@
+"""
+Local asyncio HTTP service for the DataEncap and NFT protocols.
+
+Endpoints:
+    GET  /health                    -> queue depth and pool status
+    GET  /metrics                   -> protocol stage timings and counters (OpenMetrics text)
+    POST /enroll?filename=..&description=..[&profile=default|fast|strong]
+         body: raw file bytes (Content-Type: application/octet-stream; Content-Length
+         or chunked), streamed to disk
+         headers (optional): X-Usb-Path, X-Storage-Password
+         -> JSON {"name": .., "file_info": {...}}: the artifact name and its record, without keys
+    POST /decrypt
+         body: JSON {"name": .., "usb_path": .., "storage_password": ..}
+         -> JSON with the recovered description and a download link
+         name is an encrypted artifact of this server's store (a file_info whose
+         file_path names one is accepted too).
+    GET  /files/<name>              -> streams a managed artifact (see app.objects.store)
+    POST /nft
+         body: JSON {"decrypted_name": .., "password": ..}
+         -> JSON ephemeral key and seeds
+
+CPU-bound protocol calls run in a bounded process pool. At most --workers jobs
+run at once and at most --max-queue more wait; beyond that requests are refused
+with 503 before their body is read.
+
+Clients never choose which files the server reads or writes: encrypted files are
+looked up in the artifact store by name, and USB keystore paths (X-Usb-Path,
+usb_path) are only accepted inside --keys-root (relative paths are taken from
+there); without --keys-root they are refused.
+
+Key material never comes from a request: /enroll keeps the enrollment record on
+the server (under uploads/.records, without Kc/Kr/hkey if they went to a keystore)
+and /decrypt verifies against that record, refusing bodies that carry keys. POST
+bodies must declare a non-form content type (application/json, or
+application/octet-stream for /enroll), so a web page cannot send them without a
+CORS preflight.
+
+Usage:
+    python -m app.server [--host 127.0.0.1] [--port 8000] [--workers N] [--max-queue N] [--keys-root DIR]
+        [--keystore-ttl S]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from DataEncap import keystore_cache, metrics
+from DataEncap.protocol_config import PROFILES
+
+from app.objects.paths import UPLOAD_DIR
+from app.objects.store import KIND_DECRYPTED, KIND_ENCRYPTED, ArtifactStore, get_store
+from app.objects.utils import secure_filename
+
+CHUNK_SIZE = 64 * 1024
+MAX_JSON_BODY = 1024 * 1024
+INCOMING_DIR = UPLOAD_DIR / ".incoming"
+# Enrollment records, by artifact name; never served (only store artifacts are)
+RECORDS_DIR = UPLOAD_DIR / ".records"
+KEY_FIELDS = ("kc", "kr", "hkey")
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 415: "Unsupported Media Type", 422: "Unprocessable Entity",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+# --- Process-pool jobs (top-level so they can be pickled) ---
+
+def _init_worker(keystore_ttl: float):
+    if keystore_ttl > 0:
+        # Repeated /decrypt calls against one keystore and password unlock it once per worker
+        keystore_cache.open_session(keystore_ttl)
+
+
+def _enroll_job(upload_path: str, filename: str, description: str, output_path: str,
+                usb_path: Optional[str], storage_password: Optional[str],
+                profile: str = "default") -> Dict[str, Any]:
+    from DataEncap.enrollment.enrollment import enrollment_protocol
+
+    success, file_info, msg = enrollment_protocol(
+        upload_path, filename, description, Path(filename).suffix,
+        external_path=usb_path, external_pw=storage_password, output_path=output_path, params=profile,
+    )
+    if not success:
+        raise ValueError(msg)
+    return vars(file_info)
+
+
+def _decrypt_job(file_info: Dict[str, Any], usb_path: Optional[str], storage_password: Optional[str],
+                 output_path: str) -> Dict[str, Any]:
+    from DataEncap.verification.verification import verification_protocol
+
+    stats: Dict[str, Any] = {}
+    written, dec_desc = verification_protocol(
+        SimpleNamespace(**file_info), external_path=usb_path, external_pw=storage_password, stats=stats,
+        # Off: each pool worker would hold its own cache, which a later request rarely reaches
+        output_path=output_path, crp_cache=False,
+    )
+    if written is None:
+        raise ValueError(stats.get("error") or "integrity check or key recovery failed")
+    return {"description": dec_desc, "bytes": os.path.getsize(output_path), "candidates": stats.get("candidates")}
+
+
+def _nft_job(decrypted_path: str, password: str) -> Dict[str, Any]:
+    from NFT.protocol import nft_protocol
+
+    key, seed1, seed2 = nft_protocol(decrypted_path, password)
+    return {"key_hex": key.hex(), "seed1_hex": seed1.hex(), "seed2_hex": seed2.hex()}
+
+
+# --- Bounded dispatch ---
+
+class JobGate:
+    """
+    Bounds CPU work: `workers` jobs run in the pool at once and at most `max_queue`
+    more may wait. Callers reserve a slot before reading a request body so an
+    overloaded server pushes back instead of buffering uploads it cannot process.
+    """
+
+    def __init__(self, pool: ProcessPoolExecutor, workers: int, max_queue: int):
+        self.pool = pool
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.running = 0
+        self._sem = asyncio.Semaphore(workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.in_flight - self.running
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self.in_flight >= self.workers + self.max_queue:
+            raise HTTPError(503, "Job queue is full, retry later", {"Retry-After": "1"})
+        self.in_flight += 1
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+
+    async def run(self, fn, *args):
+        async with self._sem:
+            self.running += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+            finally:
+                self.running -= 1
+
+
+# --- Minimal HTTP/1.1 handling ---
+
+class Request:
+    def __init__(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+                 reader: asyncio.StreamReader):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.reader = reader
+
+    def require_content_type(self, expected: str):
+        content_type = self.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type != expected:
+            raise HTTPError(415, f"Content-Type must be {expected}")
+
+    async def iter_body(self, max_bytes: int) -> AsyncIterator[bytes]:
+        """Yield the request body in chunks, enforcing max_bytes without buffering it."""
+        received = 0
+        if self.headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await self.reader.readline()
+                size_text = size_line.split(b";")[0].strip()
+                if not re.fullmatch(rb"[0-9A-Fa-f]+", size_text):
+                    raise HTTPError(400, "Malformed chunk size")
+                size = int(size_text, 16)
+                if size == 0:
+                    # Discard trailers
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                received += size
+                if received > max_bytes:
+                    raise HTTPError(413, f"Body exceeds {max_bytes} bytes")
+                remaining = size
+                while remaining:
+                    chunk = await self.reader.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise HTTPError(400, "Truncated chunked body")
+                    remaining -= len(chunk)
+                    yield chunk
+                await self.reader.readline()
+        else:
+            if "content-length" not in self.headers:
+                raise HTTPError(411, "Content-Length or chunked transfer encoding required")
+            if not re.fullmatch(r"[0-9]+", self.headers["content-length"]):
+                raise HTTPError(400, "Invalid Content-Length")
+            remaining = int(self.headers["content-length"])
+            if remaining > max_bytes:
+                raise HTTPError(413, f"Body exceeds {max_bytes} bytes")
+            while remaining:
+                chunk = await self.reader.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise HTTPError(400, "Truncated body")
+                remaining -= len(chunk)
+                yield chunk
+
+    async def json(self) -> Dict[str, Any]:
+        self.require_content_type("application/json")
+        body = bytearray()
+        async for chunk in self.iter_body(MAX_JSON_BODY):
+            body += chunk
+        try:
+            data = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "JSON body must be an object")
+        return data
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers: Dict[str, str] = {}
+    while True:
+        raw = await reader.readline()
+        if raw in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = raw.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    return Request(method.upper(), unquote(url.path), query, headers, reader)
+
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                    headers: Optional[Dict[str, str]] = None):
+    body = json.dumps(payload).encode("utf-8")
+    all_headers = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+    all_headers.update(headers or {})
+    writer.write(_head(status, all_headers) + body)
+    await writer.drain()
+
+
+async def send_text(writer: asyncio.StreamWriter, status: int, text: str, content_type: str):
+    body = text.encode("utf-8")
+    writer.write(_head(status, {"Content-Type": content_type, "Content-Length": str(len(body))}) + body)
+    await writer.drain()
+
+
+async def send_file(writer: asyncio.StreamWriter, path: Path):
+    size = path.stat().st_size
+    writer.write(_head(200, {
+        "Content-Type": "application/octet-stream",
+        "Content-Length": str(size),
+        "Content-Disposition": f'attachment; filename="{path.name}"',
+    }))
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+            # Wait for the client to drain before reading more: slow readers get backpressure
+            await writer.drain()
+
+
+class Service:
+    def __init__(self, gate: JobGate, max_upload: int, store: ArtifactStore, keys_root: Optional[str] = None):
+        self.gate = gate
+        self.max_upload = max_upload
+        self.store = store
+        self.keys_root = os.path.realpath(keys_root) if keys_root else None
+        INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+        RECORDS_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    return
+                await self.dispatch(request, writer)
+            except HTTPError as e:
+                await send_json(writer, e.status, {"error": e.message}, e.headers)
+            except Exception as e:
+                await send_json(writer, 500, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter):
+        routes = {
+            ("GET", "/health"): self.health,
+            ("POST", "/enroll"): self.enroll,
+            ("POST", "/decrypt"): self.decrypt,
+            ("POST", "/nft"): self.nft,
+        }
+        if request.path == "/metrics":
+            if request.method != "GET":
+                raise HTTPError(405, "Use GET for /metrics")
+            await send_text(writer, 200, metrics.REGISTRY.to_openmetrics(), metrics.OPENMETRICS_CONTENT_TYPE)
+            return
+        if request.path.startswith("/files/"):
+            if request.method != "GET":
+                raise HTTPError(405, "Use GET for /files/")
+            await self.download(request, writer)
+            return
+        handler = routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in routes):
+                raise HTTPError(405, f"{request.method} not allowed on {request.path}")
+            raise HTTPError(404, f"No route for {request.path}")
+        status, payload = await handler(request)
+        await send_json(writer, status, payload)
+
+    async def health(self, _request: Request) -> Tuple[int, Dict[str, Any]]:
+        return 200, {
+            "status": "ok",
+            "workers": self.gate.workers,
+            "running": self.gate.running,
+            "queue_depth": self.gate.queue_depth,
+            "max_queue": self.gate.max_queue,
+        }
+
+    async def enroll(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        request.require_content_type("application/octet-stream")
+        filename = secure_filename(request.query.get("filename", "upload"))
+        description = request.query.get("description", "")
+        profile = request.query.get("profile", "default")
+        if profile not in PROFILES:
+            raise HTTPError(400, f"Unknown profile {profile!r} (known: {', '.join(PROFILES)})")
+        usb_path = self._keys_path(request.headers.get("x-usb-path"))
+        storage_password = request.headers.get("x-storage-password") or None
+        upload_path = INCOMING_DIR / f"{uuid.uuid4().hex}{Path(filename).suffix}"
+
+        async with self.gate.slot():
+            output_path = self.store.allocate(f"{Path(filename).stem}.hypn", kind=KIND_ENCRYPTED)
+            try:
+                with open(upload_path, "wb") as f:
+                    async for chunk in request.iter_body(self.max_upload):
+                        await asyncio.to_thread(f.write, chunk)
+                info = await self._run(
+                    _enroll_job, str(upload_path), filename, description, str(output_path),
+                    usb_path, storage_password, profile,
+                )
+            except BaseException as e:
+                self.store.remove(output_path)
+                if isinstance(e, ValueError):
+                    raise HTTPError(422, str(e))
+                raise
+            finally:
+                with contextlib.suppress(FileNotFoundError):
+                    upload_path.unlink()
+        if usb_path:
+            # The keystore holds the keys; decrypting then requires it
+            info = {k: v for k, v in info.items() if k not in KEY_FIELDS}
+        self._save_record(output_path.name, info)
+        self.store.commit(output_path)
+        return 200, {"name": output_path.name,
+                     "file_info": {k: v for k, v in info.items() if k not in KEY_FIELDS}}
+
+    async def decrypt(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        async with self.gate.slot():
+            data = await request.json()
+            client_info = data.get("file_info")
+            name = data.get("name")
+            if name is None and isinstance(client_info, dict) and isinstance(client_info.get("file_path"), str):
+                name = Path(client_info["file_path"].replace("\\", "/")).name
+            if not isinstance(name, str):
+                raise HTTPError(400, "name of an enrolled artifact is required")
+            if any(k in data or (isinstance(client_info, dict) and k in client_info) for k in KEY_FIELDS):
+                raise HTTPError(400, "Keys are not accepted in requests; use the server's record or a keystore")
+            # Decrypt the store's copy of the named artifact against the record /enroll kept
+            encrypted_path = self._managed_path(name)
+            file_info = dict(self._load_record(encrypted_path.name), file_path=str(encrypted_path))
+            usb_path = self._keys_path(data.get("usb_path"))
+            if "kc" not in file_info and not (usb_path and data.get("storage_password")):
+                raise HTTPError(400, "This file was enrolled with a keystore; usb_path and storage_password "
+                                     "are required")
+            output_path = self.store.allocate(
+                f"decrypted_{secure_filename(file_info.get('filename', 'file'))}", kind=KIND_DECRYPTED
+            )
+            try:
+                result = await self._run(
+                    _decrypt_job, file_info, usb_path, data.get("storage_password"),
+                    str(output_path),
+                )
+            except BaseException as e:
+                self.store.remove(output_path)
+                if isinstance(e, ValueError):
+                    raise HTTPError(422, f"Decryption failed: {e}")
+                raise
+        self.store.commit(output_path)
+        name = output_path.name
+        result.update({"decrypted_name": name, "download": f"/files/{name}"})
+        return 200, result
+
+    async def nft(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        async with self.gate.slot():
+            data = await request.json()
+            password = data.get("password")
+            if not password:
+                raise HTTPError(400, "password is required")
+            path = self._managed_path(data.get("decrypted_name", ""))
+            self.store.touch(path)
+            result = await self._run(_nft_job, str(path), password)
+        return 200, result
+
+    async def _run(self, fn, *args):
+        # Run a job in the pool and fold the metrics it recorded into this process's registry
+        result, snapshot = await self.gate.run(metrics.metered, fn, *args)
+        metrics.REGISTRY.merge(snapshot)
+        return result
+
+    async def download(self, request: Request, writer: asyncio.StreamWriter):
+        path = self._managed_path(request.path[len("/files/"):])
+        await send_file(writer, path)
+
+    def _keys_path(self, value: Optional[str]) -> Optional[str]:
+        """A client-supplied keystore location, resolved and confined to keys_root."""
+        if not value:
+            return None
+        if not isinstance(value, str):
+            raise HTTPError(400, "usb_path must be a string")
+        if self.keys_root is None:
+            raise HTTPError(400, "USB keystores are disabled on this server (start it with --keys-root)")
+        path = os.path.realpath(os.path.join(self.keys_root, value))
+        if os.path.commonpath([path, self.keys_root]) != self.keys_root:
+            raise HTTPError(400, "usb_path must be inside the server's keys root")
+        return path
+
+    @staticmethod
+    def _save_record(name: str, info: Dict[str, Any]):
+        tmp = RECORDS_DIR / f".{name}.{uuid.uuid4().hex}.tmp"
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(tmp, RECORDS_DIR / f"{name}.json")
+
+    @staticmethod
+    def _load_record(name: str) -> Dict[str, Any]:
+        try:
+            with open(RECORDS_DIR / f"{name}.json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise HTTPError(404, f"No enrollment record for {name}")
+
+    def _managed_path(self, name: str) -> Path:
+        # Only serve artifacts the store knows about, by plain name
+        if not name or secure_filename(name) != name:
+            raise HTTPError(400, "Invalid file name")
+        path = self.store.lookup(name)
+        if path is None or not path.is_file():
+            raise HTTPError(404, f"{name} not found")
+        return path
+
+
+async def serve(host: str, port: int, workers: int, max_queue: int, max_upload: int,
+                keys_root: Optional[str] = None, keystore_ttl: float = keystore_cache.DEFAULT_TTL):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keystore_ttl,)) as pool:
+        service = Service(JobGate(pool, workers, max_queue), max_upload, get_store(), keys_root)
+        server = await asyncio.start_server(service.handle, host, port, limit=CHUNK_SIZE)
+        print(f"Serving on http://{host}:{port} ({workers} worker(s), queue limit {max_queue})")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.server",
+                                     description="Local HTTP service for enroll / decrypt / NFT.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Process-pool size (concurrent protocol jobs).")
+    parser.add_argument("--max-queue", type=int, default=16,
+                        help="Jobs allowed to wait for a worker before requests get 503.")
+    parser.add_argument("--max-upload", type=int, default=1024 ** 3,
+                        help="Largest accepted upload in bytes.")
+    parser.add_argument("--keys-root", default=None,
+                        help="Directory under which clients may name USB keystores (default: keystores disabled).")
+    parser.add_argument("--keystore-ttl", type=float, default=keystore_cache.DEFAULT_TTL,
+                        help="Seconds a worker keeps an unlocked keystore in memory for reuse (0 disables).")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, max(1, args.workers), max(0, args.max_queue), args.max_upload,
+                          args.keys_root, args.keystore_ttl))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
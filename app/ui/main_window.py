@@ -2,20 +2,28 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from PyQt6.QtCore import Qt
+from typing import TYPE_CHECKING, Optional
+from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QAction
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QLabel, QProgressBar,
     QStackedWidget, QMessageBox, QPushButton
 )
 
+from DataEncap import keystore_cache
 from app.objects.state import AppState
 from app.objects.paths import APP_TITLE, UPLOAD_DIR, ROOT_DIR
 from app.objects.utils import open_folder
 from app.widgets.console import ConsoleWidget
-from app.ui.pages.enroll_page import EnrollPage
-from app.ui.pages.decrypt_page import DecryptPage
-from app.ui.pages.nft_page import NFTPage
+from app.widgets.job_queue import JobQueueWidget
+from app.workers import process_bridge
+from app.workers.nft import NFTPrefetcher, plaintext_digest
+from app.workers.scheduler import JobScheduler
+
+if TYPE_CHECKING:
+    from app.ui.pages.enroll_page import EnrollPage
+    from app.ui.pages.decrypt_page import DecryptPage
+    from app.ui.pages.nft_page import NFTPage
 
 # State file location
 STATE_FILE = ROOT_DIR / "enrollment_state.json"
@@ -101,12 +109,20 @@ class ModeSelectionPage(QWidget):
 
 
 class MainWindow(QMainWindow):
+    first_painted = pyqtSignal()  # emitted once, after the window's first paint
+
     def __init__(self):
         super().__init__()
+        self._painted = False
         self.setWindowTitle(APP_TITLE)
         self.resize(960, 680)
         self.state = AppState()
         self.current_mode = None  # 'enroll' or 'decrypt'
+        self.scheduler = JobScheduler(parent=self)
+        self.nft_prefetch = NFTPrefetcher()
+        if not process_bridge.ENABLED:
+            # Protocol work runs in this process's worker threads; the pool's children open their own
+            keystore_cache.open_session()
 
         central = QWidget()
         self.setCentralWidget(central)
@@ -129,47 +145,72 @@ class MainWindow(QMainWindow):
         self.stack = QStackedWidget()
         root.addWidget(self.stack, 1)
 
+        self.jobs_view = JobQueueWidget(self.scheduler)
+        root.addWidget(self.jobs_view)
+
         self.console = ConsoleWidget()
         root.addWidget(self.console)
+        self.scheduler.job_finished.connect(self._log_job_timing)
 
         root.addWidget(self._hr())
         footer = QLabel('<span style="color:#6c757d;">© 2025 Work In Progress.</span>')
         footer.setAlignment(Qt.AlignmentFlag.AlignHCenter)
         root.addWidget(footer)
 
-        # Pages
+        # Pages: only mode selection is built up front, the others on first visit
         self.mode_page = ModeSelectionPage()
-        self.enroll_page = EnrollPage(self.state)
-        self.decrypt_page = DecryptPage(self.state)
-        self.nft_page = NFTPage(self.state)
+        self._enroll_page: Optional[EnrollPage] = None
+        self._decrypt_page: Optional[DecryptPage] = None
+        self._nft_page: Optional[NFTPage] = None
 
         # Wire mode selection signals
         self.mode_page.enroll_btn.clicked.connect(self._start_enroll_mode)
         self.mode_page.decrypt_btn.clicked.connect(self._start_decrypt_mode)
 
-        # Wire enroll page signals
-        self.enroll_page.request_log.connect(self.console.log)
-        # Override the next button to save state
-        self.enroll_page.next_btn.clicked.disconnect()
-        self.enroll_page.next_btn.clicked.connect(self._save_enrollment_state)
-
-        # Wire decrypt page signals
-        self.decrypt_page.request_prev.connect(lambda: self.goto_step(1))
-        self.decrypt_page.request_next.connect(lambda: self.goto_step(2))
-        self.decrypt_page.request_log.connect(self.console.log)
-
-        # Wire NFT page signals
-        self.nft_page.request_prev.connect(lambda: self.goto_step(1))
-        self.nft_page.request_restart.connect(self._return_to_mode_selection)
-        self.nft_page.request_log.connect(self.console.log)
-
-        self.stack.addWidget(self.mode_page)    # index 0
-        self.stack.addWidget(self.enroll_page)  # index 1
-        self.stack.addWidget(self.decrypt_page) # index 2
-        self.stack.addWidget(self.nft_page)     # index 3
+        self.stack.addWidget(self.mode_page)
 
         self._build_menu()
 
+    @property
+    def enroll_page(self) -> EnrollPage:
+        if self._enroll_page is None:
+            from app.ui.pages.enroll_page import EnrollPage
+            page = EnrollPage(self.state, self.scheduler)
+            page.request_log.connect(self.console.log)
+            # Override the next button to save state
+            page.next_btn.clicked.disconnect()
+            page.next_btn.clicked.connect(self._save_enrollment_state)
+            self.stack.addWidget(page)
+            self._enroll_page = page
+        return self._enroll_page
+
+    @property
+    def decrypt_page(self) -> DecryptPage:
+        if self._decrypt_page is None:
+            from app.ui.pages.decrypt_page import DecryptPage
+            page = DecryptPage(self.state, self.scheduler)
+            page.request_prev.connect(lambda: self.goto_step(1))
+            page.request_next.connect(lambda: self.goto_step(2))
+            page.request_log.connect(self.console.log)
+            page.decrypted.connect(
+                lambda path: self.nft_prefetch.start(path, self.state.generation, plaintext_digest(self.state))
+            )
+            self.stack.addWidget(page)
+            self._decrypt_page = page
+        return self._decrypt_page
+
+    @property
+    def nft_page(self) -> NFTPage:
+        if self._nft_page is None:
+            from app.ui.pages.nft_page import NFTPage
+            page = NFTPage(self.state, self.scheduler, self.nft_prefetch)
+            page.request_prev.connect(lambda: self.goto_step(1))
+            page.request_restart.connect(self._return_to_mode_selection)
+            page.request_log.connect(self.console.log)
+            self.stack.addWidget(page)
+            self._nft_page = page
+        return self._nft_page
+
     def _build_menu(self):
         bar = self.menuBar()
         file_menu = bar.addMenu("&File")
@@ -184,6 +225,10 @@ class MainWindow(QMainWindow):
         act_open.triggered.connect(lambda: open_folder(UPLOAD_DIR))
         file_menu.addAction(act_open)
 
+        act_metrics = QAction("Export Protocol Metrics…", self)
+        act_metrics.triggered.connect(self._export_metrics)
+        file_menu.addAction(act_metrics)
+
         act_clear = QAction("Clear Console", self)
         act_clear.triggered.connect(self.console.clear_console)
         file_menu.addAction(act_clear)
@@ -193,12 +238,36 @@ class MainWindow(QMainWindow):
         act_quit.triggered.connect(self.close)
         file_menu.addAction(act_quit)
 
+    def _export_metrics(self):
+        from PyQt6.QtWidgets import QFileDialog
+        from DataEncap import metrics
+
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Protocol Metrics", str(ROOT_DIR / "metrics.txt"), "OpenMetrics text (*.txt)"
+        )
+        if not path:
+            return
+        try:
+            metrics.write_openmetrics(path)
+        except OSError as e:
+            self.console.log(f"❌ Could not write metrics: {e}", "error")
+            return
+        self.console.log(f"📊 Protocol metrics written to {path}", "success")
+
     def _hr(self) -> QWidget:
         line = QWidget()
         line.setFixedHeight(2)
         line.setStyleSheet("background:#333;")
         return line
 
+    def _log_job_timing(self, job_id: int, _res: dict):
+        job = self.scheduler.jobs.get(job_id)
+        if job is None:
+            return
+        ran = f"{job.run_time:.2f}s" if job.run_time is not None else "–"
+        self.console.log(f"⏱️ Job #{job.id} ({job.kind}: {job.title}) {job.status} — "
+                         f"waited {job.wait_time:.2f}s, ran {ran}", "muted")
+
     def _start_enroll_mode(self):
         """Start enrollment workflow"""
         self.current_mode = 'enroll'
@@ -331,11 +400,25 @@ class MainWindow(QMainWindow):
         
         if reply == QMessageBox.StandardButton.Yes:
             self.state.clear()
+            self.nft_prefetch.discard()
+            if keystore_cache.active_cache() is not None:
+                keystore_cache.active_cache().clear()
+            bridge = process_bridge.get_bridge()
+            if bridge is not None:
+                bridge.clear_keystores()
             self.current_mode = None
             self.progress.setVisible(False)
             self.stack.setCurrentWidget(self.mode_page)
             self.console.log("🔄 Returned to mode selection", "info")
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            self.first_painted.emit()
+
     def closeEvent(self, event):
-        # Safety: ensure threads are not left running
+        # Safety: cancel queued/running jobs and wait for the pool threads to stop
+        self.scheduler.shutdown()
+        self.nft_prefetch.shutdown()
         super().closeEvent(event)
\ No newline at end of file
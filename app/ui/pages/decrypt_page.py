@@ -1,24 +1,26 @@
 from __future__ import annotations
 
 from typing import Optional
-from PyQt6.QtCore import pyqtSignal, QThread
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QLabel, QHBoxLayout, QPushButton, QMessageBox
+    QWidget, QVBoxLayout, QLabel, QHBoxLayout, QPushButton, QMessageBox, QProgressBar
 )
 
 from app.objects.state import AppState
 from app.workers.decrypt import DecryptWorker
+from app.workers.scheduler import JobScheduler
 
 class DecryptPage(QWidget):
     request_prev = pyqtSignal()
     request_next = pyqtSignal()
     request_log = pyqtSignal(str, str)
+    decrypted = pyqtSignal(str)  # path of a newly decrypted file
 
-    def __init__(self, state: AppState):
+    def __init__(self, state: AppState, scheduler: JobScheduler):
         super().__init__()
         self.state = state
-        self.thread: Optional[QThread] = None
-        self.worker: Optional[DecryptWorker] = None
+        self.scheduler = scheduler
+        self.job_id: Optional[int] = None  # latest submitted job, tracked by the progress bar
         self._build_ui()
 
     def _build_ui(self):
@@ -44,11 +46,20 @@ class DecryptPage(QWidget):
         self.next_btn.clicked.connect(lambda: self.request_next.emit())
         self.back_btn = QPushButton("Back")
         self.back_btn.clicked.connect(lambda: self.request_prev.emit())
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self._on_cancel_clicked)
+        self.cancel_btn.setEnabled(False)
         btns.addWidget(self.decrypt_btn)
+        btns.addWidget(self.cancel_btn)
         btns.addWidget(self.next_btn)
         btns.addWidget(self.back_btn)
         btns.addStretch(1)
         layout.addLayout(btns)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
         layout.addStretch(1)
 
     def _on_decrypt_clicked(self):
@@ -56,37 +67,52 @@ class DecryptPage(QWidget):
             QMessageBox.critical(self, "No Enrolled File", "No enrolled file is available in state.")
             return
 
-        self.decrypt_btn.setEnabled(False)
-        self.next_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Queued")
+        self.progress_bar.setVisible(True)
 
-        self.thread = QThread(self)
-        self.worker = DecryptWorker(self.state.file_info, self.state.usb_path, self.state.storage_password)
-        self.worker.moveToThread(self.thread)
+        worker = DecryptWorker(self.state.file_info, self.state.usb_path, self.state.storage_password)
+        worker.progress.connect(self.request_log.emit)
+        worker.step.connect(self._on_step)
+        worker.finished.connect(self._decrypt_finished)
+        worker.failed.connect(self._decrypt_failed)
+        title = self.state.file_info.get("filename", "file")
+        self.job_id = self.scheduler.submit("decrypt", title, worker).id
+
+    def _on_step(self, label: str, percent: int):
+        if self.sender() is not self._current_worker():
+            return
+        self.progress_bar.setFormat(f"{label} – %p%")
+        self.progress_bar.setValue(percent)
 
-        self.thread.started.connect(self.worker.run)
-        self.worker.progress.connect(self.request_log.emit)
-        self.worker.finished.connect(self._decrypt_finished)
-        self.worker.failed.connect(self._decrypt_failed)
-        self.worker.finished.connect(lambda _res: self._cleanup())
-        self.worker.failed.connect(lambda _err: self._cleanup())
+    def _on_cancel_clicked(self):
+        if self.job_id is not None:
+            self.cancel_btn.setEnabled(False)
+            self.scheduler.cancel(self.job_id)
 
-        self.thread.start()
+    def _current_worker(self):
+        job = self.scheduler.jobs.get(self.job_id) if self.job_id is not None else None
+        return job.worker if job else None
 
     def _decrypt_finished(self, res: dict):
         if res.get("success"):
             self.state.decrypted_path = res.get("decrypted_path")
             self.state.decrypted_desc = res.get("decrypted_desc")
+            self.state.decrypted_sha256 = res.get("plaintext_sha256")
+            self.state.decrypted_mtime_ns = res.get("decrypted_mtime_ns")
             self.state.last_action = "decrypt"
+            self.state.generation += 1
             self.next_btn.setEnabled(True)
-        else:
-            self.decrypt_btn.setEnabled(True)
+            self.decrypted.emit(self.state.decrypted_path)
+        self._cleanup()
 
     def _decrypt_failed(self, _err: str):
-        self.decrypt_btn.setEnabled(True)
+        self._cleanup()
 
     def _cleanup(self):
-        if self.thread:
-            self.thread.quit()
-            self.thread.wait()
-            self.thread = None
-            self.worker = None
\ No newline at end of file
+        # Only the job the progress bar follows hides it; earlier jobs finishing leave it alone
+        if self.sender() is self._current_worker():
+            self.cancel_btn.setEnabled(False)
+            self.progress_bar.setVisible(False)
+            self.job_id = None
\ No newline at end of file
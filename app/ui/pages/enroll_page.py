@@ -3,25 +3,26 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Optional
 
-from PyQt6.QtCore import pyqtSignal, QThread
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QPushButton,
-    QPlainTextEdit, QHBoxLayout, QFileDialog, QMessageBox
+    QPlainTextEdit, QHBoxLayout, QFileDialog, QMessageBox, QProgressBar
 )
 
 from app.objects.state import AppState
 from app.workers.enrollment import EnrollmentWorker
+from app.workers.scheduler import JobScheduler
 
 class EnrollPage(QWidget):
     completed = pyqtSignal(dict)
     request_next = pyqtSignal()
     request_log = pyqtSignal(str, str)
 
-    def __init__(self, state: AppState):
+    def __init__(self, state: AppState, scheduler: JobScheduler):
         super().__init__()
         self.state = state
-        self.thread: Optional[QThread] = None
-        self.worker: Optional[EnrollmentWorker] = None
+        self.scheduler = scheduler
+        self.job_id: Optional[int] = None  # latest submitted job, tracked by the progress bar
         self._build_ui()
 
     def _build_ui(self):
@@ -77,10 +78,19 @@ class EnrollPage(QWidget):
         self.next_btn = QPushButton("Next: Decrypt")
         self.next_btn.clicked.connect(lambda: self.request_next.emit())
         self.next_btn.setEnabled(False)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self._on_cancel_clicked)
+        self.cancel_btn.setEnabled(False)
         btns.addWidget(self.enroll_btn)
+        btns.addWidget(self.cancel_btn)
         btns.addWidget(self.next_btn)
         btns.addStretch(1)
         layout.addLayout(btns)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
         layout.addStretch(1)
 
     @staticmethod
@@ -113,21 +123,44 @@ class EnrollPage(QWidget):
         usb_path = self.usb_edit.text().strip() or None
         storage_pw = self.store_pw.text().strip() or None
 
-        self.enroll_btn.setEnabled(False)
-        self.next_btn.setEnabled(False)
+        worker = EnrollmentWorker(p, description, usb_path, storage_pw)
+        # Each keystore enrollment rewrites the drive's keys.bin: a second one in flight would
+        # leave the session pointing at a record whose keys were overwritten
+        keystore = worker.keystore_path
+        if keystore and any(job.kind == "enroll" and getattr(job.worker, "keystore_path", None) == keystore
+                            for job in self.scheduler.active_jobs()):
+            QMessageBox.warning(
+                self, "Keystore Busy",
+                "An enrollment to this USB keystore is already queued or running.\n\n"
+                "Wait for it to finish, or choose another drive or folder.")
+            return
 
-        self.thread = QThread(self)
-        self.worker = EnrollmentWorker(p, description, usb_path, storage_pw)
-        self.worker.moveToThread(self.thread)
+        # The button stays enabled: further enrollments queue up behind this one
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Queued")
+        self.progress_bar.setVisible(True)
+
+        worker.progress.connect(self.request_log.emit)
+        worker.step.connect(self._on_step)
+        worker.finished.connect(self._enroll_finished)
+        worker.failed.connect(self._enroll_failed)
+        self.job_id = self.scheduler.submit("enroll", p.name, worker).id
+
+    def _on_step(self, label: str, percent: int):
+        if self.sender() is not self._current_worker():
+            return
+        self.progress_bar.setFormat(f"{label} – %p%")
+        self.progress_bar.setValue(percent)
 
-        self.thread.started.connect(self.worker.run)
-        self.worker.progress.connect(self.request_log.emit)
-        self.worker.finished.connect(self._enroll_finished)
-        self.worker.failed.connect(self._enroll_failed)
-        self.worker.finished.connect(lambda _res: self._cleanup())
-        self.worker.failed.connect(lambda _err: self._cleanup())
+    def _on_cancel_clicked(self):
+        if self.job_id is not None:
+            self.cancel_btn.setEnabled(False)
+            self.scheduler.cancel(self.job_id)
 
-        self.thread.start()
+    def _current_worker(self):
+        job = self.scheduler.jobs.get(self.job_id) if self.job_id is not None else None
+        return job.worker if job else None
 
     def _enroll_finished(self, res: dict):
         if res.get("success"):
@@ -136,15 +169,14 @@ class EnrollPage(QWidget):
             self.state.storage_password = res.get("storage_password")
             self.state.last_action = "enroll"
             self.next_btn.setEnabled(True)
-        else:
-            self.enroll_btn.setEnabled(True)
+        self._cleanup()
 
     def _enroll_failed(self, _err: str):
-        self.enroll_btn.setEnabled(True)
+        self._cleanup()
 
     def _cleanup(self):
-        if self.thread:
-            self.thread.quit()
-            self.thread.wait()
-            self.thread = None
-            self.worker = None
\ No newline at end of file
+        # Only the job the progress bar follows hides it; earlier jobs finishing leave it alone
+        if self.sender() is self._current_worker():
+            self.cancel_btn.setEnabled(False)
+            self.progress_bar.setVisible(False)
+            self.job_id = None
\ No newline at end of file
@@ -1,25 +1,26 @@
 from __future__ import annotations
 
-from typing import Optional
-from PyQt6.QtCore import pyqtSignal, QThread
+from pathlib import Path
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QFormLayout, QLineEdit,
     QPushButton, QHBoxLayout, QMessageBox
 )
 
 from app.objects.state import AppState
-from app.workers.nft import NFTWorker
+from app.workers.nft import NFTPrefetcher, NFTWorker, plaintext_digest
+from app.workers.scheduler import JobScheduler
 
 class NFTPage(QWidget):
     request_prev = pyqtSignal()
     request_restart = pyqtSignal()
     request_log = pyqtSignal(str, str)
 
-    def __init__(self, state: AppState):
+    def __init__(self, state: AppState, scheduler: JobScheduler, prefetcher: NFTPrefetcher):
         super().__init__()
         self.state = state
-        self.thread: Optional[QThread] = None
-        self.worker: Optional[NFTWorker] = None
+        self.scheduler = scheduler
+        self.prefetcher = prefetcher
         self._build_ui()
 
     def _build_ui(self):
@@ -66,32 +67,13 @@ class NFTPage(QWidget):
             QMessageBox.warning(self, "Missing Password", "Please enter a password for NFT key derivation.")
             return
 
-        self.gen_btn.setEnabled(False)
-
-        self.thread = QThread(self)
-        self.worker = NFTWorker(self.state.decrypted_path, password)
-        self.worker.moveToThread(self.thread)
-
-        self.thread.started.connect(self.worker.run)
-        self.worker.progress.connect(self.request_log.emit)
-        self.worker.finished.connect(self._nft_finished)
-        self.worker.failed.connect(self._nft_failed)
-        self.worker.finished.connect(lambda _res: self._cleanup())
-        self.worker.failed.connect(lambda _err: self._cleanup())
-
-        self.thread.start()
+        path, generation = self.state.decrypted_path, self.state.generation
+        digest = plaintext_digest(self.state)
+        worker = NFTWorker(path, password, prepared=self.prefetcher.take(path, generation), file_digest=digest)
+        worker.progress.connect(self.request_log.emit)
+        worker.finished.connect(self._nft_finished)
+        self.scheduler.submit("nft", Path(path).name, worker)
 
     def _nft_finished(self, res: dict):
         if res.get("success"):
-            self.state.last_action = "nft"
-        self.gen_btn.setEnabled(True)
-
-    def _nft_failed(self, _err: str):
-        self.gen_btn.setEnabled(True)
-
-    def _cleanup(self):
-        if self.thread:
-            self.thread.quit()
-            self.thread.wait()
-            self.thread = None
-            self.worker = None
\ No newline at end of file
+            self.state.last_action = "nft"
\ No newline at end of file
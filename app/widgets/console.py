@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from collections import deque
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QTextCursor
 from PyQt6.QtWidgets import QTextBrowser
 
 class ConsoleWidget(QTextBrowser):
@@ -10,8 +14,10 @@ class ConsoleWidget(QTextBrowser):
         "muted":   "#6c757d",
         "text":    "#d4d4d4",
     }
+    MAX_LINES = 5000        # lines kept in the view; older lines are dropped
+    FLUSH_INTERVAL_MS = 50  # messages arriving within this window are rendered together
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, max_lines: int = MAX_LINES):
         super().__init__(parent)
         self.setReadOnly(True)
         self.setOpenExternalLinks(True)
@@ -28,19 +34,50 @@ class ConsoleWidget(QTextBrowser):
             }
             """
         )
+        # One block per line, so the document itself trims the oldest lines
+        self.document().setMaximumBlockCount(max_lines)
+        # Lines waiting for the next flush; bounded so a flood cannot outgrow the view
+        self._pending: deque[str] = deque(maxlen=max_lines)
+        self._showing_placeholder = False
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flush)
         self.clear_console()
 
     def clear_console(self):
+        self._pending.clear()
         self.setHtml('<span style="color:#6c757d;">No actions yet. Follow the steps above.</span>')
+        self._showing_placeholder = True
+
+    def _flush(self):
+        if not self._pending:
+            return
+        batch = list(self._pending)
+        self._pending.clear()
 
-    def _append_html(self, html: str):
-        if "No actions yet" in self.toPlainText():
+        first = self._showing_placeholder
+        if first:
             self.clear()
-        self.moveCursor(self.textCursor().MoveOperation.End)
-        self.insertHtml(html + "<br/>")
-        self.moveCursor(self.textCursor().MoveOperation.End)
+            self._showing_placeholder = False
+
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.beginEditBlock()
+        for html in batch:
+            if first:
+                first = False
+            else:
+                cursor.insertBlock()
+            cursor.insertHtml(html)
+        cursor.endEditBlock()
+
+        bar = self.verticalScrollBar()
+        bar.setValue(bar.maximum())
 
     def log(self, msg: str, category: str = "text"):
         color = self.COLORS.get(category, self.COLORS["text"])
-        safe = msg.replace("\n", "<br/>")
-        self._append_html(f'<span style="color:{color};">{safe}</span>')
\ No newline at end of file
+        for line in msg.split("\n"):
+            self._pending.append(f'<span style="color:{color};">{line}</span>')
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+
+from app.workers.scheduler import JobScheduler, Job, RUNNING
+
+class JobQueueWidget(QWidget):
+    """Live view of the JobScheduler: one row per job with status, progress and timing."""
+    COLUMNS = ["#", "Job", "File", "Status", "Progress", "Waited", "Ran"]
+    STATUS_COLORS = {
+        "queued":    "#6c757d",
+        "running":   "#0dcaf0",
+        "done":      "#28a745",
+        "failed":    "#dc3545",
+        "cancelled": "#ffc107",
+    }
+
+    def __init__(self, scheduler: JobScheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self._rows: Dict[int, int] = {}
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("<b>Job Queue</b>"))
+        controls.addStretch(1)
+        controls.addWidget(QLabel("Max concurrent:"))
+        self.limit = QSpinBox()
+        self.limit.setRange(1, 16)
+        self.limit.setValue(scheduler.max_concurrent)
+        self.limit.valueChanged.connect(scheduler.set_max_concurrent)
+        controls.addWidget(self.limit)
+        self.cancel_btn = QPushButton("Cancel Selected")
+        self.cancel_btn.clicked.connect(self._cancel_selected)
+        controls.addWidget(self.cancel_btn)
+        self.clear_btn = QPushButton("Clear Finished")
+        self.clear_btn.clicked.connect(self._clear_finished)
+        controls.addWidget(self.clear_btn)
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.table.setMaximumHeight(150)
+        layout.addWidget(self.table)
+
+        scheduler.job_added.connect(self._add_row)
+        scheduler.job_changed.connect(self._update_row)
+
+    def _add_row(self, job_id: int):
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self._rows[job_id] = row
+        self._update_row(job_id)
+
+    def _update_row(self, job_id: int):
+        job: Optional[Job] = self.scheduler.jobs.get(job_id)
+        row = self._rows.get(job_id)
+        if job is None or row is None:
+            return
+        progress = f"{job.percent}%  {job.stage}" if job.status == RUNNING else (f"{job.percent}%" if job.percent else "")
+        values = [
+            str(job.id), job.kind, job.title, job.status, progress,
+            self._fmt(job.wait_time), self._fmt(job.run_time),
+        ]
+        for col, text in enumerate(values):
+            item = QTableWidgetItem(text)
+            item.setData(Qt.ItemDataRole.UserRole, job.id)
+            if col == 3:
+                item.setForeground(Qt.GlobalColor.white)
+                item.setBackground(QColor(self.STATUS_COLORS.get(job.status, self.STATUS_COLORS["queued"])))
+            self.table.setItem(row, col, item)
+
+    @staticmethod
+    def _fmt(seconds: Optional[float]) -> str:
+        return "" if seconds is None else f"{seconds:.2f}s"
+
+    def _cancel_selected(self):
+        for index in self.table.selectionModel().selectedRows():
+            job_id = self.table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole)
+            self.scheduler.cancel(job_id)
+
+    def _clear_finished(self):
+        self.scheduler.clear_finished()
+        self.table.setRowCount(0)
+        self._rows.clear()
+        for job in self.scheduler.jobs.values():
+            self._add_row(job.id)
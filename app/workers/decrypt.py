@@ -8,14 +8,15 @@ from typing import Dict, Any, Optional
 
 from PyQt6.QtCore import QObject, pyqtSignal
 
-# External protocols
-from DataEncap.verification.verification import verification_protocol
+from DataEncap.progress import OperationCancelled
 
-from app.objects.paths import UPLOAD_DIR
-from app.objects.utils import secure_filename, unique_path
+from app.objects.store import KIND_DECRYPTED, get_store
+from app.objects.utils import secure_filename
+from app.workers.staged import new_cancel_token, run_stages
 
 class DecryptWorker(QObject):
     progress = pyqtSignal(str, str)
+    step = pyqtSignal(str, int)       # stage label, percent of that stage
     finished = pyqtSignal(dict)
     failed = pyqtSignal(str)
 
@@ -25,30 +26,45 @@ class DecryptWorker(QObject):
         self.file_info = file_info
         self.usb_path = usb_path
         self.storage_password = storage_password
+        self._cancel = new_cancel_token()
+
+    def cancel(self):
+        """Ask the running decryption to stop at its next chunk boundary (safe from any thread)."""
+        self._cancel.cancel()
 
     def run(self):
         try:
-            self.progress.emit("ℹ️ [Decryption] Retrieving and decoding keys…", "info")
-            self.progress.emit("   • Running verification protocol to reconstruct key", "info")
-
-            start = time.time()
-            ns = SimpleNamespace(**self.file_info)
-            dec_bytes, dec_desc = verification_protocol(
-                ns, external_path=self.usb_path, external_pw=self.storage_password
-            )
-            duration = time.time() - start
-
-            if dec_bytes is None:
-                self.progress.emit("❌ Decryption failed: integrity check or key recovery error.", "error")
-                self.finished.emit({"success": False, "duration": duration})
-                return
+            self.progress.emit("ℹ️ [Decryption] Running verification protocol to reconstruct key…", "info")
 
             filename = self.file_info.get("filename", "file")
             decrypted_name = f"decrypted_{secure_filename(filename)}"
-            decrypted_path = unique_path(UPLOAD_DIR / decrypted_name)
+            store = get_store()
+            decrypted_path = store.allocate(decrypted_name, kind=KIND_DECRYPTED)
 
-            with open(decrypted_path, "wb") as f:
-                f.write(dec_bytes)
+            start = time.perf_counter()
+            ns = SimpleNamespace(**self.file_info)
+            stats: Dict[str, Any] = {}
+            try:
+                # The plaintext is streamed straight into the store, never held in memory
+                # Runs in the persistent process pool (when enabled), off this process's GIL
+                _, dec_desc = run_stages(
+                    "verify", self.progress, self.step, self._cancel,
+                    file_info=ns, external_path=self.usb_path, external_pw=self.storage_password,
+                    output_path=str(decrypted_path), stats=stats,
+                    digest_plaintext=True  # handed to the NFT step, which then skips re-reading the file
+                )
+            except OperationCancelled:
+                store.remove(decrypted_path)
+                self.progress.emit("⚠️ Decryption cancelled.", "muted")
+                self.finished.emit({"success": False, "cancelled": True, "duration": time.perf_counter() - start})
+                return
+            except Exception as e:
+                store.remove(decrypted_path)
+                self.progress.emit(f"❌ Decryption failed: integrity check or key recovery error ({e}).", "error")
+                self.finished.emit({"success": False, "duration": time.perf_counter() - start})
+                return
+            duration = time.perf_counter() - start
+            store.commit(decrypted_path)
 
             self.progress.emit(f"✅ Decryption successful in {duration:.2f}s!", "success")
             self.progress.emit(f"   • Decrypted file saved at: {decrypted_path}", "info")
@@ -58,6 +74,8 @@ class DecryptWorker(QObject):
                 "success": True,
                 "decrypted_path": str(decrypted_path),
                 "decrypted_desc": dec_desc,
+                "plaintext_sha256": stats.get("plaintext_sha256"),
+                "decrypted_mtime_ns": decrypted_path.stat().st_mtime_ns,
                 "duration": duration,
             })
 
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import shutil
+import os
 import time
 import traceback
 from pathlib import Path
@@ -8,14 +8,15 @@ from typing import Optional, Dict, Any
 
 from PyQt6.QtCore import QObject, pyqtSignal
 
-# External protocols (match your Flask imports)
-from DataEncap.enrollment.enrollment import enrollment_protocol
+from DataEncap.progress import OperationCancelled
 
+from app.objects.store import KIND_ENCRYPTED, get_store
 from app.objects.utils import secure_filename
-from app.objects.paths import UPLOAD_DIR
+from app.workers.staged import new_cancel_token, run_stages
 
 class EnrollmentWorker(QObject):
     progress = pyqtSignal(str, str)   # message, category
+    step = pyqtSignal(str, int)       # stage label, percent of that stage
     finished = pyqtSignal(dict)       # result dict
     failed = pyqtSignal(str)
 
@@ -26,34 +27,56 @@ class EnrollmentWorker(QObject):
         self.description = description or ""
         self.usb_path = usb_path or None
         self.storage_password = storage_password or None
+        self._cancel = new_cancel_token()
+
+    @property
+    def keystore_path(self) -> Optional[str]:
+        """The keys.bin this enrollment rewrites (resolved like save_keys_to_usb), or None."""
+        if not (self.usb_path and self.storage_password):
+            return None
+        path = self.usb_path
+        if len(path) == 2 and path[1] == ":":
+            path += os.sep
+        return os.path.realpath(os.path.join(path, "keys.bin") if os.path.isdir(path) else path)
+
+    def cancel(self):
+        """Ask the running enrollment to stop at its next chunk boundary (safe from any thread)."""
+        self._cancel.cancel()
 
     def run(self):
         try:
+            # Read the source in place; only the encrypted output lands in UPLOAD_DIR
             filename = secure_filename(self.src_path.name)
-            dst = UPLOAD_DIR / filename
-            if dst.resolve() != self.src_path.resolve():
-                shutil.copy2(self.src_path, dst)
-
-            ext = dst.suffix
-            filepath = str(dst)
+            ext = self.src_path.suffix
+            filepath = str(self.src_path)
+            store = get_store()
+            encrypted_path = store.allocate(f"{Path(filename).stem}.hypn", kind=KIND_ENCRYPTED)
 
             self.progress.emit(f"ℹ️ [Enrollment] Starting enrollment at {time.strftime('%H:%M:%S')}…", "info")
-            self.progress.emit("   • Generating ephemeral key and hashing", "info")
-            self.progress.emit("   • Encrypting file content", "info")
-            self.progress.emit("   • Encrypting description and serializing keys", "info")
 
-            start = time.time()
-            success, file_info, msg = enrollment_protocol(
-                filepath, filename, self.description, ext,
-                external_path=self.usb_path, external_pw=self.storage_password
-            )
-            duration = time.time() - start
-
-            if not success:
+            start = time.perf_counter()
+            try:
+                # Runs in the persistent process pool (when enabled), off this process's GIL
+                file_info = run_stages(
+                    "enroll", self.progress, self.step, self._cancel,
+                    file_path=filepath, filename=filename, description=self.description, file_extension=ext,
+                    external_path=self.usb_path, external_pw=self.storage_password,
+                    output_path=str(encrypted_path)
+                )
+            except OperationCancelled:
+                store.remove(encrypted_path)
+                self.progress.emit("⚠️ Enrollment cancelled.", "muted")
+                self.finished.emit({"success": False, "cancelled": True, "duration": time.perf_counter() - start})
+                return
+            except Exception as e:
+                store.remove(encrypted_path)
+                msg = f"Error enrolling file: {e}"
                 self.progress.emit(f"❌ Enrollment failed: {msg}", "error")
-                self.finished.emit({"success": False, "message": msg, "duration": duration})
+                self.finished.emit({"success": False, "message": msg, "duration": time.perf_counter() - start})
                 return
+            duration = time.perf_counter() - start
 
+            store.commit(encrypted_path)
             info_dict: Dict[str, Any] = getattr(file_info, "__dict__", None) or dict(file_info)
             self.progress.emit(f"✅ Enrollment completed in {duration:.2f}s!", "success")
             self.progress.emit(f"   • Stored encrypted file: {info_dict.get('file_path', 'N/A')}", "info")
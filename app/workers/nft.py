@@ -1,21 +1,51 @@
 from __future__ import annotations
 
+import os
 import time
 import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from PyQt6.QtCore import QObject, pyqtSignal
 
-# External protocol
-from NFT.protocol import nft_protocol
+from app.objects.state import AppState
+from app.objects.store import get_store
+from app.workers.process_bridge import get_bridge
+
+def _call(fn, *args):
+    bridge = get_bridge()
+    return bridge.call(fn, *args) if bridge is not None else fn(*args)
+
+def _prepare(decrypted_path: str, file_digest: Optional[bytes] = None):
+    from NFT.protocol import nft_prepare
+    return _call(nft_prepare, decrypted_path, file_digest)
+
+def plaintext_digest(state: AppState) -> Optional[bytes]:
+    """
+    The plaintext SHA-256 recorded while decrypting, if the decrypted file is unchanged
+    since; otherwise None, and the NFT protocol hashes the file itself.
+    """
+    if not state.decrypted_sha256 or not state.decrypted_path:
+        return None
+    try:
+        if os.stat(state.decrypted_path).st_mtime_ns != state.decrypted_mtime_ns:
+            return None
+    except OSError:
+        return None
+    return bytes.fromhex(state.decrypted_sha256)
 
 class NFTWorker(QObject):
     progress = pyqtSignal(str, str)
     finished = pyqtSignal(dict)
     failed = pyqtSignal(str)
 
-    def __init__(self, decrypted_path: str, password: str):
+    def __init__(self, decrypted_path: str, password: str, prepared: Optional[Future] = None,
+                 file_digest: Optional[bytes] = None):
         super().__init__()
         self.decrypted_path = decrypted_path
         self.password = password
+        self.prepared = prepared  # speculative nft_prepare result from NFTPrefetcher, if any
+        self.file_digest = file_digest  # plaintext SHA-256 from decryption, if still valid
 
     def run(self):
         try:
@@ -23,9 +53,22 @@ class NFTWorker(QObject):
             self.progress.emit("   • Generating address table from random seed R1", "info")
             self.progress.emit("   • Generating ephemeral NFT key from address table & crypto table and a new random seed R2", "info")
 
-            start = time.time()
-            key, seed1, seed2 = nft_protocol(self.decrypted_path, self.password)
-            duration = time.time() - start
+            # Imported on first use: NFT pulls in NumPy, which the window does not need to appear
+            from NFT.protocol import nft_finish
+
+            get_store().touch(self.decrypted_path)
+            start = time.perf_counter()
+            prepared = None
+            if self.prepared is not None:
+                try:
+                    prepared = self.prepared.result()
+                    self.progress.emit("   • Reusing file hash and address table prepared in the background", "info")
+                except Exception:
+                    prepared = None  # cancelled or failed: just redo it below
+            if prepared is None:
+                prepared = _prepare(self.decrypted_path, self.file_digest)
+            key, seed1, seed2 = _call(nft_finish, prepared, self.password)
+            duration = time.perf_counter() - start
 
             hex_key = key.hex()
             r1 = seed1.hex()
@@ -47,4 +90,60 @@ class NFTWorker(QObject):
         except Exception as e:
             err = f"NFT exception: {e}\n{traceback.format_exc()}"
             self.progress.emit(f"❌ {err}", "error")
-            self.failed.emit(err)
\ No newline at end of file
+            self.failed.emit(err)
+
+class NFTPrefetcher:
+    """
+    Speculatively runs the file-dependent half of the NFT protocol (nft_prepare: hash the
+    decrypted file, build the address table) as soon as decryption succeeds, while the
+    user is still typing the NFT password. Generating then only pays for the
+    password-dependent half.
+
+    A prepared result is tied to the AppState generation and to the file's size and
+    mtime; take() hands it out at most once (R1 must not be reused) and discards it if
+    any of those changed. It is only started when a decryption succeeds (which is also
+    when the generation changes); further keys for the same file prepare inline. Only
+    used from the GUI thread.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nft-prefetch")
+        self._key: Optional[Tuple] = None
+        self._future: Optional[Future] = None
+
+    @staticmethod
+    def _file_key(path: str, generation: int) -> Optional[Tuple]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return generation, os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+    def start(self, path: str, generation: int, file_digest: Optional[bytes] = None):
+        """Begin preparing for `path` (from its known digest, if given), dropping any earlier speculation."""
+        self.discard()
+        key = self._file_key(path, generation)
+        if key is None:
+            return
+        self._key = key
+        self._future = self._executor.submit(_prepare, path, file_digest)
+
+    def take(self, path: str, generation: int) -> Optional[Future]:
+        """The pending preparation for `path`, or None if there is none or it is stale."""
+        future, key = self._future, self._key
+        self._future = self._key = None
+        if future is None:
+            return None
+        if key is None or key != self._file_key(path, generation):
+            future.cancel()
+            return None
+        return future
+
+    def discard(self):
+        if self._future is not None:
+            self._future.cancel()  # a preparation already running just finishes unobserved
+        self._future = self._key = None
+
+    def shutdown(self):
+        self.discard()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from DataEncap import keystore_cache, metrics
+from DataEncap.progress import CancelToken, ProgressEvent
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# Set VT_PROCESS_POOL=0 to run protocol calls in the worker threads instead
+ENABLED = os.environ.get("VT_PROCESS_POOL", "1") != "0"
+
+# Staged protocol generators the child processes may run, by name
+STAGED_PROTOCOLS = {
+    "enroll": ("DataEncap.enrollment.enrollment", "enrollment_stages"),
+    "verify": ("DataEncap.verification.verification", "verification_stages"),
+}
+
+# Modules imported by every child at spawn time, so the first job does not pay for them
+WARM_MODULES = (
+    "DataEncap.enrollment.enrollment",
+    "DataEncap.verification.verification",
+    "NFT.protocol",
+)
+
+_progress_queue = None
+
+
+def _init_child(queue, keystore_ttl):
+    """
+    Process-pool initializer: keep the progress queue, open a keystore session and
+    import the protocol modules.
+    """
+    global _progress_queue
+    _progress_queue = queue
+    if keystore_ttl > 0:
+        # Decrypting again with the same drive and password skips re-reading keys.bin
+        keystore_cache.open_session(keystore_ttl)
+    import importlib
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_staged(task_id: int, protocol: str, kwargs: Dict[str, Any], cancel_event):
+    """
+    Child-side task: run a staged protocol, forwarding its events to the parent. Only
+    events that change the stage or the whole percentage cross the process boundary.
+    Returns (result, stats) so the parent can update its own stats dict. The metrics
+    the run recorded are sent back on the queue, whether it succeeded or not.
+    """
+    import importlib
+    module_name, func_name = STAGED_PROTOCOLS[protocol]
+    stages_fn = getattr(importlib.import_module(module_name), func_name)
+    stats = kwargs.pop("stats", None)
+    if stats is not None:
+        kwargs["stats"] = stats = dict(stats)
+    stages = stages_fn(cancel=CancelToken(cancel_event), **kwargs)
+
+    stage, percent = None, -1
+    try:
+        while True:
+            try:
+                event = next(stages)
+            except StopIteration as stop:
+                return stop.value, stats
+            now = int(event.fraction * 100)
+            if event.stage != stage or now != percent:
+                stage, percent = event.stage, now
+                _progress_queue.put((task_id, event))
+    finally:
+        _progress_queue.put((None, metrics.REGISTRY.take()))
+
+
+class ProcessBridge:
+    """
+    Persistent process pool for the CPU-bound protocol work (AES, f°° hashing,
+    response generation, key-candidate search). It keeps that work off the GIL the
+    Qt event loop needs, and lets concurrent jobs really run in parallel.
+
+    Worker threads call run_stages() / call(). These block the calling (pool) thread,
+    not the GUI, until the child returns. Progress events travel back on one shared
+    queue and are dispatched by a listener thread to the per-task callback, which
+    emits the worker's Qt signals. Each child's metrics are merged into this process's
+    DataEncap.metrics.REGISTRY. Cancellation uses Manager events, so the
+    CancelToken held by the worker is the same flag the child process checks.
+    Each child keeps unlocked USB keystores for `keystore_ttl` seconds (0 disables it),
+    or until clear_keystores().
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, keystore_ttl: float = keystore_cache.DEFAULT_TTL):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.keystore_ttl = keystore_ttl
+        self._ctx = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._queue = None
+        self._listener: Optional[threading.Thread] = None
+        self._callbacks: Dict[int, Callable[[ProgressEvent], None]] = {}
+        self._ids = itertools.count(1)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is not None:
+                return
+            # Imported here: multiprocessing is only needed once the pool is warmed
+            import multiprocessing
+            self._ctx = multiprocessing.get_context("spawn")
+            self._manager = self._ctx.Manager()
+            self._queue = self._ctx.Queue()
+            self._executor = self._new_executor()
+            self._listener = threading.Thread(target=self._listen, name="process-bridge-progress", daemon=True)
+            self._listener.start()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=self._ctx,
+            initializer=_init_child, initargs=(self._queue, self.keystore_ttl),
+        )
+
+    def clear_keystores(self):
+        """
+        Drop the keystores every child has unlocked. A task cannot be addressed to a
+        particular child, so the pool is replaced instead: jobs already submitted finish
+        on the old children, which then exit with their sessions; new jobs go to fresh
+        children with empty ones.
+        """
+        with self._lock:
+            executor = self._executor
+            if executor is None:
+                return
+            self._executor = self._new_executor()
+        executor.shutdown(wait=False)
+
+    def warm(self):
+        """Spawn every child now (they import the protocol modules as they start)."""
+        self._ensure_started()
+        for _ in range(self.max_workers):
+            self._executor.submit(_ping)
+
+    def new_cancel_token(self) -> CancelToken:
+        """A CancelToken whose flag is shared with the child processes."""
+        self._ensure_started()
+        return CancelToken(self._manager.Event())
+
+    def run_stages(self, protocol: str, on_event: Callable[[ProgressEvent], None],
+                   cancel: CancelToken, **kwargs) -> Any:
+        """
+        Run a staged protocol ("enroll" or "verify") in a child process and return its
+        result. on_event is called (from the listener thread) for each relayed event;
+        exceptions, including OperationCancelled, are re-raised here. A `stats` dict in
+        kwargs is updated with what the child recorded, as if it had run in-process.
+
+        The CRP cache is off unless kwargs ask for it: each child has its own, and a
+        repeat of the same file rarely lands on the child that cached it.
+        """
+        self._ensure_started()
+        kwargs.setdefault("crp_cache", False)
+        task_id = next(self._ids)
+        with self._lock:
+            self._callbacks[task_id] = on_event
+        try:
+            future = self._executor.submit(_run_staged, task_id, protocol, kwargs, cancel.event)
+            result, stats = future.result()
+            if stats is not None:
+                kwargs["stats"].update(stats)
+            return result
+        finally:
+            with self._lock:
+                self._callbacks.pop(task_id, None)
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a picklable top-level function in a child process and return its result."""
+        self._ensure_started()
+        result, snapshot = self._executor.submit(metrics.metered, fn, *args, **kwargs).result()
+        metrics.REGISTRY.merge(snapshot)
+        return result
+
+    def _listen(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            task_id, event = item
+            if task_id is None:
+                # A child's metrics for the run it just finished
+                metrics.REGISTRY.merge(event)
+                continue
+            with self._lock:
+                callback = self._callbacks.get(task_id)
+            if callback is not None:
+                callback(event)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=True, cancel_futures=True)
+        self._queue.put(None)
+        self._listener.join()
+        self._manager.shutdown()
+
+
+_bridge: Optional[ProcessBridge] = None
+_bridge_lock = threading.Lock()
+
+
+def get_bridge() -> Optional[ProcessBridge]:
+    """Process-wide bridge, or None when the process pool is disabled."""
+    global _bridge
+    if not ENABLED:
+        return None
+    with _bridge_lock:
+        if _bridge is None:
+            _bridge = ProcessBridge()
+        return _bridge
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtBoundSignal
+
+# Job states, in the order a job moves through them
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+DEFAULT_MAX_CONCURRENT = 2
+
+
+@dataclass
+class Job:
+    """One unit of work submitted to the JobScheduler, with its timing."""
+    id: int
+    kind: str                  # 'enroll' | 'decrypt' | 'nft'
+    title: str
+    worker: QObject
+    status: str = QUEUED
+    stage: str = ""
+    percent: int = 0
+    submitted_at: float = field(default_factory=time.perf_counter)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    runnable: Optional[QRunnable] = None
+
+    @property
+    def wait_time(self) -> Optional[float]:
+        """Seconds spent queued before a pool thread picked the job up."""
+        end = self.started_at if self.started_at is not None else self.finished_at
+        return None if end is None else end - self.submitted_at
+
+    @property
+    def run_time(self) -> Optional[float]:
+        """Seconds spent running (so far, if still running)."""
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+
+class _JobRunnable(QRunnable):
+    """Runs a worker's run() on a pool thread, announcing the start first."""
+
+    def __init__(self, job_id: int, worker: QObject, started: pyqtBoundSignal):
+        super().__init__()
+        self.setAutoDelete(False)  # the Job keeps it alive so queued jobs can be taken back
+        self.job_id = job_id
+        self.worker = worker
+        self.started = started
+
+    def run(self):
+        self.started.emit(self.job_id, time.perf_counter())
+        self.worker.run()
+
+
+class JobScheduler(QObject):
+    """
+    Central queue for enrollment, decryption and NFT jobs.
+
+    Jobs wrap the existing worker objects (anything with run(), and the progress /
+    finished / failed signals) and run on a QThreadPool, so several can be queued
+    and up to max_concurrent run at once. Worker signals are emitted from pool
+    threads and delivered to GUI-thread receivers as queued connections, so pages
+    keep routing results into AppState and the console exactly as before.
+    """
+    job_added = pyqtSignal(int)
+    job_changed = pyqtSignal(int)
+    job_finished = pyqtSignal(int, dict)
+    _started = pyqtSignal(int, float)
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, max_concurrent))
+        self.jobs: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._started.connect(self._on_started)
+
+    @property
+    def max_concurrent(self) -> int:
+        return self.pool.maxThreadCount()
+
+    def set_max_concurrent(self, n: int):
+        self.pool.setMaxThreadCount(max(1, n))
+
+    def submit(self, kind: str, title: str, worker: QObject) -> Job:
+        """Queue a worker; it starts as soon as a pool thread is free."""
+        job = Job(id=next(self._ids), kind=kind, title=title, worker=worker)
+        job.runnable = _JobRunnable(job.id, worker, self._started)
+        self.jobs[job.id] = job
+
+        worker.finished.connect(lambda res, job_id=job.id: self._on_finished(job_id, res))
+        worker.failed.connect(lambda err, job_id=job.id: self._on_finished(job_id, {"success": False, "error": err}))
+        if hasattr(worker, "step"):
+            worker.step.connect(lambda label, percent, job_id=job.id: self._on_step(job_id, label, percent))
+
+        self.job_added.emit(job.id)
+        self.pool.start(job.runnable)
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a job. A queued job is taken off the pool; a running one is asked to
+        stop at its next chunk boundary if its worker supports cancel().
+        """
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        if job.status == QUEUED and self.pool.tryTake(job.runnable):
+            # Never started: report it through the worker so every listener hears about it
+            job.worker.finished.emit({"success": False, "cancelled": True, "duration": 0.0})
+            return True
+        if hasattr(job.worker, "cancel"):
+            job.worker.cancel()
+            return True
+        return False
+
+    def active_jobs(self) -> List[Job]:
+        return [job for job in self.jobs.values() if job.active]
+
+    def clear_finished(self):
+        for job_id in [job.id for job in self.jobs.values() if not job.active]:
+            del self.jobs[job_id]
+
+    def shutdown(self, timeout_ms: int = -1):
+        """Cancel everything and wait for running jobs to stop (used on window close)."""
+        for job in self.active_jobs():
+            self.cancel(job.id)
+        self.pool.waitForDone(timeout_ms)
+
+    def _on_started(self, job_id: int, started_at: float):
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return
+        job.status = RUNNING
+        job.started_at = started_at
+        self.job_changed.emit(job_id)
+
+    def _on_step(self, job_id: int, label: str, percent: int):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.stage, job.percent = label, percent
+        self.job_changed.emit(job_id)
+
+    def _on_finished(self, job_id: int, res: dict):
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return
+        job.finished_at = time.perf_counter()
+        job.result = res
+        if res.get("cancelled"):
+            job.status = CANCELLED
+        elif res.get("success"):
+            job.status = DONE
+            job.percent = 100
+        else:
+            job.status = FAILED
+        job.runnable = None
+        self.job_changed.emit(job_id)
+        self.job_finished.emit(job_id, res)
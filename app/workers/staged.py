@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from typing import Any, Generator
+
+from DataEncap.progress import CancelToken, ProgressEvent
+
+from app.workers.process_bridge import STAGED_PROTOCOLS, get_bridge
+
+
+class StageRelay:
+    """
+    Turns ProgressEvents into a worker's signals: one console line (progress) whenever
+    a new stage starts, and a (label, percent) update (step) whenever the percentage moves.
+    """
+
+    def __init__(self, progress, step):
+        self.progress = progress
+        self.step = step
+        self.stage = None
+        self.percent = -1
+
+    def __call__(self, event: ProgressEvent):
+        if event.stage != self.stage:
+            self.stage = event.stage
+            self.percent = -1
+            self.progress.emit(f"   • {event.label}", "info")
+        percent = int(event.fraction * 100)
+        if percent != self.percent:
+            self.percent = percent
+            self.step.emit(event.label, percent)
+
+
+def follow_stages(stages: Generator[ProgressEvent, None, Any], progress, step) -> Any:
+    """Run a staged protocol generator to completion in this thread, relaying it to a worker's signals."""
+    relay = StageRelay(progress, step)
+    while True:
+        try:
+            event = next(stages)
+        except StopIteration as stop:
+            return stop.value
+        relay(event)
+
+
+def new_cancel_token() -> CancelToken:
+    """A CancelToken that also reaches the process pool when it is enabled."""
+    bridge = get_bridge()
+    return bridge.new_cancel_token() if bridge else CancelToken()
+
+
+def run_stages(protocol: str, progress, step, cancel: CancelToken, **kwargs) -> Any:
+    """
+    Run a staged protocol ("enroll" or "verify") with its events relayed to a worker's
+    signals: in the persistent process pool when enabled, else in the calling thread.
+    In the calling thread, enrollment primes this process's CRP cache, which the next
+    decryption of the new file will hit.
+    """
+    bridge = get_bridge()
+    if bridge is not None:
+        return bridge.run_stages(protocol, StageRelay(progress, step), cancel, **kwargs)
+    if protocol == "enroll":
+        kwargs.setdefault("crp_cache", True)
+    import importlib
+    module_name, func_name = STAGED_PROTOCOLS[protocol]
+    stages_fn = getattr(importlib.import_module(module_name), func_name)
+    return follow_stages(stages_fn(cancel=cancel, **kwargs), progress, step)
@@ -1,24 +1,57 @@
 # pyqt_app/main.py
 from __future__ import annotations
 
+import json
+import os
 import sys
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QApplication
-from qt_material import apply_stylesheet
-from app.ui.main_window import MainWindow
+import time
+
+# Startup milestones (perf_counter), printed as JSON when VT_STARTUP_PROBE is set; see tests/bench_startup.py
+_MARKS = {"main_imported": time.perf_counter()}
+
+# Keep module-level imports minimal: process-pool children re-import this module on spawn,
+# and everything the window does not need before it first paints is imported lazily.
+
+def _report_startup(app):
+    _MARKS["first_paint"] = time.perf_counter()
+    print("VT_STARTUP " + json.dumps(_MARKS), flush=True)
+    app.quit()
 
 def main():
+    from PyQt6.QtCore import Qt, QTimer
+    from PyQt6.QtWidgets import QApplication
+    from app.objects.theme import apply_theme
+    from app.ui.main_window import MainWindow
+    from app.workers.process_bridge import get_bridge
+    _MARKS["imports_done"] = time.perf_counter()
+
     # High-DPI friendly defaults (Apple Silicon)
     #QApplication.setAttribute(Qt.ApplicationAttribute.AA_EnableHighDpiScaling, True)
     #QApplication.setAttribute(Qt.ApplicationAttribute.AA_UseHighDpiPixmaps, True)
 
     app = QApplication(sys.argv)
+    _MARKS["app_created"] = time.perf_counter()
+
+    # Apply stylesheet (cached on disk after the first launch) before the first paint
+    _MARKS["theme_cached"] = apply_theme(app)
+    _MARKS["theme_applied"] = time.perf_counter()
+
     win = MainWindow()
+    _MARKS["window_built"] = time.perf_counter()
+    probe = bool(os.environ.get("VT_STARTUP_PROBE"))
+    if probe:
+        win.first_painted.connect(lambda: _report_startup(app))
     win.show()
 
-    # Apply stylesheet
-    apply_stylesheet(app, theme='dark_red_mod.xml')
-    sys.exit(app.exec())
+    # Spawn the protocol process pool once the window is up, so the first job does not pay for it
+    bridge = get_bridge() if not probe else None
+    if bridge is not None:
+        QTimer.singleShot(0, bridge.warm)
+
+    code = app.exec()
+    if bridge is not None:
+        bridge.shutdown()
+    sys.exit(code)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from bitarray import bitarray
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from DataEncap import protocol_config
+from DataEncap.protocolUtils import protocolUtils
+
+STAGES = ["challenges", "responses"]
+
+def median_time(fn, runs: int) -> float:
+    fn()  # warm the per-parameter caches
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def peak_alloc(fn) -> int:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def fit_line(xs, ys):
+    """Least-squares (slope, intercept) of ys over xs."""
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    var = sum((x - mean_x) ** 2 for x in xs)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var if var else 0.0
+    return slope, mean_y - slope * mean_x
+
+def run_D(D: int, size: int, P: int, runs: int, seed: int) -> dict:
+    rng = random.Random(f"{seed}:{D}")
+    pUtils = protocolUtils()
+    s = bitarray()
+    s.frombytes(rng.randbytes(size // 8))
+    w = bitarray()
+    w.frombytes(rng.randbytes(size // 8))
+    d = 2 ** D
+    digest = rng.randbytes(32)
+
+    start = time.perf_counter()
+    f_double_circle = pUtils.generate_f_double_circle(None, [w, s], d, file_digest=digest)
+    t_f = time.perf_counter() - start
+    challenges = pUtils.generate_challenges(s, D, num_challenges=size + 1)
+
+    calls = {
+        "challenges": lambda: pUtils.generate_challenges(s, D, num_challenges=size + 1),
+        "responses": lambda: pUtils.generate_responses(f_double_circle, challenges, protocol_config.alpha,
+                                                       protocol_config.beta, P, d),
+    }
+    row = {"D": D, "f_bytes": len(f_double_circle), "f_double_circle_s": t_f}
+    for name, fn in calls.items():
+        row[f"{name}_s"] = median_time(fn, runs)
+        row[f"{name}_peak_alloc"] = peak_alloc(fn)
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how challenge generation and response gathering scale with D (f°° = 2**D bits)."
+    )
+    parser.add_argument(
+        "--D",
+        dest="Ds",
+        type=int,
+        nargs="+",
+        default=[12, 16, 20, 24, 28],
+        help=f"Values of D to sweep (at most {protocol_config.MAX_D}; f°° takes 2**D / 8 bytes of memory)."
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=protocol_config.size,
+        help="Key size in bits (size + 1 challenges)."
+    )
+    parser.add_argument(
+        "--P",
+        type=int,
+        default=protocol_config.P,
+        help="Bits per response."
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=20,
+        help="Measured runs per stage and D."
+    )
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        default=None,
+        help="Exit with status 1 if a stage at the largest D takes more than this many times "
+             "as long as at the smallest D."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=1234,
+        help="Seed for the keys and file digest."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the results to."
+    )
+    args = parser.parse_args()
+
+    Ds = sorted(args.Ds)
+    rows = []
+    print(f"{'D':>4}{'f°° bytes':>14}{'f°° ms':>10}{'challenges ms':>15}{'responses ms':>14}"
+          f"{'challenges alloc':>18}{'responses alloc':>17}")
+    for D in Ds:
+        r = run_D(D, args.size, args.P, args.runs, args.seed)
+        rows.append(r)
+        print(f"{D:>4}{r['f_bytes']:>14}{r['f_double_circle_s'] * 1000:>10.2f}{r['challenges_s'] * 1000:>15.3f}"
+              f"{r['responses_s'] * 1000:>14.3f}{r['challenges_peak_alloc']:>18}{r['responses_peak_alloc']:>17}")
+
+    # f°° itself is 2**D / 8 bytes by definition; only the work done per challenge should stay cheap
+    print()
+    fits = {}
+    failures = []
+    for name in STAGES:
+        times = [r[f"{name}_s"] for r in rows]
+        slope, intercept = fit_line(Ds, times)
+        ratio = times[-1] / times[0] if times[0] else float("inf")
+        fits[name] = {"slope_s_per_D": slope, "intercept_s": intercept, "ratio": ratio}
+        print(f"{name:<11} {slope * 1e6:+.2f} µs per unit of D, D={Ds[-1]} / D={Ds[0]}: {ratio:.2f}x")
+        if args.max_ratio is not None and ratio > args.max_ratio:
+            failures.append(f"{name}: {ratio:.2f}x from D={Ds[0]} to D={Ds[-1]}, budget {args.max_ratio:.2f}x")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "size": args.size, "P": args.P, "runs": args.runs, "fits": fits, "results": rows,
+        }, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if failures:
+        print("\nFAIL:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import contextlib
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+OPERATIONS = ["enroll", "verify", "nft"]
+PATTERN_BLOCK = 1024 * 1024
+GiB = 1024 ** 3
+
+def parse_size(text: str) -> int:
+    """'512M', '1G', '20G' or plain bytes."""
+    units = {"K": 1024, "M": 1024 ** 2, "G": GiB}
+    text = text.strip().upper().rstrip("B").rstrip("I")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def human(size: int) -> str:
+    return f"{size / GiB:.1f}G" if size >= GiB else f"{size / 1024 ** 2:.0f}M"
+
+def peak_rss() -> int:
+    """High-water resident set size of this process, in bytes."""
+    if resource is None:
+        raise RuntimeError("peak RSS needs the resource module (Linux / macOS)")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def make_input(path: Path, size: int, kind: str):
+    """
+    Synthetic input of `size` bytes. "sparse" only sets the file length: it takes no
+    disk space or time and reads back as zeros. "pattern" writes a repeating random
+    1 MiB block, for filesystems without sparse files.
+
+    Plain writes, not mmap: pages touched through a mapping count towards this
+    process's peak RSS, which the (vfork-spawned) children would then inherit.
+    """
+    with path.open("wb") as f:
+        if kind == "sparse":
+            f.truncate(size)
+            return
+        block = os.urandom(PATTERN_BLOCK)
+        for offset in range(0, size, PATTERN_BLOCK):
+            f.write(block[:min(PATTERN_BLOCK, size - offset)])
+
+# --- Child side: one operation per process, so each peak RSS is its own ---
+
+def run_child(op: str, workdir: Path) -> dict:
+    sys.path.insert(0, str(ROOT_DIR))
+    source = workdir / "input.bin"
+    encrypted = workdir / "input.hypn"
+    record = workdir / "file_info.pickle"
+    restored = workdir / "restored.bin"
+
+    if op == "enroll":
+        from DataEncap.enrollment.enrollment import enrollment_protocol
+        baseline = peak_rss()
+        start = time.perf_counter()
+        ok, file_info, message = enrollment_protocol(str(source), source.name, "memory benchmark", ".bin",
+                                                     output_path=str(encrypted))
+        if not ok:
+            raise RuntimeError(message)
+        record.write_bytes(pickle.dumps(file_info))
+    elif op == "verify":
+        from DataEncap.verification.verification import verification_protocol
+        file_info = pickle.loads(record.read_bytes())
+        baseline = peak_rss()
+        start = time.perf_counter()
+        stats = {}
+        written, _ = verification_protocol(file_info, stats=stats, output_path=str(restored))
+        if written is None:
+            raise RuntimeError(stats.get("error") or "verification failed")
+    else:
+        from NFT.protocol import nft_protocol
+        baseline = peak_rss()
+        start = time.perf_counter()
+        nft_protocol(str(restored), "benchmark123456")
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "baseline_rss": baseline, "peak_rss": peak_rss()}
+
+def launch(op: str, workdir: Path, python: str, timeout: float) -> dict:
+    proc = subprocess.run(
+        [python, str(Path(__file__).resolve()), "--child", op, "--workdir", str(workdir)],
+        capture_output=True, text=True, timeout=timeout,
+    )
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("VT_MEMORY ")), None)
+    if proc.returncode != 0 or line is None:
+        raise RuntimeError(f"{op} failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+    return json.loads(line[len("VT_MEMORY "):])
+
+def growth_per_gib(points) -> float:
+    """Least-squares slope of peak RSS over input size, in bytes of RSS per GiB of input."""
+    if len(points) < 2:
+        return 0.0
+    xs = [size / GiB for size, _ in points]
+    ys = [rss for _, rss in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if var == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how peak memory of enrollment, verification and NFT derivation scales with input size."
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["1G", "2G", "5G", "10G", "20G"],
+        help="Input sizes (suffixes K, M, G allowed)."
+    )
+    parser.add_argument(
+        "--input",
+        choices=["sparse", "pattern"],
+        default="sparse",
+        help="How to generate the synthetic input (see make_input)."
+    )
+    parser.add_argument(
+        "--ops",
+        nargs="+",
+        choices=OPERATIONS,
+        default=OPERATIONS,
+        help="Operations to measure; verify needs enroll, nft needs verify."
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=None,
+        help="Directory for the input, .hypn and restored files. Needs about twice the largest size "
+             "free (default: a temporary directory)."
+    )
+    parser.add_argument(
+        "--max-growth-mb",
+        type=float,
+        default=16.0,
+        help="Exit with status 1 if peak RSS grows by more than this many MiB per GiB of input."
+    )
+    parser.add_argument(
+        "--max-rss-mb",
+        type=float,
+        default=None,
+        help="Also exit with status 1 if any operation peaks above this many MiB."
+    )
+    parser.add_argument(
+        "--python",
+        default=sys.executable,
+        help="Interpreter used for the operation subprocesses."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=3600.0,
+        help="Seconds to wait for a single operation."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the results to."
+    )
+    parser.add_argument("--child", choices=OPERATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Keep the protocol's progress prints out of the way of the result line
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = run_child(args.child, args.workdir)
+        print("VT_MEMORY " + json.dumps(result), flush=True)
+        return
+
+    ops = [op for op in OPERATIONS if op in args.ops]
+    sizes = sorted(parse_size(s) for s in args.sizes)
+    results = []
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="vt_memory_")))
+        workdir.mkdir(parents=True, exist_ok=True)
+
+        # The .hypn, the restored plaintext and (unless sparse) the input all exist at once
+        needed = sizes[-1] * (1 + ("verify" in ops) + (args.input == "pattern"))
+        free = shutil.disk_usage(workdir).free
+        if free < needed:
+            print(f"Not enough space in {workdir}: {needed / GiB:.1f} GiB needed, {free / GiB:.1f} GiB free. "
+                  f"Use --workdir or smaller --sizes.")
+            sys.exit(2)
+
+        print(f"{'size':>8}{'op':>8}{'wall s':>10}{'MB/s':>10}{'peak RSS MiB':>15}{'over baseline MiB':>19}")
+        for size in sizes:
+            make_input(workdir / "input.bin", size, args.input)
+            try:
+                for op in ops:
+                    r = launch(op, workdir, args.python, args.timeout)
+                    r.update(op=op, size=size, throughput_mb_s=size / (1024 ** 2) / r["wall_s"] if r["wall_s"] else 0.0)
+                    results.append(r)
+                    print(f"{human(size):>8}{op:>8}{r['wall_s']:>10.2f}{r['throughput_mb_s']:>10.1f}"
+                          f"{r['peak_rss'] / 1024 ** 2:>15.1f}{(r['peak_rss'] - r['baseline_rss']) / 1024 ** 2:>19.1f}")
+            finally:
+                for name in ("input.bin", "input.hypn", "restored.bin", "file_info.pickle"):
+                    with contextlib.suppress(FileNotFoundError):
+                        (workdir / name).unlink()
+
+    failures = []
+    growth = {}
+    print()
+    for op in ops:
+        points = [(r["size"], r["peak_rss"]) for r in results if r["op"] == op]
+        growth[op] = growth_per_gib(points) / 1024 ** 2
+        print(f"{op:<8} peak RSS grows {growth[op]:+.2f} MiB per GiB of input (budget {args.max_growth_mb:.2f})")
+        if growth[op] > args.max_growth_mb:
+            failures.append(f"{op}: peak RSS grows {growth[op]:.2f} MiB/GiB, budget {args.max_growth_mb:.2f}")
+        peak = max(rss for _, rss in points) / 1024 ** 2
+        if args.max_rss_mb is not None and peak > args.max_rss_mb:
+            failures.append(f"{op}: peak RSS {peak:.1f} MiB exceeds {args.max_rss_mb:.1f} MiB")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "input": args.input,
+            "budget": {"max_growth_mb_per_gib": args.max_growth_mb, "max_rss_mb": args.max_rss_mb},
+            "growth_mb_per_gib": growth,
+            "results": results,
+        }, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if failures:
+        print("\nFAIL:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import contextlib
+import csv
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from bitarray import bitarray
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from DataEncap import protocol_config
+from DataEncap.enrollment.enrollmentUtils import enrollmentUtils
+from DataEncap.protocolUtils import protocolUtils
+from DataEncap.verification.verificationUtils import verificationUtils
+
+CSV_COLUMNS = [
+    "size", "gamma0", "ber", "match_ber", "trial",
+    "matches", "collisions", "ftds", "candidates", "searched", "recovered",
+    "t_detect(s)", "t_search(s)", "t_recover(s)",
+]
+
+@contextlib.contextmanager
+def quiet():
+    # generate_possible_keys prints a line per candidate
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def random_bits(rng: random.Random, n: int) -> bitarray:
+    bits = bitarray()
+    bits.frombytes(rng.randbytes((n + 7) // 8))
+    return bits[:n]
+
+def flip_bits(response: bitarray, ber: float, rng: random.Random) -> bitarray:
+    """Copy of `response` with each bit flipped independently with probability ber."""
+    noisy = response.copy()
+    for i in range(len(noisy)):
+        if rng.random() < ber:
+            noisy[i] = not noisy[i]
+    return noisy
+
+def run_trial(size, gamma0, ber, match_ber, trial, seed, max_candidates):
+    """
+    Enroll a random key of `size` bits, regenerate the responses with bit errors at
+    rate `ber`, and try to recover the key the way verification_stages does.
+    """
+    rng = random.Random(f"{seed}:{size}:{gamma0}:{ber}:{trial}")
+    eUtils = enrollmentUtils()
+    pUtils = protocolUtils()
+    vUtils = verificationUtils()
+    g = gamma0 - 1
+
+    # Enrollment side: l, omega and s with the same zero-run limit enrollment applies
+    l = eUtils.break_runs(random_bits(rng, size), g)
+    w = eUtils.break_runs(random_bits(rng, size), g)
+    s = eUtils.break_runs(random_bits(rng, size), g)
+    f_double_circle = pUtils.generate_f_double_circle(None, [w, s], protocol_config.d, file_digest=rng.randbytes(32))
+    challenges = pUtils.generate_challenges(s, protocol_config.D, num_challenges=size + 1)
+    with quiet():
+        responses = pUtils.generate_responses(f_double_circle, challenges, protocol_config.alpha,
+                                              protocol_config.beta, protocol_config.P, protocol_config.d)
+    kr = eUtils.subset_of_responses(l, responses[1:])
+    hkey = pUtils.hash_key(l)
+
+    # Verification side: the regenerated responses are noisy, Kr is what was stored
+    noisy = [flip_bits(r, ber, rng) for r in responses[1:]]
+    start = time.perf_counter()
+    match, collision, ftd = vUtils.error_detection(noisy, kr, gamma0, match_ber, size)
+    counts = len(match), len(collision), len(ftd)
+    match, collision = vUtils.merge_matches_with(match, collision)
+    match, ftd = vUtils.merge_matches_with(match, ftd)
+    t_detect = time.perf_counter() - start
+
+    candidates = vUtils.get_num_possible_keys(collision, ftd)
+    row = {
+        "size": size, "gamma0": gamma0, "ber": ber, "match_ber": match_ber, "trial": trial,
+        "matches": counts[0], "collisions": counts[1], "ftds": counts[2], "candidates": candidates,
+        "searched": False, "recovered": False, "t_detect(s)": t_detect, "t_search(s)": None, "t_recover(s)": None,
+    }
+    if candidates > max_candidates:
+        return row
+
+    stats = {}
+    start = time.perf_counter()
+    with quiet():
+        key = vUtils.generate_possible_keys(match, collision, ftd, size, hkey, stats=stats)
+    t_search = time.perf_counter() - start
+    row.update({
+        "searched": True,
+        "recovered": stats["key_recovered"] and key == l,
+        "t_search(s)": t_search,
+        "t_recover(s)": t_detect + t_search,
+    })
+    return row
+
+def summarize(rows):
+    recovered = [r for r in rows if r["recovered"]]
+    return {
+        "success": len(recovered) / len(rows),
+        "matches": statistics.median(r["matches"] for r in rows),
+        "collisions": statistics.median(r["collisions"] for r in rows),
+        "ftds": statistics.median(r["ftds"] for r in rows),
+        "candidates": statistics.median(r["candidates"] for r in rows),
+        "skipped": sum(not r["searched"] for r in rows),
+        "t_recover": statistics.median(r["t_recover(s)"] for r in recovered) if recovered else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inject bit errors into regenerated responses and measure key recovery (error detection + "
+                    "candidate search) across BER, gamma0 and key size."
+    )
+    parser.add_argument(
+        "--ber",
+        type=float,
+        nargs="+",
+        default=[0.0, 0.001, 0.005, 0.01, 0.02, 0.05],
+        help="Bit error rates injected into the verification-side responses."
+    )
+    parser.add_argument(
+        "--match-ber",
+        type=float,
+        nargs="+",
+        default=[protocol_config.BER],
+        help="BER tolerance passed to error_detection (a response matches within int(P * BER) bit errors)."
+    )
+    parser.add_argument(
+        "--gamma0",
+        type=int,
+        nargs="+",
+        default=[protocol_config.gamma0],
+        help="Error-detection window; enrollment limits zero runs in the key to gamma0 - 1."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[protocol_config.size],
+        help="Key sizes in bits (one response per bit)."
+    )
+    parser.add_argument(
+        "--trials",
+        type=int,
+        default=20,
+        help="Random keys per combination."
+    )
+    parser.add_argument(
+        "--max-candidates",
+        type=int,
+        default=100_000,
+        help="Skip the candidate search (and count it as not recovered) above this many candidates."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=1234,
+        help="Seed for keys, file digests and injected errors."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="CSV file to append per-trial results to."
+    )
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'size':>6}{'gamma0':>8}{'BER':>8}{'match':>7}{'success':>9}{'matches':>9}{'colls':>7}{'FTDs':>6}"
+          f"{'candidates':>12}{'skipped':>9}{'recover s':>11}")
+    for size in args.sizes:
+        for gamma0 in args.gamma0:
+            for match_ber in args.match_ber:
+                for ber in args.ber:
+                    combo = [run_trial(size, gamma0, ber, match_ber, t, args.seed, args.max_candidates)
+                             for t in range(args.trials)]
+                    rows += combo
+                    s = summarize(combo)
+                    t = f"{s['t_recover']:.4f}" if s["t_recover"] is not None else "–"
+                    print(f"{size:>6}{gamma0:>8}{ber:>8.3f}{match_ber:>7.2f}{s['success']:>9.0%}{s['matches']:>9.0f}"
+                          f"{s['collisions']:>7.0f}{s['ftds']:>6.0f}{s['candidates']:>12.3g}"
+                          f"{s['skipped']:>9}{t:>11}")
+
+    if args.output:
+        write_header = not args.output.exists()
+        with args.output.open("a", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            if write_header:
+                writer.writerow(CSV_COLUMNS)
+            for r in rows:
+                writer.writerow([f"{r[c]:.6f}" if c.startswith("t_") and r[c] is not None else r[c]
+                                 for c in CSV_COLUMNS])
+        print(f"\nResults appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from DataEncap import protocol_config
+from DataEncap.protocol_config import PROFILES, ParameterSet
+from DataEncap.enrollment import enrollmentUtils as enrollment_utils_module
+from DataEncap.enrollment.enrollment import enrollment_protocol
+from DataEncap.enrollment.enrollmentUtils import enrollmentUtils
+from DataEncap.protocolUtils import protocolUtils
+from DataEncap.verification.verification import verification_protocol
+from DataEncap.verification.verificationUtils import verificationUtils
+
+# Every case is keyed by name + parameters, so results from two runs can be matched up
+STAGES = ["f_double_circle", "challenges", "responses", "error_detection", "possible_keys"]
+PROTOCOLS = ["enrollment", "verification"]
+
+def parse_size(text: str) -> int:
+    """'4096', '64K', '16M' -> bytes."""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper().rstrip("B").rstrip("I")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def case_key(name: str, params: dict) -> str:
+    return name + "[" + ",".join(f"{k}={params[k]}" for k in sorted(params)) + "]"
+
+@contextlib.contextmanager
+def quiet():
+    """The protocol prints progress lines; keep them out of the timings and the report."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+@contextlib.contextmanager
+def seeded_keys(seed: int):
+    """
+    Make enrollment draw l, omega and s from a seeded PRNG instead of the CSPRNG, so every
+    run (and every revision being compared) enrolls with the same keys and therefore
+    searches the same number of key candidates during verification.
+    """
+    rng = random.Random(seed)
+    original = enrollment_utils_module.secrets
+    enrollment_utils_module.secrets = SimpleNamespace(token_bytes=rng.randbytes)
+    try:
+        yield
+    finally:
+        enrollment_utils_module.secrets = original
+
+def write_input_file(directory: Path, file_size: int, seed: int) -> Path:
+    """Deterministic pseudo-random input of file_size bytes (incompressible, like real ciphertext)."""
+    path = directory / f"input_{file_size}.bin"
+    if path.exists() and path.stat().st_size == file_size:
+        return path
+    rng = random.Random(seed)
+    with path.open("wb") as f:
+        remaining = file_size
+        while remaining:
+            n = min(remaining, 1024 * 1024)
+            f.write(rng.randbytes(n))
+            remaining -= n
+    return path
+
+def seeded_crp(seed: int, D: int, P: int, size: int = protocol_config.size):
+    """
+    Keys, f°° and responses as enrollment would produce them, from a seed. The stage
+    benchmarks start from these so each one times a single stage.
+    """
+    with seeded_keys(seed):
+        eUtils = enrollmentUtils()
+        l = eUtils.generate_ephemeral_key(size)
+        w, s = eUtils.generate_Kc(size)
+    pUtils = protocolUtils()
+    digest = hashlib.sha256(random.Random(seed).randbytes(64)).digest()
+    f_double_circle = pUtils.generate_f_double_circle(None, [w, s], 2 ** D, file_digest=digest)
+    challenges = pUtils.generate_challenges(s, D, num_challenges=size + 1)
+    with quiet():
+        responses = pUtils.generate_responses(f_double_circle, challenges, protocol_config.alpha,
+                                              protocol_config.beta, P, 2 ** D)
+    kr = eUtils.subset_of_responses(l, responses[1:])
+    return SimpleNamespace(l=l, w=w, s=s, digest=digest, f_double_circle=f_double_circle,
+                           challenges=challenges, responses=responses, kr=kr, hkey=pUtils.hash_key(l))
+
+def default_P(size: int) -> int:
+    """P for a key size when --P is not given: the configured P up to the default key size,
+    the "large" profile's (16) above it, where P=8 leaves too many key candidates to search."""
+    return protocol_config.P if size <= protocol_config.size else PROFILES["large"].P
+
+def stage_cases(Ds, Ps, key_sizes, seed):
+    """Yield (name, params, fn) for the individual protocol stages (Ps=None: default_P per key size)."""
+    pUtils = protocolUtils()
+    vUtils = verificationUtils()
+    for size, D in itertools.product(key_sizes, Ds):
+        size_Ps = Ps or [default_P(size)]
+        for P in size_Ps:
+            crp = seeded_crp(seed, D, P, size)
+            d = 2 ** D
+            params = {"D": D, "P": P}
+            if size != protocol_config.size:
+                params["size"] = size
+            if P == size_Ps[0]:
+                per_D = {k: v for k, v in params.items() if k != "P"}
+                yield "f_double_circle", per_D, lambda crp=crp, d=d: pUtils.generate_f_double_circle(
+                    None, [crp.w, crp.s], d, file_digest=crp.digest)
+                yield "challenges", per_D, lambda crp=crp, D=D, size=size: pUtils.generate_challenges(
+                    crp.s, D, num_challenges=size + 1)
+            yield "responses", params, lambda crp=crp, d=d, P=P: pUtils.generate_responses(
+                crp.f_double_circle, crp.challenges, protocol_config.alpha, protocol_config.beta, P, d)
+
+            def detect(crp=crp, size=size):
+                match, collision, ftd = vUtils.error_detection(
+                    crp.responses[1:], crp.kr, protocol_config.gamma0, protocol_config.BER, size)
+                match, collision = vUtils.merge_matches_with(match, collision)
+                match, ftd = vUtils.merge_matches_with(match, ftd)
+                return match, collision, ftd
+            yield "error_detection", params, detect
+
+            match, collision, ftd = detect()
+            candidates = vUtils.get_num_possible_keys(collision, ftd)
+
+            def search(crp=crp, match=match, collision=collision, ftd=ftd, size=size):
+                # merge_matches_with edits its lists in place; search from fresh copies
+                return vUtils.generate_possible_keys(list(match), [list(c) for c in collision],
+                                                     [list(f) for f in ftd], size, crp.hkey)
+            yield "possible_keys", dict(params, candidates=candidates), search
+
+def size_params(size: int, P: int) -> dict:
+    # Only non-default key sizes and P appear in case keys, so reports from before these
+    # options existed still match up
+    params = {}
+    if size != protocol_config.size:
+        params["size"] = size
+    if P != protocol_config.P:
+        params["P"] = P
+    return params
+
+def protocol_cases(file_sizes, key_sizes, P_arg, seed, workdir):
+    """Yield (name, params, fn) for full enrollment and verification at each file and key size
+    (P_arg=None: default_P per key size)."""
+    for key_size, file_size in itertools.product(key_sizes, file_sizes):
+        P = P_arg if P_arg is not None else default_P(key_size)
+        protocol_params = ParameterSet(size=key_size, P=P)
+        source = write_input_file(workdir, file_size, seed)
+        encrypted = workdir / f"input_{file_size}_{key_size}.hypn"
+        params = dict(size_params(key_size, P), file_size=file_size)
+
+        def enroll(source=source, encrypted=encrypted, protocol_params=protocol_params):
+            with seeded_keys(seed):
+                ok, file_info, message = enrollment_protocol(
+                    str(source), source.stem, "benchmark", source.suffix, output_path=str(encrypted),
+                    params=protocol_params)
+            if not ok:
+                raise RuntimeError(message)
+            return file_info
+        yield "enrollment", params, enroll
+
+        # Verification gets its own enrolled copy: the enrollment runs rewrite `encrypted`
+        # with a fresh IV, which changes f°° and would invalidate this record
+        with quiet():
+            file_info = enroll(encrypted=workdir / f"input_{file_size}_{key_size}.verify.hypn")
+        plaintext_path = workdir / f"output_{file_size}.bin"
+
+        def verify(file_info=file_info, plaintext_path=plaintext_path):
+            stats = {}
+            # Without the caches, so every run hashes the file and regenerates the CRP data
+            result, _ = verification_protocol(file_info, stats=stats, output_path=str(plaintext_path),
+                                              crp_cache=False, digest_cache=False)
+            if result is None or not stats.get("key_recovered"):
+                raise RuntimeError(f"verification failed: {stats}")
+            return result
+        yield "verification", params, verify
+
+def time_case(fn, runs: int, warmup: int) -> list:
+    with quiet():
+        for _ in range(warmup):
+            fn()
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return times
+
+def summarize(times: list) -> dict:
+    return {
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "min": min(times),
+        "max": max(times),
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results: list, baseline: dict, threshold: float, min_delta: float) -> list:
+    """
+    Return (key, baseline median, current median, ratio) for the cases slower than the
+    threshold allows. Sub-millisecond stages jitter by more than any sensible threshold,
+    so a case must also have slowed by at least min_delta seconds to count.
+    """
+    previous = {r["key"]: r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'case':<58}{'baseline ms':>13}{'current ms':>12}{'change':>9}")
+    for r in results:
+        old = previous.get(r["key"])
+        if old is None:
+            continue
+        ratio = r["median"] / old["median"] if old["median"] else float("inf")
+        slower = ratio > 1 + threshold and r["median"] - old["median"] >= min_delta
+        flag = "  REGRESSION" if slower else ""
+        print(f"{r['key']:<58}{old['median'] * 1000:>13.3f}{r['median'] * 1000:>12.3f}{(ratio - 1) * 100:>+8.1f}%{flag}")
+        if flag:
+            regressions.append((r["key"], old["median"], r["median"], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the DataEncap enrollment and verification protocols and their stages."
+    )
+    parser.add_argument(
+        "--file-sizes",
+        nargs="+",
+        default=["1K", "1M", "16M"],
+        help="Input sizes for the full-protocol cases (suffixes K, M, G allowed)."
+    )
+    parser.add_argument(
+        "--D",
+        dest="Ds",
+        type=int,
+        nargs="+",
+        default=[protocol_config.D],
+        help="log2 of the f°° length in bits (d = 2**D) for the stage cases."
+    )
+    parser.add_argument(
+        "--P",
+        dest="Ps",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Bits per response for the stage cases; full runs use the first. Default: %d up to %d-bit keys, "
+             "%d (as in the \"large\" profile) above." % (protocol_config.P, protocol_config.size, PROFILES["large"].P)
+    )
+    parser.add_argument(
+        "--key-sizes",
+        type=int,
+        nargs="+",
+        default=[protocol_config.size, 1024, 4096],
+        help="Key sizes in bits (one challenge and response per bit) for the stage and full-protocol cases. "
+             "Keys much above 1024 bits need P=16 to keep the number of key candidates searchable."
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=STAGES + PROTOCOLS,
+        default=None,
+        help="Run only these cases."
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Measured runs per case."
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="Unmeasured runs per case first (page cache, imports, allocator)."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=1234,
+        help="Seed for the input files and the protocol keys."
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=None,
+        help="Directory for the generated input and .hypn files (default: a temporary directory)."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the results to."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="JSON results of an earlier run to compare against."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Exit with status 1 if any case's median is this fraction slower than the baseline."
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=0.1,
+        help="Ignore slowdowns smaller than this in absolute terms (timer noise on tiny stages)."
+    )
+    args = parser.parse_args()
+
+    file_sizes = [parse_size(s) for s in args.file_sizes]
+    selected = set(args.only or STAGES + PROTOCOLS)
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="vt_bench_")))
+        workdir.mkdir(parents=True, exist_ok=True)
+
+        cases = []
+        if selected & set(STAGES):
+            with quiet():
+                cases += [c for c in stage_cases(args.Ds, args.Ps, args.key_sizes, args.seed) if c[0] in selected]
+        if selected & set(PROTOCOLS):
+            # Full runs use the first --P (else default_P per key size); D is the configured one
+            cases += [c for c in protocol_cases(file_sizes, args.key_sizes, args.Ps[0] if args.Ps else None,
+                                                args.seed, workdir)
+                      if c[0] in selected]
+
+        results = []
+        print(f"{'case':<58}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+        for name, params, fn in cases:
+            times = time_case(fn, args.runs, args.warmup)
+            r = dict(name=name, params=params, key=case_key(name, params), times=times, **summarize(times))
+            results.append(r)
+            print(f"{r['key']:<58}{r['median'] * 1000:>12.3f}{r['min'] * 1000:>10.3f}{r['max'] * 1000:>10.3f}")
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "runs": args.runs,
+            "warmup": args.warmup,
+            "config": {k: getattr(protocol_config, k) for k in ("size", "D", "alpha", "beta", "P", "gamma0", "BER")},
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold,
+                              args.min_delta_ms / 1000)
+        if regressions:
+            print(f"\nFAIL: {len(regressions)} case(s) more than {args.threshold:.0%} slower than {args.baseline}")
+            sys.exit(1)
+        print(f"\nOK: no case more than {args.threshold:.0%} slower than {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
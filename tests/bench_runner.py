@@ -0,0 +1,259 @@
+"""
+Shared benchmark runner: isolated timing and memory runs, summary statistics and
+comparison of two git revisions. Used by test_script.py; see run_configs().
+
+A benchmark is described by a top-level `setup(config)` function that prepares its
+inputs (untimed) and returns {stage name: zero-argument callable}, in the order the
+stages should run. Each configuration is measured in its own process:
+
+- timing runs: `warmup` unmeasured iterations, then `runs` measured ones, with
+  nothing else (no tracemalloc, no RSS sampling) active in the timed region;
+- memory runs: one fresh process per stage and run. The earlier stages run first
+  as untimed setup (a stage may consume what they produced), then the peak RSS is
+  reset and the stage runs alone, so its peak-RSS delta is not hidden by the
+  high-water mark an earlier stage left behind. tracemalloc is enabled only here,
+  in a second pass after the RSS measurement.
+
+The peak is reset through /proc/self/clear_refs and read back from VmHWM (Linux).
+Elsewhere the getrusage high-water mark is all there is, and only the first stage's
+delta is meaningful.
+"""
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# Bootstrap resamples for the confidence interval of the median
+BOOTSTRAP_RESAMPLES = 2000
+
+def code_root() -> Path:
+    """Tree whose code is being benchmarked (VT_BENCH_ROOT when comparing revisions)."""
+    return Path(os.environ.get("VT_BENCH_ROOT", ROOT_DIR)).resolve()
+
+def use_code_root():
+    root = str(code_root())
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+def _peak_rss() -> int:
+    """High-water resident set size of this process, in bytes."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _proc_status(field) -> int:
+    """A /proc/self/status memory field (VmRSS, VmHWM), in bytes."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+def _reset_peak_rss() -> bool:
+    """Reset this process's VmHWM to its current RSS; False where that is not supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        _proc_status("VmHWM")
+    except (OSError, KeyError):
+        return False
+    return True
+
+@contextlib.contextmanager
+def _quiet():
+    # The protocol functions print as they go; a terminal would dominate small stages
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def _timing_task(setup, config, runs, warmup):
+    use_code_root()
+    with _quiet():
+        return _time_calls(setup(config), runs, warmup)
+
+def _time_calls(calls, runs, warmup):
+    for _ in range(warmup):
+        for fn in calls.values():
+            fn()
+    samples = {name: {"wall": [], "cpu": []} for name in calls}
+    for _ in range(runs):
+        gc.collect()
+        for name, fn in calls.items():
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            fn()
+            wall = time.perf_counter() - start
+            samples[name]["wall"].append(wall)
+            samples[name]["cpu"].append(time.process_time() - cpu_start)
+    return samples
+
+def _memory_task(setup, config, stage):
+    use_code_root()
+    with _quiet():
+        return _measure_memory(setup(config), stage)
+
+def _measure_memory(calls, stage):
+    # Earlier stages are setup for this one: run, but not measured
+    for name, fn in calls.items():
+        if name == stage:
+            break
+        fn()
+    fn = calls[stage]
+
+    gc.collect()
+    if _reset_peak_rss():
+        before = _proc_status("VmRSS")
+        fn()
+        rss_delta = _proc_status("VmHWM") - before
+    else:
+        before = _peak_rss()
+        fn()
+        rss_delta = _peak_rss() - before
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rss_peak_delta": rss_delta, "peak_alloc": peak_alloc}
+
+def summarize(samples, seed=0) -> dict:
+    """Mean, spread, percentiles and a bootstrap 95% confidence interval of the median."""
+    n = len(samples)
+    ordered = sorted(samples)
+    if n > 1:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p90, p99 = cuts[89], cuts[98]
+    else:
+        p90 = p99 = ordered[0]
+    rng = random.Random(seed)
+    medians = sorted(statistics.median(rng.choices(ordered, k=n)) for _ in range(BOOTSTRAP_RESAMPLES if n > 1 else 1))
+    return {
+        "n": n,
+        "mean": statistics.fmean(ordered),
+        "stdev": statistics.stdev(ordered) if n > 1 else 0.0,
+        "min": ordered[0],
+        "p50": statistics.median(ordered),
+        "p90": p90,
+        "p99": p99,
+        "max": ordered[-1],
+        "ci95": [medians[int(0.025 * (len(medians) - 1))], medians[int(0.975 * (len(medians) - 1))]],
+    }
+
+def run_configs(setup, configs, runs, warmup=3, memory_runs=3, jobs=1):
+    """
+    Measure every configuration and return one result per configuration, in order:
+    {"config", "stages": {name: {"wall", "cpu" (summaries), "wall_samples", "cpu_samples",
+    "rss_peak_delta", "peak_alloc" (max over the memory runs)}}}.
+
+    Configurations run concurrently on up to `jobs` processes. Every task gets a fresh
+    (spawned, not forked) process; keep `jobs` at or below the number of idle cores, or
+    the timings contend. Memory runs take one task per stage, queued behind the timing
+    runs once the stage names are known from a configuration's timing result.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, max_tasks_per_child=1) as pool:
+        timing = [pool.submit(_timing_task, setup, config, runs, warmup) for config in configs]
+        samples = []
+        memory = []
+        for config, timing_future in zip(configs, timing):
+            samples.append(timing_future.result())
+            memory.append({name: [pool.submit(_memory_task, setup, config, name) for _ in range(memory_runs)]
+                           for name in samples[-1]})
+
+        results = []
+        for config, config_samples, memory_futures in zip(configs, samples, memory):
+            stages = {}
+            for name, s in config_samples.items():
+                mem = [f.result() for f in memory_futures[name]]
+                stages[name] = {
+                    "wall": summarize(s["wall"]),
+                    "cpu": summarize(s["cpu"]),
+                    "wall_samples": s["wall"],
+                    "cpu_samples": s["cpu"],
+                    "rss_peak_delta": max((m["rss_peak_delta"] for m in mem), default=None),
+                    "peak_alloc": max((m["peak_alloc"] for m in mem), default=None),
+                }
+            results.append({"config": config, "stages": stages})
+    return results
+
+def print_summary(results, config_label):
+    print(f"{'configuration':<34}{'stage':<10}{'p50 ms':>10}{'95% CI ms':>22}{'p90 ms':>10}{'p99 ms':>10}"
+          f"{'peak alloc':>12}{'RSS delta':>12}")
+    for r in results:
+        for name, stage in r["stages"].items():
+            w = stage["wall"]
+            ci = f"[{w['ci95'][0] * 1000:.3f}, {w['ci95'][1] * 1000:.3f}]"
+            print(f"{config_label(r['config']):<34}{name:<10}{w['p50'] * 1000:>10.3f}{ci:>22}"
+                  f"{w['p90'] * 1000:>10.3f}{w['p99'] * 1000:>10.3f}"
+                  f"{stage['peak_alloc'] or 0:>12}{stage['rss_peak_delta'] or 0:>12}")
+
+def write_report(path: Path, results, meta=None):
+    path.write_text(json.dumps({"meta": meta or {}, "results": results}, indent=2))
+
+def _git(*args, cwd=ROOT_DIR):
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+def run_at_revisions(script: Path, argv, revisions):
+    """
+    Run `script` once per git revision, each against a detached worktree of that
+    revision (the benchmark script itself is always the current one), and return the
+    JSON reports in the same order. argv must not contain --json.
+    """
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="vt_bench_rev_") as tmp:
+        for rev in revisions:
+            sha = _git("rev-parse", "--verify", f"{rev}^{{commit}}")
+            tree = Path(tmp) / sha[:12]
+            _git("worktree", "add", "--detach", str(tree), sha)
+            try:
+                out = Path(tmp) / f"{sha[:12]}.json"
+                env = dict(os.environ, VT_BENCH_ROOT=str(tree))
+                print(f"--- {rev} ({sha[:12]}) ---", flush=True)
+                subprocess.run([sys.executable, str(script), *argv, "--json", str(out)], env=env, check=True)
+                report = json.loads(out.read_text())
+                report.setdefault("meta", {})["revision"] = sha
+                reports.append(report)
+            finally:
+                _git("worktree", "remove", "--force", str(tree))
+    return reports
+
+def compare_reports(base, head, config_label, base_name="base", head_name="head"):
+    """
+    Print the change in median wall time per configuration and stage. A change is only
+    called significant when the two 95% confidence intervals do not overlap.
+    """
+    # Configurations are matched by label: their other fields (e.g. temp paths) differ per run
+    def index(report):
+        return {(config_label(r["config"]), name): stage
+                for r in report["results"] for name, stage in r["stages"].items()}
+    old, new = index(base), index(head)
+
+    print(f"\n{'configuration':<34}{'stage':<10}{base_name + ' ms':>14}{head_name + ' ms':>14}{'change':>9}")
+    for key, stage in new.items():
+        if key not in old:
+            continue
+        a, b = old[key]["wall"], stage["wall"]
+        change = (b["p50"] / a["p50"] - 1) * 100 if a["p50"] else float("inf")
+        overlap = a["ci95"][0] <= b["ci95"][1] and b["ci95"][0] <= a["ci95"][1]
+        verdict = "" if overlap else ("  slower" if change > 0 else "  faster")
+        print(f"{key[0]:<34}{key[1]:<10}{a['p50'] * 1000:>14.3f}{b['p50'] * 1000:>14.3f}"
+              f"{change:>+8.1f}%{verdict}")
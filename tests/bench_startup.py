@@ -0,0 +1,132 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+THEME_CACHE_DIR = ROOT_DIR / ".cache" / "theme"
+
+# Phases reported by main.py (VT_STARTUP_PROBE), in order; each is measured from the previous one
+PHASES = [
+    ("interpreter", "main_imported"),   # process spawn + interpreter start-up
+    ("imports", "imports_done"),        # PyQt6 + app modules
+    ("qapplication", "app_created"),
+    ("theme", "theme_applied"),         # stylesheet (cached or compiled)
+    ("window", "window_built"),         # MainWindow construction
+    ("first_paint", "first_paint"),     # show() until the first paint event
+]
+
+def launch_once(python: str, timeout: float) -> dict:
+    """Start the app once with the startup probe enabled; return per-phase seconds."""
+    env = dict(os.environ, VT_STARTUP_PROBE="1")
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [python, str(ROOT_DIR / "main.py")], cwd=ROOT_DIR, env=env,
+        capture_output=True, text=True, timeout=timeout,
+    )
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("VT_STARTUP ")), None)
+    if line is None:
+        raise RuntimeError(f"main.py did not report startup (exit {proc.returncode}):\n{proc.stderr}")
+    marks = json.loads(line[len("VT_STARTUP "):])
+
+    timings = {}
+    prev = start
+    for phase, mark in PHASES:
+        timings[phase] = marks[mark] - prev
+        prev = marks[mark]
+    timings["total"] = marks["first_paint"] - start
+    timings["theme_cached"] = marks.get("theme_cached", False)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark desktop app start-up: time from launch to the main window's first paint."
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=10,
+        help="Number of measured launches."
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="Unmeasured launches first (fills the OS page cache and the theme cache)."
+    )
+    parser.add_argument(
+        "--cold-theme",
+        action="store_true",
+        help="Delete the cached stylesheet before every launch to measure the uncached path."
+    )
+    parser.add_argument(
+        "--python",
+        default=sys.executable,
+        help="Interpreter used to launch main.py."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="Seconds to wait for a single launch."
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Exit with status 1 if the median time to first paint exceeds this."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="CSV file to append per-launch results to."
+    )
+    args = parser.parse_args()
+
+    for _ in range(args.warmup):
+        if args.cold_theme:
+            shutil.rmtree(THEME_CACHE_DIR, ignore_errors=True)
+        launch_once(args.python, args.timeout)
+
+    results = []
+    for run_idx in range(1, args.runs + 1):
+        if args.cold_theme:
+            shutil.rmtree(THEME_CACHE_DIR, ignore_errors=True)
+        timings = launch_once(args.python, args.timeout)
+        results.append(timings)
+        print(f"run {run_idx:>3}: first paint after {timings['total'] * 1000:8.1f} ms "
+              f"(theme {'cached' if timings['theme_cached'] else 'compiled'})")
+
+    print()
+    print(f"{'phase':<14}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for phase in [p for p, _ in PHASES] + ["total"]:
+        values = [r[phase] * 1000 for r in results]
+        print(f"{phase:<14}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+    if args.output:
+        write_header = not args.output.exists()
+        with args.output.open("a", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            if write_header:
+                writer.writerow(["run", "theme_cached"] + [f"t_{p}(s)" for p, _ in PHASES] + ["t_total(s)"])
+            for run_idx, r in enumerate(results, start=1):
+                writer.writerow([run_idx, r["theme_cached"]] + [f"{r[p]:.6f}" for p, _ in PHASES]
+                                + [f"{r['total']:.6f}"])
+        print(f"\nResults appended to {args.output}")
+
+    median_total = statistics.median(r["total"] for r in results) * 1000
+    if args.budget_ms is not None and median_total > args.budget_ms:
+        print(f"FAIL: median time to first paint {median_total:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Columnar store of benchmark results, with run metadata and incrementally updated
+per-partition summaries. Used by test_script.py (writing) and test_script_analysis.py /
+plot_benchmarks.py (reading); see write_run() and update_summary().
+
+Layout of a store directory:
+
+- runs/<run_id>.parquet: one file per benchmark invocation, one typed column per
+  field (Parquet via pyarrow when it is installed, else runs/<run_id>.npz);
+- runs/<run_id>.json: its metadata (git revision, host, parameters, column types),
+  written last, so a run without it is incomplete and ignored;
+- summary.json: count, sum, sum of squares, min and max of every metric per
+  partition (revision, host and the configuration columns). update_summary() only
+  reads the runs added since it last ran, so summarizing stays cheap however many
+  runs the store holds.
+"""
+import datetime
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # runs are stored as .npz instead
+    pa = pq = None
+
+from bench_runner import code_root
+
+SUMMARY_VERSION = 1
+
+def git_revision(root: Path = None) -> str:
+    """Commit of the benchmarked tree, with "+dirty" if tracked files were modified."""
+    root = root or code_root()
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return sha + ("+dirty" if dirty else "")
+
+def run_metadata(params: dict) -> dict:
+    """Metadata recorded with a run: where and on what code it ran, and its parameters."""
+    return {
+        "revision": git_revision(),
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "params": params,
+    }
+
+def write_run(store: Path, columns: dict, meta: dict, partition_by) -> str:
+    """
+    Add a run to the store. `columns` maps column names to equal-length arrays; the
+    `partition_by` columns (integers) identify a configuration, every other column except "run"
+    is summarized as a metric. Returns the run id.
+    """
+    runs_dir = Path(store) / "runs"
+    runs_dir.mkdir(parents=True, exist_ok=True)
+    run_id = f"{datetime.datetime.now(datetime.timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    arrays = {name: np.asarray(values) for name, values in columns.items()}
+    lengths = {len(a) for a in arrays.values()}
+    if len(lengths) != 1:
+        raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+
+    if pq is not None:
+        fmt, tmp = "parquet", runs_dir / f".{run_id}.parquet"
+        pq.write_table(pa.table(arrays), tmp)
+    else:
+        fmt, tmp = "npz", runs_dir / f".{run_id}.npz"
+        with tmp.open("wb") as f:
+            np.savez(f, **arrays)
+    os.replace(tmp, runs_dir / f"{run_id}.{fmt}")
+
+    meta = dict(meta, run_id=run_id, format=fmt, rows=lengths.pop(), partition_by=list(partition_by),
+                columns={name: str(a.dtype) for name, a in arrays.items()})
+    tmp = runs_dir / f".{run_id}.json"
+    tmp.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp, runs_dir / f"{run_id}.json")
+    return run_id
+
+def read_run(store: Path, meta: dict) -> dict:
+    """The columns of a run, as {name: numpy array}."""
+    path = Path(store) / "runs" / f"{meta['run_id']}.{meta['format']}"
+    if meta["format"] == "parquet":
+        if pq is None:
+            raise RuntimeError(f"{path} is a Parquet file; install pyarrow to read it")
+        table = pq.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def iter_runs(store: Path):
+    """Metadata of every complete run in the store, oldest first."""
+    for path in sorted((Path(store) / "runs").glob("*.json")):
+        if not path.name.startswith("."):
+            yield json.loads(path.read_text())
+
+def _partition_key(revision, host, config) -> str:
+    return "|".join([revision, host] + [f"{k}={v}" for k, v in config.items()])
+
+def _fold(summary: dict, meta: dict, columns: dict):
+    partition_by = meta["partition_by"]
+    metrics = [name for name in columns if name not in partition_by and name != "run"]
+    keys = np.column_stack([columns[name] for name in partition_by])
+    uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    counts = np.bincount(inverse, minlength=len(uniq))
+    aggregates = {}
+    for name in metrics:
+        x = columns[name].astype(np.float64)
+        lo = np.full(len(uniq), np.inf)
+        hi = np.full(len(uniq), -np.inf)
+        np.minimum.at(lo, inverse, x)
+        np.maximum.at(hi, inverse, x)
+        aggregates[name] = (np.bincount(inverse, x, len(uniq)), np.bincount(inverse, x * x, len(uniq)), lo, hi)
+
+    revisions = summary["revisions"]
+    revisions[meta["revision"]] = max(revisions.get(meta["revision"], ""), meta["created"])
+    for i, values in enumerate(uniq):
+        config = {name: int(v) for name, v in zip(partition_by, values)}
+        key = _partition_key(meta["revision"], meta["host"], config)
+        part = summary["partitions"].setdefault(key, {
+            "revision": meta["revision"], "host": meta["host"], "config": config, "count": 0, "metrics": {},
+        })
+        part["count"] += int(counts[i])
+        for name, (s, sq, lo, hi) in aggregates.items():
+            agg = part["metrics"].setdefault(name, {"sum": 0.0, "sumsq": 0.0, "min": float("inf"),
+                                                    "max": float("-inf")})
+            agg["sum"] += float(s[i])
+            agg["sumsq"] += float(sq[i])
+            agg["min"] = min(agg["min"], float(lo[i]))
+            agg["max"] = max(agg["max"], float(hi[i]))
+
+def update_summary(store: Path) -> dict:
+    """
+    Fold the runs added since the last call into summary.json and return the summary.
+    Aggregates are mergeable (count, sum, sum of squares, min, max), so each run is
+    read exactly once.
+    """
+    path = Path(store) / "summary.json"
+    summary = json.loads(path.read_text()) if path.exists() else {}
+    if summary.get("version") != SUMMARY_VERSION:
+        summary = {"version": SUMMARY_VERSION, "runs": [], "revisions": {}, "partitions": {}}
+    done = set(summary["runs"])
+    added = 0
+    for meta in iter_runs(store):
+        if meta["run_id"] in done:
+            continue
+        _fold(summary, meta, read_run(store, meta))
+        summary["runs"].append(meta["run_id"])
+        added += 1
+    if added:
+        tmp = path.with_name(".summary.json")
+        tmp.write_text(json.dumps(summary))
+        os.replace(tmp, path)
+    return summary
+
+def latest_revision(summary: dict) -> str:
+    """The revision benchmarked most recently."""
+    if not summary["revisions"]:
+        raise ValueError("The benchmark store is empty")
+    return max(summary["revisions"], key=summary["revisions"].get)
+
+def match_revision(summary: dict, name: str) -> str:
+    """A stored revision from a full or abbreviated sha, or anything git rev-parse accepts."""
+    candidates = [rev for rev in summary["revisions"] if rev.startswith(name)]
+    if not candidates:
+        try:
+            sha = subprocess.run(["git", "rev-parse", "--verify", f"{name}^{{commit}}"], cwd=code_root(),
+                                 capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            sha = None
+        candidates = [rev for rev in summary["revisions"] if sha and rev.split("+")[0] == sha]
+    if len(candidates) != 1:
+        found = "no" if not candidates else "several"
+        raise ValueError(f"{found} stored revisions match {name!r}: {sorted(summary['revisions'])}")
+    return candidates[0]
+
+def summary_rows(summary: dict, revision: str, host: str = None) -> list:
+    """
+    One row per configuration of a revision (all hosts merged unless `host` is given),
+    sorted numerically: the configuration columns, "count", and <metric>_mean /
+    <metric>_std / <metric>_min / <metric>_max for every metric.
+    """
+    merged = {}
+    for part in summary["partitions"].values():
+        if part["revision"] != revision or (host is not None and part["host"] != host):
+            continue
+        key = tuple(part["config"].items())
+        row = merged.setdefault(key, {"config": part["config"], "count": 0, "metrics": {}})
+        row["count"] += part["count"]
+        for name, agg in part["metrics"].items():
+            acc = row["metrics"].setdefault(name, {"sum": 0.0, "sumsq": 0.0, "min": float("inf"),
+                                                   "max": float("-inf")})
+            acc["sum"] += agg["sum"]
+            acc["sumsq"] += agg["sumsq"]
+            acc["min"] = min(acc["min"], agg["min"])
+            acc["max"] = max(acc["max"], agg["max"])
+
+    rows = []
+    for key in sorted(merged):
+        part = merged[key]
+        n = part["count"]
+        row = dict(part["config"], count=n)
+        for name, acc in part["metrics"].items():
+            mean = acc["sum"] / n
+            row[f"{name}_mean"] = mean
+            row[f"{name}_std"] = max(acc["sumsq"] / n - mean * mean, 0.0) ** 0.5
+            row[f"{name}_min"] = acc["min"]
+            row[f"{name}_max"] = acc["max"]
+        rows.append(row)
+    return rows
+
+def column_name(legacy: str) -> str:
+    """Store column for a benchmark_results.csv header, e.g. "t_derive(s)" -> "t_derive_s"."""
+    return re.sub(r"\((\w+)\)$", r"_\1", legacy)
@@ -1,28 +1,25 @@
-import pandas as pd
+import argparse
+from pathlib import Path
+
 import matplotlib.pyplot as plt
 import numpy as np
 
-def parse_size(hr: str) -> float:
-    """
-    Convert a human-readable size (e.g. '1.0 MB') back to bytes for sorting.
-    """
-    num, unit = hr.split()
-    mapping = {'bytes': 1, 'KB': 1024, 'MB': 1024**2, 'GB': 1024**3, 'TB': 1024**4}
-    return float(num) * mapping[unit]
+from bench_store import latest_revision, match_revision, summary_rows, update_summary
+from test_script_analysis import bytes_to_human
 
-def make_line_chart(df, metric, outfname):
+def make_line_chart(rows, metric, outfname):
     """
-    Plot `metric` vs file_size_hr for each crypto_length_hr.
+    Plot the mean of `metric` vs file size for each crypto table length.
     Saves figure to `outfname`.
     """
-    # sort categories
-    file_sizes = sorted(df['file_size_hr'].unique(), key=parse_size)
+    # sizes are stored as integers, so they sort numerically as they are
+    file_sizes = sorted({r['file_size'] for r in rows})
     x = np.arange(len(file_sizes))
     plt.figure(figsize=(6, 4))
-    for length in sorted(df['crypto_length_hr'].unique(), key=parse_size):
-        sub = df[df['crypto_length_hr'] == length].set_index('file_size_hr').loc[file_sizes]
-        plt.plot(x, sub[metric], marker='o', label=length)
-    plt.xticks(x, file_sizes, rotation=45)
+    for length in sorted({r['crypto_length'] for r in rows}):
+        by_size = {r['file_size']: r[f'{metric}_mean'] for r in rows if r['crypto_length'] == length}
+        plt.plot(x, [by_size.get(size, np.nan) for size in file_sizes], marker='o', label=bytes_to_human(length))
+    plt.xticks(x, [bytes_to_human(size) for size in file_sizes], rotation=45)
     plt.xlabel('File Size')
     plt.ylabel(metric.replace('_', ' '))
     plt.title(metric.replace('_', ' '))
@@ -33,26 +30,41 @@ def make_line_chart(df, metric, outfname):
     plt.close()
 
 def main():
-    # 1) Load summary
-    df = pd.read_csv('benchmark_summary.csv')
-    # 2) Add numeric sizes for ordering
-    df['file_size_bytes']   = df['file_size_hr'].apply(parse_size)
-    df['crypto_length_bytes'] = df['crypto_length_hr'].apply(parse_size)
-
-    # 3) List of metrics you care about
-    time_metrics   = ['t_derive(s)', 't_addr(s)', 't_eph(s)', 't_total(s)']
-    mem_metrics    = ['mem_peak_derive(bytes)', 'mem_peak_addr(bytes)', 'mem_peak_eph(bytes)']
-    rss_metrics    = ['rss_delta_derive(bytes)', 'rss_delta_addr(bytes)', 'rss_delta_eph(bytes)']
-
-    # 4) Generate one chart per metric
+    parser = argparse.ArgumentParser(
+        description="Plot the per-configuration means of the NFT benchmark results store."
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=Path("benchmark_results"),
+        help="Results store (directory) written by test_script.py --output."
+    )
+    parser.add_argument(
+        "--revision",
+        default=None,
+        help="Revision to plot (full or abbreviated sha, or a git ref). Defaults to the latest benchmarked."
+    )
+    args = parser.parse_args()
+
+    # 1) Load the summary (new runs are folded in first)
+    summary = update_summary(args.store)
+    revision = match_revision(summary, args.revision) if args.revision else latest_revision(summary)
+    rows = summary_rows(summary, revision)
+
+    # 2) List of metrics you care about
+    time_metrics   = ['t_derive_s', 't_addr_s', 't_eph_s', 't_total_s']
+    mem_metrics    = ['mem_peak_derive_bytes', 'mem_peak_addr_bytes', 'mem_peak_eph_bytes']
+    rss_metrics    = ['rss_delta_derive_bytes', 'rss_delta_addr_bytes', 'rss_delta_eph_bytes']
+
+    # 3) Generate one chart per metric
     for m in time_metrics:
-        make_line_chart(df, m,   f'chart_{m}.png')
+        make_line_chart(rows, m,   f'chart_{m}.png')
     for m in mem_metrics:
-        make_line_chart(df, m,   f'chart_{m}.png')
+        make_line_chart(rows, m,   f'chart_{m}.png')
     for m in rss_metrics:
-        make_line_chart(df, m,   f'chart_{m}.png')
+        make_line_chart(rows, m,   f'chart_{m}.png')
 
-    print("Charts saved as chart_<metric>.png in the current directory.")
+    print(f"Charts for {revision[:12]} saved as chart_<metric>.png in the current directory.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
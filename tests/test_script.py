@@ -1,55 +1,51 @@
 import argparse
-import csv
 import os
+import sys
 import tempfile
-import time
-import tracemalloc
 from pathlib import Path
 
-import psutil
+import numpy as np
 
-# Import the protocol functions
-from NFT.utils import (
-    derive_key_from_file,
-    generate_address_table,
-    generate_ephemeral_key,
-)
+from bench_runner import compare_reports, print_summary, run_at_revisions, run_configs, write_report
+from bench_store import run_metadata, write_run
+
+STAGES = ["derive", "addr", "eph"]
+
+# Columns that identify a configuration in the results store
+CONFIG_COLUMNS = ["file_size", "crypto_length", "rows", "cols", "key_length"]
 
 def generate_dummy_file(path: Path, size: int):
     """Create a file of exactly `size` random bytes at `path`."""
     with path.open("wb") as f:
         f.write(os.urandom(size))
 
-def benchmark(func, *args, **kwargs):
+def setup(config):
     """
-    Run func(*args, **kwargs) and measure:
-      - real elapsed time (s)
-      - CPU time (user+sys, s)
-      - peak Python allocation (tracemalloc, bytes)
-      - RSS memory delta (bytes)
-    Returns (real_time, cpu_time, peak_alloc, rss_delta, result).
+    Return the stages of one configuration (called in the benchmark child process). They
+    always run in order: generate_ephemeral_key consumes the tables the two earlier
+    stages produced, so a memory run of "eph" runs derive and addr first as untimed
+    setup and measures from a reset peak (see bench_runner). The input file is written
+    once per configuration by the parent.
     """
-    proc = psutil.Process(os.getpid())
+    from NFT.utils import derive_key_from_file, generate_address_table, generate_ephemeral_key
+
+    path = Path(config["path"])
+    rows, cols = config["rows"], config["cols"]
+    tables = {}
 
-    # Snapshot before
-    cpu_before = sum(proc.cpu_times()[:2])
-    rss_before = proc.memory_info().rss
+    def derive():
+        tables["crypto"] = derive_key_from_file(path, config["password"], config["crypto_length"])
 
-    tracemalloc.start()
-    start = time.perf_counter()
-    result = func(*args, **kwargs)
-    real_time = time.perf_counter() - start
-    peak, _ = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
+    def addr():
+        _, tables["address"] = generate_address_table(rows, cols)
 
-    # Snapshot after
-    cpu_after = sum(proc.cpu_times()[:2])
-    rss_after = proc.memory_info().rss
+    def eph():
+        generate_ephemeral_key(tables["address"], tables["crypto"], config["key_length"])
 
-    cpu_time = cpu_after - cpu_before
-    rss_delta = rss_after - rss_before
+    return {"derive": derive, "addr": addr, "eph": eph}
 
-    return real_time, cpu_time, peak, rss_delta, result
+def config_label(config) -> str:
+    return f"{config['file_size']}B / {config['crypto_length']}B"
 
 def main():
     parser = argparse.ArgumentParser(
@@ -95,80 +91,117 @@ def main():
         "--runs",
         type=int,
         default=1000,
-        help="How many times to repeat each configuration."
+        help="Measured runs per configuration."
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=5,
+        help="Unmeasured runs per configuration before the measured ones."
+    )
+    parser.add_argument(
+        "--memory-runs",
+        type=int,
+        default=3,
+        help="Memory measurements per configuration and stage, each in a fresh process (peak allocation and peak-RSS delta)."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) // 2),
+        help="Configurations measured in parallel, one process each. Use 1 on a busy or small machine."
     )
     parser.add_argument(
         "--output",
         type=Path,
-        default=Path("benchmark_results.csv"),
-        help="CSV file to append results to."
+        default=Path("benchmark_results"),
+        help="Results store (directory) to add the per-run results to; see bench_store.py."
+    )
+    parser.add_argument(
+        "--no-store",
+        "--no-csv",
+        dest="no_store",
+        action="store_true",
+        help="Do not write the results to the store."
+    )
+    parser.add_argument(
+        "--json",
+        type=Path,
+        default=None,
+        help="JSON file for the summary (percentiles, 95%% confidence intervals) and raw samples."
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE", "HEAD"),
+        default=None,
+        help="Run the same benchmark against two git revisions (in temporary worktrees) and compare them."
     )
     args = parser.parse_args()
 
-    # Ensure output CSV has header
-    write_header = not args.output.exists()
-    with args.output.open("a", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        if write_header:
-            writer.writerow([
-                "file_size", "crypto_length", "rows", "cols",
-                "key_length", "run",
-                "t_derive(s)", "cpu_derive(s)", "mem_peak_derive(bytes)", "rss_delta_derive(bytes)",
-                "t_addr(s)",   "cpu_addr(s)",   "mem_peak_addr(bytes)",   "rss_delta_addr(bytes)",
-                "t_eph(s)",    "cpu_eph(s)",    "mem_peak_eph(bytes)",    "rss_delta_eph(bytes)",
-                "t_total(s)",
-            ])
-
-        rows, cols = args.rows_cols
-
+    if args.compare:
+        argv = []
+        skip = 0
+        for arg in sys.argv[1:]:
+            if skip:
+                skip -= 1
+            elif arg == "--compare":
+                skip = 2
+            elif arg == "--json":
+                skip = 1
+            else:
+                argv.append(arg)
+        base, head = run_at_revisions(Path(__file__).resolve(), argv + ["--no-csv"], args.compare)
+        compare_reports(base, head, config_label, *args.compare)
+        return
+
+    rows, cols = args.rows_cols
+    with tempfile.TemporaryDirectory(prefix="vt_bench_") as tmp:
+        # One input file per size, shared by its configurations (and page-cache warm after the warmups)
+        configs = []
         for file_size in args.file_sizes:
+            path = Path(tmp) / f"input_{file_size}.bin"
+            generate_dummy_file(path, file_size)
             for crypto_len in args.crypto_lengths:
-                for run_idx in range(1, args.runs + 1):
-                    # 1) Create a fresh dummy file
-                    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                        tmp_path = Path(tmp.name)
-                    generate_dummy_file(tmp_path, file_size)
-
-                    # 2) derive_key_from_file
-                    t1, cpu1, peak1, rss1, crypto_table = benchmark(
-                        derive_key_from_file,
-                        tmp_path,
-                        args.password,
-                        crypto_len
-                    )
-
-                    # 3) generate_address_table
-                    t2, cpu2, peak2, rss2, (_, addr_table) = benchmark(
-                        generate_address_table,
-                        rows,
-                        cols
-                    )
-
-                    # 4) generate_ephemeral_key
-                    t3, cpu3, peak3, rss3, _ = benchmark(
-                        generate_ephemeral_key,
-                        addr_table,
-                        crypto_table,
-                        args.key_lengths[0]
-                    )
-
-                    # 5) Compute total protocol time
-                    t_total = t1 + t2 + t3
-
-                    # 6) Record results
-                    writer.writerow([
-                        file_size, crypto_len, rows, cols,
-                        args.key_lengths[0], run_idx,
-                        f"{t1:.6f}", f"{cpu1:.6f}", peak1, rss1,
-                        f"{t2:.6f}", f"{cpu2:.6f}", peak2, rss2,
-                        f"{t3:.6f}", f"{cpu3:.6f}", peak3, rss3,
-                        f"{t_total:.6f}",
-                    ])
-
-                    # 7) Delete the dummy file
-                    tmp_path.unlink()
-
-    print(f"Benchmark complete — results appended to {args.output}")
+                configs.append({
+                    "file_size": file_size, "crypto_length": crypto_len, "rows": rows, "cols": cols,
+                    "key_length": args.key_lengths[0], "password": args.password, "path": str(path),
+                })
+        results = run_configs(setup, configs, args.runs, warmup=args.warmup,
+                              memory_runs=args.memory_runs, jobs=args.jobs)
+
+    print_summary(results, config_label)
+    if args.json:
+        write_report(args.json, results, meta={
+            "runs": args.runs, "warmup": args.warmup, "memory_runs": args.memory_runs, "jobs": args.jobs,
+        })
+        print(f"Summary written to {args.json}")
+    if args.no_store:
+        return
+
+    # One row per timing run. Memory is measured in separate runs, so the memory
+    # columns repeat the configuration's peak (the max over its memory runs).
+    n = len(results) * args.runs
+    columns = {name: np.repeat([r["config"][name] for r in results], args.runs).astype(np.int64)
+               for name in CONFIG_COLUMNS}
+    columns["run"] = np.tile(np.arange(1, args.runs + 1, dtype=np.int32), len(results))
+    columns["t_total_s"] = np.zeros(n)
+    for name in STAGES:
+        stages = [r["stages"][name] for r in results]
+        columns[f"t_{name}_s"] = np.concatenate([st["wall_samples"] for st in stages])
+        columns[f"cpu_{name}_s"] = np.concatenate([st["cpu_samples"] for st in stages])
+        columns[f"mem_peak_{name}_bytes"] = np.repeat([st["peak_alloc"] or 0 for st in stages],
+                                                      args.runs).astype(np.int64)
+        columns[f"rss_delta_{name}_bytes"] = np.repeat([st["rss_peak_delta"] or 0 for st in stages],
+                                                       args.runs).astype(np.int64)
+        columns["t_total_s"] += columns[f"t_{name}_s"]
+    columns["t_total_s"] = columns.pop("t_total_s")
+
+    run_id = write_run(args.output, columns, run_metadata({
+        "runs": args.runs, "warmup": args.warmup, "memory_runs": args.memory_runs, "jobs": args.jobs,
+    }), CONFIG_COLUMNS)
+
+    print(f"Benchmark complete — run {run_id} added to {args.output}")
 
 
 if __name__ == "__main__":
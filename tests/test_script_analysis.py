@@ -1,5 +1,20 @@
-import pandas as pd
-import tabulate
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from bench_store import column_name, latest_revision, match_revision, run_metadata, summary_rows, \
+    update_summary, write_run
+from test_script import CONFIG_COLUMNS
+
+# Metrics to report (means per configuration)
+METRICS = [
+    't_derive_s', 'cpu_derive_s', 'mem_peak_derive_bytes', 'rss_delta_derive_bytes',
+    't_addr_s',   'cpu_addr_s',   'mem_peak_addr_bytes',   'rss_delta_addr_bytes',
+    't_eph_s',    'cpu_eph_s',    'mem_peak_eph_bytes',    'rss_delta_eph_bytes',
+    't_total_s'
+]
 
 
 def bytes_to_human(n: int) -> str:
@@ -17,39 +32,123 @@ def bytes_to_human(n: int) -> str:
         size /= 1024
 
 
+def print_table(headers, rows):
+    """Print rows as a markdown table (via tabulate if installed)."""
+    try:
+        from tabulate import tabulate
+        print(tabulate(rows, headers=headers, tablefmt="pipe", floatfmt=".6g"))
+        return
+    except ImportError:
+        pass
+    cells = [[f"{v:.6g}" if isinstance(v, float) else str(v) for v in row] for row in rows]
+    widths = [max(len(str(h)), *(len(r[i]) for r in cells)) for i, h in enumerate(headers)]
+    print("| " + " | ".join(str(h).ljust(w) for h, w in zip(headers, widths)) + " |")
+    print("|" + "|".join("-" * (w + 2) for w in widths) + "|")
+    for r in cells:
+        print("| " + " | ".join(c.rjust(w) for c, w in zip(r, widths)) + " |")
+
+
+def import_csv(store: Path, csv_path: Path) -> str:
+    """Add the rows of a benchmark_results.csv written by older versions of test_script.py as one run."""
+    with csv_path.open(newline="") as f:
+        records = list(csv.DictReader(f))
+    if not records:
+        raise ValueError(f"{csv_path} has no rows")
+    columns = {}
+    for legacy in records[0]:
+        name = column_name(legacy)
+        values = [r[legacy] for r in records]
+        integer = name in CONFIG_COLUMNS or name == "run" or name.endswith("_bytes")
+        columns[name] = np.array(values, dtype=np.float64).astype(np.int64) if integer \
+            else np.array(values, dtype=np.float64)
+    meta = run_metadata({"imported_from": str(csv_path)})
+    # Revision and host of the original runs are unknown
+    meta.update(revision="unknown", host="unknown")
+    return write_run(store, columns, meta, CONFIG_COLUMNS)
+
+
+def config_cells(row):
+    return [bytes_to_human(row['file_size']), bytes_to_human(row['crypto_length'])]
+
+
 def main():
-    # 1) Load raw data
-    df = pd.read_csv('benchmark_results.csv')
-
-    # 2) Human-readable size columns
-    df['file_size_hr'] = df['file_size'].apply(bytes_to_human)
-    df['crypto_length_hr'] = df['crypto_length'].apply(bytes_to_human)
-
-    # 3) Metrics to average
-    metrics = [
-        't_derive(s)', 'cpu_derive(s)', 'mem_peak_derive(bytes)', 'rss_delta_derive(bytes)',
-        't_addr(s)',   'cpu_addr(s)',   'mem_peak_addr(bytes)',   'rss_delta_addr(bytes)',
-        't_eph(s)',    'cpu_eph(s)',    'mem_peak_eph(bytes)',    'rss_delta_eph(bytes)',
-        't_total(s)'
-    ]
-
-    # 4) Group & compute mean
-    summary = (
-        df
-        .groupby(['file_size_hr', 'crypto_length_hr'])[metrics]
-        .mean()
-        .reset_index()
+    parser = argparse.ArgumentParser(
+        description="Summarize the NFT benchmark results store written by test_script.py."
     )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=Path("benchmark_results"),
+        help="Results store (directory) written by test_script.py --output."
+    )
+    parser.add_argument(
+        "--revision",
+        default=None,
+        help="Revision to summarize (full or abbreviated sha, or a git ref). Defaults to the latest benchmarked."
+    )
+    parser.add_argument(
+        "--host",
+        default=None,
+        help="Only use runs from this host (default: all hosts)."
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE", "HEAD"),
+        default=None,
+        help="Compare the mean metrics of two stored revisions instead."
+    )
+    parser.add_argument(
+        "--import-csv",
+        type=Path,
+        default=None,
+        help="First add a benchmark_results.csv from older versions of test_script.py to the store."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("benchmark_summary.csv"),
+        help="CSV file to write the per-configuration summary to."
+    )
+    args = parser.parse_args()
 
-    # 5) Save summary
-    summary.to_csv('benchmark_summary.csv', index=False)
+    if args.import_csv:
+        print(f"Imported {args.import_csv} as run {import_csv(args.store, args.import_csv)}")
 
-    # 6) Print outputs with fallback if tabulate missing
-    print("Average metrics by file size and crypto table length:\n")
-    try:
-        print(summary.to_markdown(index=False))
-    except ImportError:
-        print(summary.to_string(index=False))
+    # 1) Fold new runs into the per-partition summary (earlier runs are not read again)
+    summary = update_summary(args.store)
+
+    if args.compare:
+        base, head = (match_revision(summary, rev) for rev in args.compare)
+        old = {tuple(r[c] for c in CONFIG_COLUMNS): r for r in summary_rows(summary, base, args.host)}
+        table = []
+        for r in summary_rows(summary, head, args.host):
+            a = old.get(tuple(r[c] for c in CONFIG_COLUMNS))
+            if a is None:
+                continue
+            for m in METRICS:
+                if not m.startswith("t_"):
+                    continue
+                before, after = a[f"{m}_mean"], r[f"{m}_mean"]
+                change = (after / before - 1) * 100 if before else float("inf")
+                table.append(config_cells(r) + [m, before, after, f"{change:+.1f}%"])
+        print(f"Mean wall time, {base[:12]} -> {head[:12]}:\n")
+        print_table(["file size", "crypto length", "metric", args.compare[0], args.compare[1], "change"], table)
+        return
+
+    # 2) Means per configuration of one revision
+    revision = match_revision(summary, args.revision) if args.revision else latest_revision(summary)
+    rows = summary_rows(summary, revision, args.host)
+    with args.output.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CONFIG_COLUMNS + ["runs"] + METRICS)
+        for r in rows:
+            writer.writerow([r[c] for c in CONFIG_COLUMNS] + [r["count"]] + [r[f"{m}_mean"] for m in METRICS])
+
+    print(f"Average metrics by file size and crypto table length ({revision[:12]}):\n")
+    print_table(["file size", "crypto length", "runs"] + METRICS,
+                [config_cells(r) + [r["count"]] + [r[f"{m}_mean"] for m in METRICS] for r in rows])
+    print(f"\nSummary written to {args.output}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()